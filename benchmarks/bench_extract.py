@@ -0,0 +1,121 @@
+"""Micro-benchmark: extract_json_objects vs. the previous find-every-brace-pair implementation.
+
+Run from the repository root:
+    python -m benchmarks.bench_extract [--sizes 1000 2000 4000]
+
+Prints one JSON object per case with the timings of both implementations.
+"""
+import argparse
+import json
+import time
+
+from utils.extract import extract_json_objects
+
+RESULT = json.dumps({
+    "file_summary": "Service that manages rentals",
+    "file_complexity_estimate": 4,
+    "methods": [{"method_name": "rent", "signature": "void rent(Film f)", "description": "Rents a film"}],
+    "mocks": [], "assertions": [], "noteworthy": [],
+})
+
+
+def legacy_extract_json_objects(raw_chunks):
+    """The implementation this module replaced, kept verbatim for comparison."""
+    json_objects = []
+
+    for raw in raw_chunks:
+        if isinstance(raw, dict):
+            json_objects.append(raw)
+            continue
+
+        try:
+            json_obj = json.loads(raw)
+            if isinstance(json_obj, dict):
+                json_objects.append(json_obj)
+                continue
+        except json.JSONDecodeError:
+            pass
+
+        try:
+            start = 0
+            while start < len(raw):
+                start = raw.find("{", start)
+                if start == -1:
+                    break
+                end = raw.find("}", start)
+                while end != -1:
+                    try:
+                        candidate = raw[start:end + 1]
+                        obj = json.loads(candidate)
+                        if isinstance(obj, dict) and "file_summary" in obj:
+                            json_objects.append(obj)
+                            break
+                    except json.JSONDecodeError:
+                        pass
+                    end = raw.find("}", end + 1)
+                start += 1
+        except Exception:
+            continue
+
+    return json_objects
+
+
+def chatty_braces(n):
+    """Prose full of braces that never form JSON, e.g. a model echoing code back."""
+    return "Here is the analysis of `if (x) { y(); }` and friends. " * (n // 50) + RESULT
+
+
+def unbalanced(n):
+    """Many opening braces without a valid object: every '{' pairs with every later '}'."""
+    return "{ a } " * (n // 6) + "trailing text"
+
+
+def fenced_with_prose(n):
+    return "Sure! " + "Lorem ipsum dolor sit amet. " * (n // 28) + "\n```json\n" + RESULT + "\n```\n"
+
+
+CASES = {
+    "chatty_braces": chatty_braces,
+    "unbalanced": unbalanced,
+    "fenced_with_prose": fenced_with_prose,
+}
+
+
+def time_call(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn([text])
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes, repeat=3):
+    results = []
+    for name, make in CASES.items():
+        for size in sizes:
+            text = make(size)
+            legacy = time_call(legacy_extract_json_objects, text, repeat)
+            current = time_call(extract_json_objects, text, repeat)
+            results.append({
+                "case": name,
+                "chars": len(text),
+                "legacy_ms": round(legacy * 1000, 3),
+                "current_ms": round(current * 1000, 3),
+                "speedup": round(legacy / current, 1) if current else None,
+                "same_result": legacy_extract_json_objects([text]) == extract_json_objects([text]),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 4000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for result in run(args.sizes, args.repeat):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""End-to-end pipeline benchmark on a synthetic repository with the fake LLM backend.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline [--files 200] [--languages Python Java] [--latency 0.05] [--output report.json]
+
+Times each stage on its own (scanning, token counting, chunking, JSON extraction, chunk merging, project
+summary) and then the whole `main` run, and prints one JSON report with files/sec and tokens/file, so results
+can be compared between commits.
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+
+import main as pipeline
+from benchmarks import fake_llm
+from benchmarks.fake_llm import FakeChatModel, fake_response
+from benchmarks.synthetic_repo import generate_repo
+from config import IGNORE_FILE_FOLDERS, MODEL_NAME
+from runners.summarize_code import merge_chunk_results
+from runners.summarize_project import summarize_project
+from utils import llm_cache
+from utils.chains import set_llm_factory
+from utils.extract import extract_json_objects
+from utils.file_utils import get_code_files, infer_language_from_path
+from utils.git_utils import get_head_commit, is_git_repo
+from utils.token_aware_chunking import token_aware_chunking
+from utils.token_counter import count_tokens_batch
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def rate(count, seconds):
+    return round(count / seconds, 2) if seconds else None
+
+
+def read_sources(paths):
+    sources = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            sources.append((path, infer_language_from_path(path), f.read()))
+    return sources
+
+
+def bench_stages(repo):
+    """Per-stage timings without any LLM latency."""
+    stages = {}
+    files, seconds = timed(get_code_files, repo, IGNORE_FILE_FOLDERS)
+    stages["scan"] = {"files": len(files), "seconds": round(seconds, 4), "files_per_sec": rate(len(files), seconds)}
+
+    sources = read_sources(files)
+    counts, seconds = timed(count_tokens_batch, [code for _, _, code in sources])
+    stages["token_count"] = {"tokens": sum(counts), "tokens_per_file": round(sum(counts) / max(1, len(files)), 1),
+                             "seconds": round(seconds, 4), "files_per_sec": rate(len(files), seconds)}
+
+    chunked, seconds = timed(lambda: [token_aware_chunking(code, language, path) for path, language, code in sources])
+    chunk_count = sum(len(chunks) for chunks in chunked)
+    stages["chunking"] = {"chunks": chunk_count, "chunks_per_file": round(chunk_count / max(1, len(files)), 2),
+                          "seconds": round(seconds, 4), "files_per_sec": rate(len(files), seconds)}
+
+    # Canned answers wrapped in chatter, as real models tend to return them
+    raw = [[f"Sure, here is the analysis:\n```json\n{fake_response('Here is the code:' + chunk)}\n```"
+            for chunk in chunks] for chunks in chunked]
+    extracted, seconds = timed(lambda: [extract_json_objects(results) for results in raw])
+    stages["extract"] = {"responses": chunk_count, "objects": sum(len(objs) for objs in extracted),
+                         "seconds": round(seconds, 4), "files_per_sec": rate(len(files), seconds)}
+
+    entries, seconds = timed(lambda: [merge_chunk_results(path, results)
+                                      for (path, _, _), results in zip(sources, raw)])
+    stages["merge"] = {"seconds": round(seconds, 4), "files_per_sec": rate(len(files), seconds)}
+
+    fake_llm.reset_stats()
+    _, seconds = timed(summarize_project, entries)
+    stages["project_summary"] = {"llm_calls": fake_llm.stats["calls"], "seconds": round(seconds, 4)}
+    return stages
+
+
+def bench_end_to_end(repo, files):
+    """`main` on the repository, run in a scratch directory so outputs and caches do not touch the checkout."""
+    fake_llm.reset_stats()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            _, seconds = timed(pipeline.main, ["--local-path", repo])
+        finally:
+            os.chdir(cwd)
+    tokens = fake_llm.stats["input_tokens"] + fake_llm.stats["output_tokens"]
+    return {
+        "seconds": round(seconds, 3),
+        "files_per_sec": rate(files, seconds),
+        "llm_calls": fake_llm.stats["calls"],
+        "input_tokens": fake_llm.stats["input_tokens"],
+        "output_tokens": fake_llm.stats["output_tokens"],
+        "tokens_per_file": round(tokens / max(1, files), 1),
+    }
+
+
+def run(files=100, languages=("Python", "Java"), lines=(20, 400), latency=0.05, seed=0):
+    cache_enabled, llm_cache.LLM_CACHE_ENABLED = llm_cache.LLM_CACHE_ENABLED, False  # every call must be paid for
+    set_llm_factory(lambda: FakeChatModel(latency=latency))
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            repo = os.path.join(root, "synthetic")
+            generate_repo(repo, files, languages, lines, seed)
+            stages = bench_stages(repo)
+            end_to_end = bench_end_to_end(repo, stages["scan"]["files"])
+    finally:
+        set_llm_factory(None)
+        llm_cache.LLM_CACHE_ENABLED = cache_enabled
+    return {
+        "config": {"files": files, "languages": list(languages), "lines": list(lines), "latency": latency,
+                   "seed": seed, "model": MODEL_NAME},
+        "commit": get_head_commit(REPO_ROOT) if is_git_repo(REPO_ROOT) else None,
+        "python": platform.python_version(),
+        "stages": stages,
+        "end_to_end": end_to_end,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--languages", nargs="+", default=["Python", "Java"])
+    parser.add_argument("--lines", type=int, nargs=2, default=[20, 400], metavar=("MIN", "MAX"))
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the fake model waits per call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report here instead of stdout")
+    args = parser.parse_args()
+    report = run(args.files, args.languages, tuple(args.lines), args.latency, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Deterministic stand-in for the LLM backend, for benchmarks and end-to-end tests.
+
+Plug it in with:
+    utils.chains.set_llm_factory(lambda: FakeChatModel(latency=0.2))
+
+Responses are canned JSON shaped after the prompt that was sent (single-file analysis, method descriptions,
+packed files, partial or final project summary), so the whole pipeline runs without a model.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+_FILE_HEADER = re.compile(r"^### File: (\S+) \(", re.MULTILINE)
+_FACT_LINE = re.compile(r"^- (\w+): ", re.MULTILINE)
+_DEFINITION = re.compile(r"\b(?:def|function|func|fn)\s+(\w+)|\b(?:public|private|protected)\s+[\w<>\[\]]+\s+(\w+)\s*\(")
+
+_stats_lock = threading.Lock()
+stats = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+
+
+def reset_stats():
+    with _stats_lock:
+        stats.update(calls=0, input_tokens=0, output_tokens=0)
+
+
+def _analysis(names, summary):
+    return {
+        "file_summary": summary,
+        "file_complexity_estimate": 1 + len(names),
+        "methods": [{"method_name": n, "signature": f"{n}(...)", "description": f"Handles {n}", "complexity": 1}
+                    for n in names],
+        "mocks": [],
+        "assertions": [],
+        "noteworthy": [],
+    }
+
+
+def fake_response(prompt):
+    """The canned answer for a rendered prompt."""
+    if "do not return JSON" in prompt:
+        return "Partial summary: the files implement services, models and tests for the synthetic project."
+    if "project-level JSON summary" in prompt:
+        return json.dumps({"project_name": "synthetic", "summary": "Synthetic benchmark project",
+                           "technologies": [], "modules": []})
+    paths = _FILE_HEADER.findall(prompt)
+    if paths:
+        files = []
+        for path, block in zip(paths, re.split(r"^### File: ", prompt, flags=re.MULTILINE)[1:]):
+            entry = _analysis([a or b for a, b in _DEFINITION.findall(block)], f"Synthetic file {path}")
+            files.append({"file_path": path, **entry})
+        return json.dumps({"files": files})
+    if "extracted by a parser" in prompt:
+        names = _FACT_LINE.findall(prompt)
+        return json.dumps({"file_summary": "Synthetic source file",
+                           "methods": [{"method_name": n, "description": f"Handles {n}"} for n in names],
+                           "mocks": [], "assertions": [], "noteworthy": []})
+    code = prompt.split("Here is the code:", 1)[-1]
+    return json.dumps(_analysis([a or b for a, b in _DEFINITION.findall(code)], "Synthetic source file"))
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that waits `latency` seconds per call and answers with fake_response. Token usage is
+    estimated at 4 characters per token and reported as usage_metadata."""
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "fake-benchmark"
+
+    def _result(self, messages):
+        prompt = "\n".join(str(m.content) for m in messages)
+        text = fake_response(prompt)
+        input_tokens, output_tokens = len(prompt) // 4, len(text) // 4
+        with _stats_lock:
+            stats["calls"] += 1
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+        message = AIMessage(content=text, usage_metadata={
+            "input_tokens": input_tokens, "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(messages)
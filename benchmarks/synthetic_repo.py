@@ -0,0 +1,88 @@
+"""Deterministic synthetic repositories for benchmarks.
+
+    python -m benchmarks.synthetic_repo /tmp/synthetic --files 500 --languages Python Java --lines 20 400
+
+The same arguments and seed always produce the same tree: files are spread over role-named directories
+(controllers, services, models, utils, tests) and filled with functions/classes in each language's syntax.
+"""
+import argparse
+import json
+import os
+import random
+
+ROLES = ["controller", "service", "model", "util", "test"]
+
+# extension and a (name, body constants) -> source template per language; one body line per constant
+LANGUAGES = {
+    "Python": (".py", lambda name, body: f"def {name}(value, factor=2):\n"
+                                          + "".join(f"    value = value * factor + {i}\n" for i in body)
+                                          + "    if value > 100:\n        return value - 100\n    return value\n\n\n"),
+    "Java": (".java", lambda name, body: f"    public int {name}(int value) {{\n"
+                                         + "".join(f"        value = value * 2 + {i};\n" for i in body)
+                                         + "        if (value > 100) {\n            return value - 100;\n"
+                                           "        }\n        return value;\n    }\n\n"),
+    "JavaScript": (".js", lambda name, body: f"function {name}(value) {{\n"
+                                             + "".join(f"  value = value * 2 + {i};\n" for i in body)
+                                             + "  return value > 100 ? value - 100 : value;\n}\n\n"),
+    "Go": (".go", lambda name, body: f"func {name}(value int) int {{\n"
+                                     + "".join(f"\tvalue = value*2 + {i}\n" for i in body)
+                                     + "\tif value > 100 {\n\t\treturn value - 100\n\t}\n\treturn value\n}\n\n"),
+}
+
+
+def _wrap(language, class_name, body):
+    if language == "Java":
+        return f"package synthetic;\n\npublic class {class_name} {{\n\n{body}}}\n"
+    if language == "Go":
+        return f"package synthetic\n\n{body}"
+    return body
+
+
+def generate_source(language, class_name, lines, rng):
+    """Roughly `lines` lines of `language` code made of functions of 5-30 lines."""
+    _, template = LANGUAGES[language]
+    parts, written, index = [], 0, 0
+    while written < lines:
+        # random constants keep files from looking like near-duplicates of each other
+        body = [rng.randrange(10 ** 6) for _ in range(rng.randint(5, 30))]
+        name = f"{class_name[0].lower()}{class_name[1:]}Step{index}"
+        part = template(name, body)
+        parts.append(part)
+        written += part.count("\n")
+        index += 1
+    return _wrap(language, class_name, "".join(parts))
+
+
+def generate_repo(root, files=100, languages=("Python", "Java"), lines=(20, 400), seed=0):
+    """Writes `files` source files under `root` and returns their paths. Sizes are uniform in `lines`."""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(files):
+        language = languages[i % len(languages)]
+        role = ROLES[rng.randrange(len(ROLES))]
+        class_name = f"{role.capitalize()}{i}"
+        ext, _ = LANGUAGES[language]
+        directory = os.path.join(root, "src", f"{role}s", f"pkg{i % 10}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, class_name + ext)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(generate_source(language, class_name, rng.randint(*lines), rng))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root")
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--languages", nargs="+", default=["Python", "Java"], choices=sorted(LANGUAGES))
+    parser.add_argument("--lines", type=int, nargs=2, default=[20, 400], metavar=("MIN", "MAX"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    paths = generate_repo(args.root, args.files, args.languages, tuple(args.lines), args.seed)
+    print(json.dumps({"root": args.root, "files": len(paths),
+                      "bytes": sum(os.path.getsize(p) for p in paths)}))
+
+
+if __name__ == "__main__":
+    main()
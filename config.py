@@ -10,6 +10,7 @@ LOCAL_REPO_BASE_PATH = os.environ.get("REPO_PATH", "./repo/")
 USE_OPENAI = False
 MODEL_NAME = "gpt-3.5-turbo" if USE_OPENAI else "codellama"
 MAX_TOKENS = 600
+TEMPERATURE = 0.2
 
 EXTENSION_LANGUAGE_MAP = {
     ".py": "Python",
@@ -33,6 +34,46 @@ IGNORE_FILE_FOLDERS = {
     "mvnw",
 }
 
+# Repository scanning: vendored/generated directories and files are never summarized, nor are binary files or
+# files above MAX_FILE_BYTES. In a git checkout the file list comes from `git ls-files` (honours .gitignore);
+# otherwise a parallel os.scandir walk applies the .gitignore files itself.
+VENDORED_DIRS = {"node_modules", "bower_components", "target", "build", "dist", "vendor", "third_party",
+                 "__pycache__", "venv"}
+GENERATED_FILE_PATTERNS = ("*.min.js", "*.min.css", "*.bundle.js", "*.chunk.js", "*-min.js", "*.pb.go", "*_pb2.py",
+                           "*.generated.*", "*.g.cs", "*.designer.cs")
+MAX_FILE_BYTES = int(os.environ.get("MAX_FILE_BYTES", 1024 * 1024))
+BINARY_SNIFF_BYTES = 8192
+SCAN_USE_GIT = os.environ.get("SCAN_USE_GIT", "true").lower() == "true"
+SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", 8))
+
+# Duplicate detection: identical files (content hash) and near-identical files (MinHash/LSH over normalized tokens,
+# estimated Jaccard similarity >= DEDUP_THRESHOLD) are summarized once; the others get the representative's
+# description with a `duplicate_of` reference
+DEDUP_ENABLED = os.environ.get("DEDUP", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", 0.9))
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16  # 4 rows per band: pairs above ~0.5 similarity become candidates, then the threshold is checked
+SHINGLE_SIZE = 5
+DEDUP_MIN_TOKENS = 50  # shorter files are only matched when identical
+
+# Static analysis: method names, signatures, line spans and cyclomatic complexity are computed locally (radon for
+# Python, tree-sitter otherwise) on a process pool; the LLM is then only asked for descriptions. Languages without
+# an analyzer keep the full analysis prompt.
+STATIC_ANALYSIS = os.environ.get("STATIC_ANALYSIS", "true").lower() == "true"
+STATIC_ANALYSIS_WORKERS = int(os.environ.get("STATIC_ANALYSIS_WORKERS", os.cpu_count() or 1))
+FACTS_TOKEN_BUDGET = 600  # prompt tokens reserved per chunk for the injected method list
+
+# Symbol index: one local pass records every file's definitions and imports in
+# <project>_symbol_index.sqlite and links files that use each other's symbols. PageRank over that graph orders the
+# project summary (central files first), each file entry lists the files it uses and is used by, and
+# `main.py --where NAME` answers where a symbol is defined without any LLM call. Names defined in more than
+# SYMBOL_MAX_DEFINITIONS files are too generic to link files by.
+SYMBOL_INDEX = os.environ.get("SYMBOL_INDEX", "true").lower() == "true"
+OUTPUT_SYMBOL_INDEX_NAME = "_symbol_index.sqlite"
+SYMBOL_MAX_DEFINITIONS = 3
+PAGERANK_DAMPING = 0.85
+DEPENDENCY_LIMIT = 5  # files listed per direction in an entry's "dependencies"
+
 MODEL_LIMITS = {
     "gpt-3.5-turbo": 4096,
     "gpt-3.5-turbo-16k": 16384,
@@ -42,11 +83,140 @@ MODEL_LIMITS = {
     "codellama:": 8192,
 }
 
+# Token counting: tiktoken encoding used for all budgets, and the ratio used when a quick estimate is enough
+TOKENIZER_MODEL = "gpt-3.5-turbo"
+CHARS_PER_TOKEN = 4.0
+
+# Chunk along function/class boundaries with tree-sitter; falls back to the character splitter
+USE_SYNTAX_CHUNKING = os.environ.get("SYNTAX_CHUNKING", "true").lower() == "true"
+
 # CHUNK_SIZE = 1024
 CHUNK_OVERLAP = 100
+# "independent": a file's chunks are separate requests (sent concurrently, CHUNK_OVERLAP tokens repeated between
+# neighbours) whose results are merged afterwards. "rolling": the chunks are sent in order without overlap, each
+# carrying a compact state of what earlier chunks found (summary so far, methods already listed), at most
+# ROLLING_STATE_TOKENS long; the file record is built from that state after the last chunk.
+CHUNK_MODE = os.environ.get("CHUNK_MODE", "independent")
+ROLLING_STATE_TOKENS = 300
 MAX_INPUT_TOKENS = 8000  # headroom for response
 BUFFER_TOKENS = 200  # Safety margin for unexpected token expansion
 
+# Model routing: before any LLM call each file gets a score from its size, token count, static complexity and
+# language (ROUTING_SCORE_WEIGHTS per unit, plus ROUTING_LANGUAGE_BIAS) and goes to the first tier whose max_score
+# covers it; the last tier takes everything else. Tiers are listed cheapest first, each with its own context limit
+# (chunk size; None = MODEL_LIMITS) and completion budget. A chunk whose response from a cheaper tier fails schema
+# validation ROUTING_CHEAP_ATTEMPTS times is escalated to the next tier. Without MODEL_ROUTING every file uses
+# MODEL_NAME.
+MODEL_ROUTING = os.environ.get("MODEL_ROUTING", "false").lower() == "true"
+SMALL_MODEL_NAME = os.environ.get("SMALL_MODEL_NAME", "gpt-4o-mini" if USE_OPENAI else "qwen2.5-coder:1.5b")
+MODEL_TIERS = [
+    {"name": "small", "model": SMALL_MODEL_NAME, "context_limit": 8192, "max_tokens": 400, "max_score": 1.0},
+    {"name": "large", "model": MODEL_NAME, "context_limit": None, "max_tokens": MAX_TOKENS, "max_score": None},
+]
+ROUTING_SCORE_WEIGHTS = {"bytes": 1 / 40000, "tokens": 1 / 2500, "complexity": 1 / 25}
+ROUTING_LANGUAGE_BIAS = {"C++": 0.25, "Rust": 0.25, "Html": -0.25}
+ROUTING_CHEAP_ATTEMPTS = 1
+
+# Concurrency: async mode runs chunks and files concurrently, bounded by a global
+# limit on in-flight LLM calls and a per-backend limit (Ollama serves few requests at a time)
+ASYNC_MODE = os.environ.get("ASYNC_MODE", "true").lower() == "true"
+MAX_CONCURRENCY = int(os.environ.get("MAX_CONCURRENCY", 8))
+FILE_CONCURRENCY = int(os.environ.get("FILE_CONCURRENCY", MAX_CONCURRENCY))
+BACKEND_CONCURRENCY = {
+    "openai": 8,
+    "ollama": 2,
+}
+# LLM clients are built once per process; their keep-alive connection pool is sized to the concurrency
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", MAX_CONCURRENCY))
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 300))
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")  # keeps the model loaded between requests
+
+# Ollama model lifecycle over its HTTP API: the models of all tiers are loaded on every Ollama endpoint while the
+# repository is scanned, with the run's keep_alive and num_ctx. num_ctx has to match the requests' (a different
+# value reloads the model); 0 derives it from the tier's context limit plus its completion budget. Models stay
+# loaded for OLLAMA_KEEP_ALIVE after the run so back-to-back runs start warm; OLLAMA_UNLOAD_AT_EXIT unloads them.
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_NUM_CTX = int(os.environ.get("OLLAMA_NUM_CTX", 0))
+OLLAMA_PRELOAD = os.environ.get("OLLAMA_PRELOAD", "true").lower() == "true"
+OLLAMA_UNLOAD_AT_EXIT = os.environ.get("OLLAMA_UNLOAD_AT_EXIT", "false").lower() == "true"
+
+# Ollama backend pool: spread requests over several servers, e.g.
+# OLLAMA_HOSTS="http://gpu1:11434|2|4,http://cpu1:11434" (url|weight|max_concurrency, the last two optional).
+# Empty means the single default Ollama server. Endpoints failing EJECT_AFTER times in a row are ejected for
+# EJECT_SECONDS; health checks re-admit them early.
+OLLAMA_HOSTS = [h.strip() for h in os.environ.get("OLLAMA_HOSTS", "").split(",") if h.strip()]
+OLLAMA_HOST_CONCURRENCY = int(os.environ.get("OLLAMA_HOST_CONCURRENCY", 2))
+OLLAMA_HOST_RPM = int(os.environ.get("OLLAMA_HOST_RPM", 0))  # requests per minute per endpoint, 0 = unlimited
+BACKEND_POOL_STRATEGY = os.environ.get("BACKEND_POOL_STRATEGY", "least_outstanding")  # or "weighted_round_robin"
+BACKEND_EJECT_AFTER = 3
+BACKEND_EJECT_SECONDS = 30
+BACKEND_HEALTH_INTERVAL = 15
+
+# Rate-limit-aware scheduling: a request starts only when the backend's requests-per-minute and tokens-per-minute
+# budgets allow it (0 = unlimited; the prompt is counted plus the reserved completion tokens). 429s, 5xx and
+# timeouts are retried with jittered exponential backoff, honouring Retry-After.
+RATE_LIMITS = {
+    "openai": {"rpm": int(os.environ.get("OPENAI_RPM", 3500)), "tpm": int(os.environ.get("OPENAI_TPM", 200000))},
+    "ollama": {"rpm": 0, "tpm": 0},
+}
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 5))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# Structured output: ask the backend for schema-shaped JSON (prompts/schemas.py) and retry only the chunks
+# whose response fails validation
+STRUCTURED_OUTPUT = os.environ.get("STRUCTURED_OUTPUT", "true").lower() == "true"
+STRUCTURED_MAX_RETRIES = 2
+
+# Content-addressed cache of per-chunk LLM results (key: rendered prompt, model, temperature)
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE", "true").lower() == "true"
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Multi-file packing: small files share one request instead of each paying for the full instruction prompt
+PACK_SMALL_FILES = os.environ.get("PACK_SMALL_FILES", "true").lower() == "true"
+PACK_MAX_FILE_TOKENS = 800  # files estimated below this size are packing candidates
+PACK_MAX_FILES = 8  # files per packed request, bounds the size of the combined response
+PACK_OUTPUT_TOKENS = 2400  # context reserved for the combined response
+
+# Project summary: "tree" map-reduces role groups that exceed one context window so every file contributes;
+# "truncate" keeps the old behaviour of dropping summaries once the budget is full
+PROJECT_SUMMARY_MODE = os.environ.get("PROJECT_SUMMARY_MODE", "tree")
+SUMMARY_REDUCE_MAX_LEVELS = 8
+
 OUTPUT_FOLDER = "output/"
 OUTPUT_FILE_LEVEL_SUMMERY_NAME = "_file_level_summary.json"
 OUTPUT_PROJECT_LEVEL_SUMMERY_NAME = "_project_summary.json"
+# File-level results are streamed here as each file completes; the JSON above is produced from it afterwards
+OUTPUT_FILE_LEVEL_STREAM_NAME = "_file_level_summary.jsonl"
+STREAM_FSYNC_EVERY = 20
+
+# Run metrics (stage timings, token usage, latency percentiles, cache and retry counts) are written to
+# output/<project>_run_metrics.json; optionally also as a Prometheus text file (e.g. for node_exporter's textfile
+# collector) and on a live http://METRICS_HOST:METRICS_PORT/metrics endpoint while the run is in progress. The
+# metrics include file paths, so the endpoint only listens on localhost unless METRICS_HOST says otherwise.
+OUTPUT_RUN_METRICS_NAME = "_run_metrics.json"
+METRICS_PROMETHEUS_FILE = os.environ.get("METRICS_PROMETHEUS_FILE", "")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+
+# Distributed mode (--mode coordinator/worker): the coordinator enqueues one task per file in a SQLite queue
+# (output/<project>_work_queue.sqlite unless --queue is given) and workers lease them. A lease not completed or
+# renewed within WORK_QUEUE_LEASE_SECONDS is requeued; a task is given up after WORK_QUEUE_MAX_ATTEMPTS leases.
+OUTPUT_WORK_QUEUE_NAME = "_work_queue.sqlite"
+WORK_QUEUE_LEASE_SECONDS = int(os.environ.get("WORK_QUEUE_LEASE_SECONDS", 300))
+WORK_QUEUE_MAX_ATTEMPTS = int(os.environ.get("WORK_QUEUE_MAX_ATTEMPTS", 3))
+WORK_QUEUE_POLL_SECONDS = float(os.environ.get("WORK_QUEUE_POLL_SECONDS", 2))
+
+# Semantic search: after a run, every file summary and method description is embedded locally in batches of
+# EMBEDDING_BATCH_SIZE and stored as a float32 matrix in output/<project>_embeddings.npy (memory-mapped for search)
+# with its metadata in output/<project>_embeddings.json. EMBEDDING_BACKEND "ollama" uses EMBEDDING_MODEL on the
+# local Ollama server; "hashing" is a dependency-free bag-of-words embedding of EMBEDDING_DIM dimensions, also used
+# when Ollama is not reachable.
+EMBEDDINGS = os.environ.get("EMBEDDINGS", "false").lower() == "true"
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "ollama")
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "nomic-embed-text")
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", 64))
+EMBEDDING_DIM = 1024
+OUTPUT_EMBEDDINGS_NAME = "_embeddings"
+SEARCH_TOP_K = 10
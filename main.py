@@ -1,67 +1,378 @@
-import sys
+import argparse
+import asyncio
+import json
 import os
+import time
 
-from config import MODEL_NAME, USE_OPENAI, IGNORE_FILE_FOLDERS, OUTPUT_FOLDER, \
-    OUTPUT_FILE_LEVEL_SUMMERY_NAME, OUTPUT_PROJECT_LEVEL_SUMMERY_NAME, LOCAL_REPO_BASE_PATH
+from config import MODEL_NAME, IGNORE_FILE_FOLDERS, OUTPUT_FOLDER, \
+    OUTPUT_FILE_LEVEL_SUMMERY_NAME, OUTPUT_PROJECT_LEVEL_SUMMERY_NAME, LOCAL_REPO_BASE_PATH, ASYNC_MODE, \
+    FILE_CONCURRENCY, PACK_SMALL_FILES, OUTPUT_FILE_LEVEL_STREAM_NAME, DEDUP_ENABLED, OUTPUT_RUN_METRICS_NAME, \
+    METRICS_PROMETHEUS_FILE, METRICS_PORT, OUTPUT_WORK_QUEUE_NAME, SYMBOL_INDEX, OUTPUT_SYMBOL_INDEX_NAME, \
+    DEPENDENCY_LIMIT, EMBEDDINGS, OUTPUT_EMBEDDINGS_NAME, SEARCH_TOP_K, OLLAMA_PRELOAD, OLLAMA_UNLOAD_AT_EXIT
+from utils.chains import get_backend_limits, get_backend_name
+from utils.concurrency import ConcurrencyLimiter
+from utils.dedup import find_duplicates, group_duplicates
+from utils.embeddings import EmbeddingIndex, build_embedding_index
+from utils.file_packing import estimate_file_tokens, format_file_block, is_small_file, pack_files
 from utils.file_utils import get_code_files, infer_language_from_path, write_json, get_project_name_from_path
-from runners.summarize_code import summarize_code
+from runners.summarize_code import summarize_code, asummarize_code
+from runners.summarize_batch import summarize_file_batch, asummarize_file_batch
 from runners.summarize_project import summarize_project
-from utils.git_utils import clone_repo
+from runners.distributed import run_coordinator, run_worker, spawn_local_workers
+from utils.git_utils import clone_repo, clone_or_fetch, get_head_commit, is_git_repo
+from utils.incremental import plan_incremental, merge_results
+from utils.jsonl_store import JsonlWriter, iter_jsonl, iter_ordered, jsonl_to_json, load_completed_paths
+from utils.llm_cache import get_llm_cache
 from utils.logging_utils import setup_logger
-from utils.ollama_util import stop_ollama_model
+from utils.metrics import get_run_metrics, reset_run_metrics, serve_metrics
+from utils.model_router import get_model_tiers
+from utils.ollama_util import preload_models, unload_models
+from utils.static_analysis import shutdown_pool
+from utils.symbol_index import build_symbol_index
+from utils.token_counter import count_tokens
+from utils.work_queue import WorkQueue
 
+logger = setup_logger()
 
-def main():
-    logger = setup_logger()
-    repo_url = sys.argv[1] if len(sys.argv) > 1 else None
+
+def load_source(path):
+    """Returns (language, code) for a supported, non-empty file, otherwise None."""
+    logger.info(f"\nProcessing: {path}")
+    language = infer_language_from_path(path)
+    logger.info(f"Language: {language}")
+
+    if not language or language.lower() == "unknown":
+        logger.warn(f"Skipping unsupported language: {path}")
+        return None
+
+    try:
+        with get_run_metrics().stage("read"), open(path, encoding="utf-8") as f:
+            code = f.read()
+    except Exception as e:
+        logger.error(f"Read error: {e}")
+        return None
+
+    if not code.strip():
+        logger.warn(f"Skipping empty file: {path}")
+        return None
+
+    return language, code
+
+
+def plan_packing(files):
+    """Splits files into batches of small file paths, packed by their size on disk, and paths to summarize alone.
+    Sources are only read when their batch is dispatched, see load_batch."""
+    if not PACK_SMALL_FILES:
+        return [], list(files)
+    small = [(path, estimate_file_tokens(path)) for path in files if is_small_file(path)]
+    # The file block's header (path, separators) counts too
+    sizes = [tokens + count_tokens(format_file_block(path, "", "")) for path, tokens in small]
+    batches, _ = pack_files([(path,) for path, _ in small], sizes=sizes)
+    batches = [[path for path, in batch] for batch in batches]
+    if batches:
+        logger.info(f"Packing {sum(len(b) for b in batches)} small files into {len(batches)} requests")
+    packed = {path for batch in batches for path in batch}
+    return batches, [path for path in files if path not in packed]
+
+
+def load_batch(batch):
+    """Reads a planned batch and packs it again with exact token counts: (batches of (path, language, code)
+    sources, paths that no longer share a request and are summarized alone)."""
+    sources = []
+    for path in batch:
+        source = load_source(path)
+        if source is not None:
+            sources.append((path, *source))
+    batches, leftovers = pack_files(sources)
+    return batches, [path for path, _, _ in leftovers]
+
+
+def order_results(files, entries):
+    by_path = {entry["file"]: entry for entry in entries}
+    return [by_path[path] for path in files if path in by_path]
+
+
+def summarize_files(files, on_result=None):
+    """Summarizes `files` one request at a time. With `on_result`, each entry is handed over as soon as it
+    completes and nothing is accumulated; otherwise the entries are returned in the order of `files`."""
+    results = []
+    emit = on_result or results.append
+    metrics = get_run_metrics()
+    planned, singles = plan_packing(files)
+    for paths in planned:
+        batches, alone = load_batch(paths)
+        for batch in batches:
+            start = time.perf_counter()
+            entries = summarize_file_batch(batch)
+            for entry in entries:
+                metrics.record_file(entry["file"], time.perf_counter() - start)  # packed files share one request
+                emit(entry)
+        singles.extend(alone)
+    for path in singles:
+        entry = summarize_path(path)
+        if entry is not None:
+            emit(entry)
+    return None if on_result else order_results(files, results)
+
+
+async def asummarize_files(files, on_result=None):
+    # Files are read lazily once a file slot frees up, so only FILE_CONCURRENCY sources are held at once.
+    # Entries are emitted in completion order; collected results are put back in the order of `files`.
+    results = []
+    emit = on_result or results.append
+    limiter = ConcurrencyLimiter(backend_limits=get_backend_limits())
+    file_slots = asyncio.Semaphore(max(1, FILE_CONCURRENCY))
+    metrics = get_run_metrics()
+    planned, singles = plan_packing(files)
+
+    async def run(path):
+        async with file_slots:
+            start = time.perf_counter()
+            source = load_source(path)
+            if source is None:
+                return
+            language, code = source
+            entry = await asummarize_code(code, language, path, limiter)
+            metrics.record_file(path, time.perf_counter() - start)
+            emit(entry)
+
+    async def run_batch(paths):
+        async with file_slots:
+            batches, alone = load_batch(paths)
+            for batch in batches:
+                start = time.perf_counter()
+                for entry in await asummarize_file_batch(batch, limiter):
+                    metrics.record_file(entry["file"], time.perf_counter() - start)
+                    emit(entry)
+        # Outside the file slot: each takes a slot of its own
+        await asyncio.gather(*(run(path) for path in alone))
+
+    await asyncio.gather(*(run_batch(paths) for paths in planned), *(run(path) for path in singles))
+    return None if on_result else order_results(files, results)
+
+
+def summarize_path(path):
+    """One file's entry, or None for a file that is skipped (unsupported, unreadable or empty)."""
+    source = load_source(path)
+    if source is None:
+        return None
+    language, code = source
+    start = time.perf_counter()
+    entry = summarize_code(code, language, path)
+    get_run_metrics().record_file(path, time.perf_counter() - start)
+    return entry
+
+
+def coordinate_files(queue_path, files, on_result, workers=0, resume=False):
+    """Distributed mode: `files` become tasks in the work queue at `queue_path`, summarized by `workers` local
+    worker processes and/or workers started elsewhere on the same queue. Without `resume` a previous queue is
+    discarded."""
+    if not resume:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(queue_path + suffix):
+                os.remove(queue_path + suffix)
+    queue = WorkQueue(queue_path)
+    try:
+        run_coordinator(queue, files, on_result, spawn_local_workers(queue_path, workers))
+    finally:
+        queue.close()
+
+
+def with_duplicates(emit, members):
+    """Wraps `emit` so each representative's entry is followed by entries for its duplicates, which reuse its
+    description and point at it with `duplicate_of`."""
+    def on_result(entry):
+        emit(entry)
+        for path in members.get(entry["file"], ()):
+            emit({"file": path, "description": entry["description"], "duplicate_of": entry["file"]})
+    return on_result
+
+
+def with_dependencies(emit, index):
+    """Wraps `emit` so each entry lists the files it uses and the files using it, from the symbol index."""
+    if index is None:
+        return emit
+
+    def on_result(entry):
+        emit({**entry, "dependencies": index.neighbours(entry["file"], DEPENDENCY_LIMIT)})
+    return on_result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="LLM-based codebase analysis")
+    parser.add_argument("repo_url", nargs="?", help="Git URL to clone (or fetch, with --incremental)")
+    parser.add_argument("--local-path", help="Analyze an existing local checkout instead of cloning")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-summarize files changed since the last recorded analysis commit")
+    parser.add_argument("--base-commit", help="Diff against this commit instead of the recorded one")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run, skipping files already in the .jsonl stream")
+    parser.add_argument("--mode", choices=["local", "coordinator", "worker"], default="local",
+                        help="local: summarize in this process; coordinator: enqueue files in a work queue for "
+                             "worker processes (possibly on other nodes) and write the results; worker: summarize "
+                             "files leased from --queue")
+    parser.add_argument("--queue", help="Work queue file (default: output/<project>_work_queue.sqlite)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Worker processes the coordinator starts on this machine")
+    parser.add_argument("--worker-id", help="Name of this worker in the queue (default: host-pid)")
+    parser.add_argument("--where", metavar="SYMBOL",
+                        help="Print where SYMBOL (a name or Class.method) is defined, from the symbol index, and exit "
+                             "without summarizing")
+    parser.add_argument("--search", metavar="QUERY",
+                        help="Print the file summaries and method descriptions of the last run closest to QUERY "
+                             "(needs EMBEDDINGS=true on that run) and exit")
+    parser.add_argument("--top-k", type=int, default=SEARCH_TOP_K, help="Results printed by --search")
+    args = parser.parse_args(argv)
+    if args.mode == "worker" and not args.queue:
+        parser.error("--mode worker needs --queue")
+    return args
+
+
+def write_run_metrics(project_name, commit):
+    metrics = get_run_metrics()
+    metrics_path = OUTPUT_FOLDER + project_name + OUTPUT_RUN_METRICS_NAME
+    metrics.write_json(metrics_path, project=project_name, commit=commit, backend=get_backend_name(),
+                       model=MODEL_NAME, async_mode=ASYNC_MODE)
+    logger.info(f"Run metrics written to {metrics_path}")
+    if METRICS_PROMETHEUS_FILE:
+        metrics.write_prometheus(METRICS_PROMETHEUS_FILE)
+
+
+def tier_models():
+    return list(dict.fromkeys(tier.model for tier in get_model_tiers()))
+
+
+def start_preload():
+    """Loads the Ollama models in the background (while the repository is scanned), or None."""
+    if get_backend_name() != "ollama" or not OLLAMA_PRELOAD:
+        return None
+    return preload_models(tier_models())
+
+
+def stop_metrics_server(server):
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        run(args)
+    finally:
+        shutdown_pool()
+
+
+def run(args):
+    if args.mode == "worker":
+        start_preload()
+        run_worker(args.queue, summarize_path, args.worker_id)
+        return
+    metrics = reset_run_metrics()
+    metrics_server = serve_metrics(METRICS_PORT) if METRICS_PORT else None
     project_name = "repo"
     project_path = LOCAL_REPO_BASE_PATH
-    if repo_url:
-        project_name, project_path = clone_repo(repo_url, LOCAL_REPO_BASE_PATH)
+    if args.local_path:
+        project_path = args.local_path
+        project_name = get_project_name_from_path(project_path)
+    elif args.repo_url:
+        fetch = clone_or_fetch if args.incremental else clone_repo
+        project_name, project_path = fetch(args.repo_url, LOCAL_REPO_BASE_PATH)
+
+    if args.search:
+        embeddings_path = OUTPUT_FOLDER + project_name + OUTPUT_EMBEDDINGS_NAME
+        if not os.path.exists(embeddings_path + ".json"):
+            logger.error(f"No embedding index for {project_name} at {embeddings_path}.npy; "
+                         f"run the analysis with EMBEDDINGS=true first")
+        else:
+            for hit in EmbeddingIndex(embeddings_path).search(args.search, args.top_k):
+                print(json.dumps(hit))
+        stop_metrics_server(metrics_server)
+        return
 
     os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    file_summary_path = OUTPUT_FOLDER + project_name + OUTPUT_FILE_LEVEL_SUMMERY_NAME
+    project_summary_path = OUTPUT_FOLDER + project_name + OUTPUT_PROJECT_LEVEL_SUMMERY_NAME
 
+    preload = None if args.where else start_preload()
     logger.info(f"Scanning: {project_path}")
-    files = get_code_files(project_path, IGNORE_FILE_FOLDERS)
-    results = []
+    with metrics.stage("scan"):
+        files = get_code_files(project_path, IGNORE_FILE_FOLDERS)
+
+    index = None
+    if SYMBOL_INDEX or args.where:
+        with metrics.stage("symbol_index"):
+            index = build_symbol_index(files, OUTPUT_FOLDER + project_name + OUTPUT_SYMBOL_INDEX_NAME)
+    if args.where:
+        for definition in index.where_defined(args.where):
+            print(json.dumps(definition))
+        index.close()
+        stop_metrics_server(metrics_server)
+        return
+
+    plan = plan_incremental(project_path, files, file_summary_path, args.base_commit) if args.incremental else None
+    files_to_summarize = plan.to_summarize if plan else files
+
+    stream_path = OUTPUT_FOLDER + project_name + OUTPUT_FILE_LEVEL_STREAM_NAME
+    completed = load_completed_paths(stream_path) if args.resume else set()
+    if completed:
+        logger.info(f"Resuming: {len(completed)} files already summarized in {stream_path}")
+    pending = [path for path in files_to_summarize if os.path.normpath(path) not in completed]
 
-    for path in files:
-        logger.info(f"\nProcessing: {path}")
-        language = infer_language_from_path(path)
-        logger.info(f"Language: {language}")
+    with metrics.stage("dedup"):
+        duplicates = find_duplicates(pending) if DEDUP_ENABLED else {}
+    representatives = [path for path in pending if path not in duplicates]
 
-        if not language or language.lower() == "unknown":
-            logger.warn(f"Skipping unsupported language: {path}")
-            continue
+    with JsonlWriter(stream_path, append=args.resume) as writer:
+        emit = with_duplicates(with_dependencies(writer.write, index), group_duplicates(duplicates))
+        if args.mode == "coordinator":
+            queue_path = args.queue or OUTPUT_FOLDER + project_name + OUTPUT_WORK_QUEUE_NAME
+            coordinate_files(queue_path, representatives, emit, args.workers, args.resume)
+        elif ASYNC_MODE:
+            asyncio.run(asummarize_files(representatives, emit))
+        else:
+            summarize_files(representatives, emit)
 
-        try:
-            with open(path, encoding="utf-8") as f:
-                code = f.read()
-        except Exception as e:
-            logger.error(f"Read error: {e}")
-            continue
+    cache = get_llm_cache()
+    if cache is not None:
+        cache.log_stats()
 
-        if not code.strip():
-            logger.warn(f"Skipping empty file: {path}")
-            continue
+    commit = get_head_commit(project_path) if is_git_repo(project_path) else None
+    summaries_changed = True
+    if plan:
+        results, summaries_changed = merge_results(plan, list(iter_jsonl(stream_path)), files)
+        write_json({"project": project_name, "commit": commit, "files": results}, file_summary_path)
+    else:
+        jsonl_to_json(stream_path, file_summary_path, {"project": project_name, "commit": commit}, order=files)
+        results = iter_ordered(stream_path, files)
 
-        summaries = summarize_code(code, language, path)
-        results.append(summaries)
+    if not summaries_changed and os.path.exists(project_summary_path):
+        logger.info("\nNo file summaries changed, keeping the existing project-level summary")
+    else:
+        logger.info("\nGenerating project-level summary...")
+        with metrics.stage("project_summary"):
+            project_summary = summarize_project(results, index.centrality() if index else None)
+        logger.info(f"\nProject Summary:\n{project_summary}")
 
-    write_json({"project": project_name, "files": results},
-               OUTPUT_FOLDER + project_name + OUTPUT_FILE_LEVEL_SUMMERY_NAME)
+        write_json({
+            "project": project_name,
+            "summary": project_summary,
+        }, project_summary_path)
 
-    logger.info("\nGenerating project-level summary...")
-    project_summary = summarize_project(results)
-    logger.info(f"\nProject Summary:\n{project_summary}")
+    embeddings_path = OUTPUT_FOLDER + project_name + OUTPUT_EMBEDDINGS_NAME
+    if EMBEDDINGS and (summaries_changed or not os.path.exists(embeddings_path + ".npy")):
+        with metrics.stage("embed"):
+            build_embedding_index(results if plan else iter_ordered(stream_path, files), embeddings_path)
 
-    write_json({
-        "project": project_name,
-        "summary": project_summary,
-    }, OUTPUT_FOLDER + project_name + OUTPUT_PROJECT_LEVEL_SUMMERY_NAME)
+    if index is not None:
+        index.close()
+    if preload is not None:
+        preload.join()  # long finished by now; its load time goes into the metrics
+    write_run_metrics(project_name, commit)
+    stop_metrics_server(metrics_server)
 
-    if not USE_OPENAI:
-        stop_ollama_model(MODEL_NAME)
+    if get_backend_name() == "ollama" and OLLAMA_UNLOAD_AT_EXIT:
+        unload_models(tier_models())
 
 
 if __name__ == "__main__":
@@ -1,9 +1,27 @@
 from langchain.prompts import PromptTemplate
 
+# Rolling chunk mode (CHUNK_MODE=rolling): chunks of a file are sent in order, each with what the earlier ones found
+ROLLING_STATE_SECTION = """
+This chunk continues the file; earlier chunks were already analyzed and found:
+{state}
 
-def get_code_analysis_prompt() -> PromptTemplate:
-    return PromptTemplate(
+Update "file_summary" (and "file_complexity_estimate", if present) to cover the whole file up to the end of this
+chunk, building on the summary above. In the lists, return only what is new in this chunk: never repeat a method
+listed above.
+"""
+
+
+def _chunk_prompt(template, input_variables, rolling):
+    if rolling:
+        template = template.replace("\nHere is the code:", ROLLING_STATE_SECTION + "\nHere is the code:")
+        input_variables = [*input_variables[:-1], "state", input_variables[-1]]
+    return PromptTemplate(input_variables=input_variables, template=template)
+
+
+def get_code_analysis_prompt(rolling=False) -> PromptTemplate:
+    return _chunk_prompt(
         input_variables=["language", "file_path", "chunk_num", "total_chunks", "code"],
+        rolling=rolling,
         template="""
 You are an expert software engineer specializing in {language}.
 
@@ -51,3 +69,88 @@ Here is the code:
 -------------------
 """
     )
+
+
+def get_code_description_prompt(rolling=False) -> PromptTemplate:
+    return _chunk_prompt(
+        input_variables=["language", "file_path", "chunk_num", "total_chunks", "facts", "code"],
+        rolling=rolling,
+        template="""
+You are an expert software engineer specializing in {language}.
+
+You are describing a chunk of the source code from:
+- File path: {file_path}
+- Language: {language}
+- Chunk: {chunk_num}/{total_chunks} (may be partial)
+
+The methods defined in this chunk were extracted by a parser (signatures and complexity are already known):
+{facts}
+
+Describe only what is visible in the chunk. Use the method names exactly as listed above.
+
+Return ONLY a valid JSON object, no markdown or explanations:
+
+Expected JSON:
+{{
+  "file_summary": "One-line summary of what the file does (technical + business-level insights if possible).",
+  "methods": [
+    {{
+      "method_name": "name of a listed method",
+      "description": "short, precise summary of what the method does"
+    }}
+  ],
+  "mocks": ["list any mocking frameworks or mock objects used"],
+  "assertions": ["list any assertions or test validations used"],
+  "noteworthy": ["code quality, naming, security, performance or refactoring notes"]
+}}
+
+Here is the code:
+-------------------
+{code}
+-------------------
+"""
+    )
+
+
+def get_multi_file_analysis_prompt() -> PromptTemplate:
+    return PromptTemplate(
+        input_variables=["file_count", "files"],
+        template="""
+You are an expert software engineer. You are analyzing {file_count} small, complete source files.
+Analyze each file independently; each one starts with a "### File:" header giving its path and language.
+
+**DO NOT invent** any method names or functionality not explicitly visible in a file.
+
+Follow these strict rules:
+- Return exactly one entry per file, using the file path exactly as given in its header.
+- If no methods are clearly defined in a file, return an empty "methods" array for it.
+- Do not mix up details between files.
+
+Return ONLY a valid JSON object, no markdown or explanations:
+
+Expected JSON:
+{{
+  "files": [
+    {{
+      "file_path": "path exactly as given in the file header",
+      "file_summary": "One-line summary of what the file does (technical + business-level insights if possible).",
+      "file_complexity_estimate": "approximate cyclomatic complexity of the file",
+      "methods": [
+        {{
+          "method_name": "name of the method",
+          "signature": "full method signature",
+          "description": "short, precise summary of what the method does",
+          "complexity": "cyclomatic complexity estimate (optional)"
+        }}
+      ],
+      "mocks": ["list any mocking frameworks or mock objects used"],
+      "assertions": ["list any assertions or test validations used"],
+      "noteworthy": ["code quality, naming, security, performance or refactoring notes"]
+    }}
+  ]
+}}
+
+Here are the files:
+{files}
+"""
+    )
@@ -21,3 +21,37 @@ Using this input, generate a comprehensive project-level JSON summary that inclu
 Return ONLY a valid JSON object.
         """.strip()
     )
+
+
+def get_partial_summary_prompt() -> PromptTemplate:
+    return PromptTemplate(
+        input_variables=["grouped_descriptions"],
+        template="""
+You are analyzing one part of a larger software project. Below are summaries of some of its source code files, grouped by role:
+
+{grouped_descriptions}
+
+Write a concise summary of this part of the project as plain-text bullet points covering:
+- what this part does (business and technical purpose)
+- its main features or responsibilities
+- languages, frameworks and tools in use
+- testing patterns and mock usage
+- architectural and design patterns observed
+
+Only describe what the summaries support. Keep it under 250 words and do not return JSON.
+        """.strip()
+    )
+
+
+def get_summary_merge_prompt() -> PromptTemplate:
+    return PromptTemplate(
+        input_variables=["partial_summaries"],
+        template="""
+Below are summaries of different parts of the same software project:
+
+{partial_summaries}
+
+Merge them into one concise summary as plain-text bullet points covering purpose, main features, technology stack, testing and mocks, and architecture and patterns.
+Keep every distinct feature and technology, drop repetition, keep it under 250 words and do not return JSON.
+        """.strip()
+    )
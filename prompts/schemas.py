@@ -0,0 +1,63 @@
+# JSON schema for the fields requested by get_code_analysis_prompt. It drives the backends' structured-output
+# options (Ollama `format`, OpenAI JSON mode) and validation of every response.
+_METHOD_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "method_name": {"type": "string"},
+        "signature": {"type": "string"},
+        "description": {"type": "string"},
+        "complexity": {"type": ["number", "string", "null"]},
+    },
+    "required": ["method_name", "description"],
+}
+
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+CODE_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "file_summary": {"type": "string"},
+        "file_complexity_estimate": {"type": ["number", "string", "null"]},
+        "methods": {"type": "array", "items": _METHOD_SCHEMA},
+        "mocks": _STRING_LIST,
+        "assertions": _STRING_LIST,
+        "noteworthy": _STRING_LIST,
+    },
+    "required": ["file_summary", "methods"],
+}
+
+
+def get_multi_file_analysis_schema():
+    """Schema for get_multi_file_analysis_prompt: one code-analysis entry per file path."""
+    entry = {
+        "type": "object",
+        "properties": {"file_path": {"type": "string"}, **CODE_ANALYSIS_SCHEMA["properties"]},
+        "required": ["file_path"] + CODE_ANALYSIS_SCHEMA["required"],
+    }
+    return {
+        "type": "object",
+        "properties": {"files": {"type": "array", "items": entry}},
+        "required": ["files"],
+    }
+
+
+# Schema for get_code_description_prompt: names, signatures and complexity come from static analysis,
+# so only descriptions are requested
+CODE_DESCRIPTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "file_summary": {"type": "string"},
+        "methods": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"method_name": {"type": "string"}, "description": {"type": "string"}},
+                "required": ["method_name", "description"],
+            },
+        },
+        "mocks": _STRING_LIST,
+        "assertions": _STRING_LIST,
+        "noteworthy": _STRING_LIST,
+    },
+    "required": ["file_summary", "methods"],
+}
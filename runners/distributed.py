@@ -0,0 +1,96 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from config import WORK_QUEUE_POLL_SECONDS
+from utils.logging_utils import setup_logger
+from utils.work_queue import WorkQueue
+
+logger = setup_logger()
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _keep_lease(queue, task, worker_id, stop):
+    # Renews the lease at a third of its length while the file is being summarized
+    while not stop.wait(queue.lease_seconds / 3):
+        if not queue.extend(task, worker_id):
+            logger.warning(f"Worker {worker_id} lost its lease on {task.path}")
+            return
+
+
+def run_worker(queue_path, summarize, worker_id=None, poll_seconds=WORK_QUEUE_POLL_SECONDS):
+    """Leases files from the queue and stores `summarize(path)` for each until no task is pending or leased.
+    Returns the number of tasks this worker completed."""
+    worker_id = worker_id or default_worker_id()
+    queue = WorkQueue(queue_path)
+    completed = 0
+    logger.info(f"Worker {worker_id} started on {queue_path}")
+    try:
+        while True:
+            task = queue.lease(worker_id)
+            if task is None:
+                if queue.is_finished():
+                    break
+                time.sleep(poll_seconds)  # other workers hold the remaining leases; they may still expire
+                continue
+            stop = threading.Event()
+            threading.Thread(target=_keep_lease, args=(queue, task, worker_id, stop), daemon=True).start()
+            try:
+                result = summarize(task.path)
+            except Exception as e:
+                logger.error(f"[Error] Worker {worker_id} failed on {task.path} (attempt {task.attempts}): {e}")
+                queue.fail(task, worker_id, e)
+                continue
+            finally:
+                stop.set()
+            if queue.complete(task, worker_id, result):
+                completed += 1
+    finally:
+        queue.close()
+    logger.info(f"Worker {worker_id} finished after {completed} tasks")
+    return completed
+
+
+def spawn_local_workers(queue_path, count):
+    """Starts `count` worker processes of this checkout on the same queue."""
+    return [subprocess.Popen([sys.executable, MAIN_SCRIPT, "--mode", "worker", "--queue", queue_path,
+                              "--worker-id", f"{socket.gethostname()}-local{i}"]) for i in range(count)]
+
+
+def run_coordinator(queue, paths, emit, processes=(), poll_seconds=WORK_QUEUE_POLL_SECONDS):
+    """Enqueues `paths` and hands every completed result to `emit` (in completion order) until the queue is
+    drained. Results of tasks completed before this call (a resumed queue) are emitted too."""
+    queue.enqueue(paths)
+    if not processes:
+        logger.info(f"Waiting for workers: python main.py --mode worker --queue {queue.path}")
+    last_seq = 0
+    last_counts = None
+    while True:
+        finished = queue.is_finished()  # checked before draining, so no result completed after it is missed
+        for last_seq, _, result in queue.iter_completed(last_seq):
+            if result is not None:
+                emit(result)
+        if finished:
+            break
+        if processes and all(p.poll() is not None for p in processes):
+            logger.error(f"All local workers exited with tasks left: {queue.counts()}")
+            break
+        counts = queue.counts()
+        if counts != last_counts:
+            logger.info(f"Work queue: {counts}")
+            last_counts = counts
+        queue.requeue_expired()
+        time.sleep(poll_seconds)
+
+    for path, error in queue.failed_tasks():
+        logger.error(f"[Error] Gave up on {path}: {error}")
+    for process in processes:
+        process.wait()
@@ -0,0 +1,117 @@
+import asyncio
+
+from config import PACK_OUTPUT_TOKENS, STATIC_ANALYSIS
+from prompts.language_prompts import get_multi_file_analysis_prompt
+from prompts.schemas import CODE_ANALYSIS_SCHEMA
+from runners.summarize_code import summarize_code, asummarize_code, merge_chunk_results, run_with_longchain, \
+    arun_with_longchain
+from utils.chains import build_chain_for_file_batch, get_backend_name
+from utils.extract import extract_json_objects
+from utils.file_packing import build_pack_prompt_input, split_batch_response
+from utils.logging_utils import setup_logger
+from utils.metrics import get_run_metrics
+from utils.model_router import get_model_tiers
+from utils.scheduler import get_scheduler
+from utils.static_analysis import extract_facts, aextract_facts, apply_facts
+from utils.validation import validate
+
+logger = setup_logger()
+
+
+def parse_valid_batch(raw):
+    """Multi-file responses are cached when they are JSON with a files list; entries are validated one by one."""
+    with get_run_metrics().stage("parse"):
+        return [obj for obj in extract_json_objects([raw], required_key="files")
+                if isinstance(obj.get("files"), list)]
+
+
+def _split_results(batch, raw):
+    """Per-file entries in batch order, plus the sources the combined response did not cover
+    (or covered with an entry that fails schema validation)."""
+    entries = split_batch_response(raw, [path for path, _, _ in batch]) if raw else {}
+    results = {path: merge_chunk_results(path, [entry]) for path, entry in entries.items()
+               if not validate(entry, CODE_ANALYSIS_SCHEMA)}
+    missing = [src for src in batch if src[0] not in results]
+    if missing:
+        logger.warning(f"Packed response missed {len(missing)}/{len(batch)} files")
+    return results, missing
+
+
+def batch_route():
+    """(tier, chain) for a packed batch: packed files are small, so the batch goes to the cheapest tier; files
+    its response does not cover validly are escalated to the next tiers as a smaller batch."""
+    route = [(tier, build_chain_for_file_batch(tier.model)) for tier in get_model_tiers()]
+    get_run_metrics().count(f"routed_{route[0][0].name}")
+    return route
+
+
+def _log_batch_escalation(pending, tier):
+    get_run_metrics().count("escalations")
+    logger.info(f"Escalating {len(pending)} packed files to the {tier.name} model {tier.model}")
+
+
+def _apply_static_facts(results, batch, facts):
+    # Exact complexity, signatures and line spans replace the model's guesses for the files it covered
+    for (path, _, _), file_facts in zip(batch, facts):
+        if path in results and file_facts is not None:
+            results[path]["description"] = apply_facts(results[path]["description"], file_facts)
+
+
+async def _no_facts():
+    return None
+
+
+def summarize_file_batch(batch):
+    """Summarizes several small (path, language, code) sources with one request.
+    Returns one `{"file", "description"}` entry per source, in batch order."""
+    results, pending = {}, list(batch)
+    for step, (tier, chain) in enumerate(batch_route()):
+        if step:
+            _log_batch_escalation(pending, tier)
+        logger.info(f"\nSummarizing {len(pending)} small files in one request...")
+        raw = None
+        try:
+            raw = run_with_longchain(chain, build_pack_prompt_input(pending), get_multi_file_analysis_prompt(),
+                                     parse_valid_batch, PACK_OUTPUT_TOKENS, tier.model)
+        except Exception as e:
+            logger.error(f"[Error] Failed summarizing packed files: {e}")
+        covered, pending = _split_results(pending, raw)
+        results.update(covered)
+        if not pending:
+            break
+
+    if STATIC_ANALYSIS:
+        _apply_static_facts(results, batch, [extract_facts(code, language) for _, language, code in batch])
+    for path, language, code in pending:
+        results[path] = summarize_code(code, language, path)
+    return [results[path] for path, _, _ in batch]
+
+
+async def asummarize_file_batch(batch, limiter):
+    # Parsing runs on the process pool while the request is in flight
+    facts = asyncio.gather(*(aextract_facts(code, language) if STATIC_ANALYSIS else _no_facts()
+                             for _, language, code in batch))
+    results, pending = {}, list(batch)
+    priority = (get_scheduler(get_backend_name()).new_job(), 0)
+    for step, (tier, chain) in enumerate(batch_route()):
+        if step:
+            _log_batch_escalation(pending, tier)
+        raw = None
+        async with limiter.slot(get_backend_name(), priority):
+            try:
+                logger.info(f"\nSummarizing {len(pending)} small files in one request...")
+                raw = await arun_with_longchain(chain, build_pack_prompt_input(pending),
+                                                get_multi_file_analysis_prompt(), parse_valid_batch,
+                                                PACK_OUTPUT_TOKENS, priority, tier.model)
+            except Exception as e:
+                logger.error(f"[Error] Failed summarizing packed files: {e}")
+        covered, pending = _split_results(pending, raw)
+        results.update(covered)
+        if not pending:
+            break
+
+    _apply_static_facts(results, batch, await facts)
+    fallbacks = await asyncio.gather(*(asummarize_code(code, language, path, limiter)
+                                       for path, language, code in pending))
+    results.update((entry["file"], entry) for entry in fallbacks)
+    return [results[path] for path, _, _ in batch]
@@ -1,8 +1,20 @@
-from prompts.language_prompts import get_code_analysis_prompt
-from utils.chains import build_chain_for_language, get_llm
+from config import MODEL_NAME, TEMPERATURE, STRUCTURED_MAX_RETRIES, MAX_TOKENS, STATIC_ANALYSIS, FACTS_TOKEN_BUDGET, \
+    CHUNK_MODE, CHUNK_OVERLAP, ROLLING_STATE_TOKENS, ROUTING_CHEAP_ATTEMPTS
+from prompts.language_prompts import get_code_analysis_prompt, get_code_description_prompt
+from prompts.schemas import CODE_ANALYSIS_SCHEMA, CODE_DESCRIPTION_SCHEMA
+from utils.chains import build_chain_for_language, build_chain_for_description, get_llm, get_backend_name
 from utils.token_aware_chunking import token_aware_chunking
 from utils.complexity import  merge_complexity_estimates
 from utils.extract import extract_json_objects
+from utils.llm_cache import get_llm_cache, make_cache_key
+from utils.metrics import get_run_metrics
+from utils.model_router import DEFAULT_TIER, route_file
+from utils.rolling_context import new_state, update_state, format_state, final_record, state_token_budget
+from utils.scheduler import get_scheduler, estimate_request_tokens
+from utils.static_analysis import extract_facts, aextract_facts, chunk_line_spans, facts_for_chunk, format_facts, \
+    apply_facts
+from utils.validation import validate, sanitize
+import asyncio
 import re
 import json
 
@@ -33,32 +45,23 @@ def deduplicate_flat_list(items):
     return list(dict.fromkeys(item.strip() for item in items if isinstance(item, str) and item.strip()))
 
 
-def summarize_code(code, language, path):
-    chunks = token_aware_chunking(code, language, path)
-    chain = build_chain_for_language()
-    results = []
+def build_prompt_inputs(chunks, language, path):
     total_chunks = len(chunks)
-    for i, chunk in enumerate(chunks):
-        try:
-            logger.info(f"\nSummarizing chunk {i + 1}/{total_chunks}...")
-            logger.debug(f"Chunk preview:\n{chunk[:500]}...")
-
-            prompt_input = {
-                "language": language,
-                "file_path": path,
-                "chunk_num": i + 1,
-                "total_chunks": total_chunks,
-                "code": chunk
-            }
-            logger.debug(f"\n>>> Prompt Input for Chunk {i + 1}:\n{json.dumps(prompt_input, indent=2)}\n")
+    return [{
+        "language": language,
+        "file_path": path,
+        "chunk_num": i + 1,
+        "total_chunks": total_chunks,
+        "code": chunk
+    } for i, chunk in enumerate(chunks)]
+
+
+def merge_chunk_results(path, results):
+    with get_run_metrics().stage("merge"):
+        return _merge_chunk_results(path, results)
 
-            # result = run_with_llm(prompt_input)
-            result = run_with_longchain(chain, prompt_input)
-            logger.debug(f"\nRaw LLM Output:\n{result}\n")
-            results.append(result)
-        except Exception as e:
-            logger.error(f"[Error] Failed summarizing chunk {i + 1}: {e}")
 
+def _merge_chunk_results(path, results):
     json_blocks = extract_json_objects(results)
     logger.debug(f"\n result of extract_json_objects:\n{json_blocks}\n")
 
@@ -83,8 +86,232 @@ def summarize_code(code, language, path):
     return {"file": path, "description": merged}
 
 
-def run_with_longchain(chain, prompt_input):
-    result = chain.invoke(prompt_input)
+def prepare_requests(code, language, path, facts):
+    """Route, prompt, response schema, per-chunk inputs and whether the chunks are sent in rolling mode. The route
+    is a list of (tier, chain): the model tier the file is routed to first, then the tiers to escalate to; chunks
+    are sized for the first. With static facts the LLM is only asked to describe the extracted methods; otherwise it
+    does the full analysis. Rolling mode (CHUNK_MODE=rolling, more than one chunk) splits without overlap and
+    leaves room for the state."""
+    tiers = route_file(code, language, path, facts)
+    rolling = CHUNK_MODE == "rolling"
+    reserved_tokens = (FACTS_TOKEN_BUDGET if facts is not None else 0) + (ROLLING_STATE_TOKENS if rolling else 0)
+    with get_run_metrics().stage("chunk"):
+        chunks = token_aware_chunking(code, language, path, reserved_tokens, overlap=0 if rolling else CHUNK_OVERLAP,
+                                      context_limit=tiers[0].context_limit)
+    rolling = rolling and len(chunks) > 1
+    prompt_inputs = build_prompt_inputs(chunks, language, path)
+    if facts is None:
+        route = [(tier, build_chain_for_language(rolling, tier.model, tier.max_tokens)) for tier in tiers]
+        return route, get_code_analysis_prompt(rolling), CODE_ANALYSIS_SCHEMA, prompt_inputs, rolling
+    for prompt_input, (start_line, end_line) in zip(prompt_inputs, chunk_line_spans(code, chunks)):
+        prompt_input["facts"] = format_facts(facts_for_chunk(facts, start_line, end_line), FACTS_TOKEN_BUDGET)
+    route = [(tier, build_chain_for_description(rolling, tier.model, tier.max_tokens)) for tier in tiers]
+    return route, get_code_description_prompt(rolling), CODE_DESCRIPTION_SCHEMA, prompt_inputs, rolling
+
+
+def finish_entry(path, results, facts):
+    entry = merge_chunk_results(path, results)
+    if facts is not None:
+        entry["description"] = apply_facts(entry["description"], facts)
+    return entry
+
+
+def summarize_code(code, language, path):
+    facts = extract_facts(code, language) if STATIC_ANALYSIS else None
+    route, prompt_template, schema, prompt_inputs, rolling = prepare_requests(code, language, path, facts)
+    (tier, chain), escalation = route[0], route[1:]
+    results = []
+    state = new_state() if rolling else None
+    total_chunks = len(prompt_inputs)
+    for i, prompt_input in enumerate(prompt_inputs):
+        try:
+            logger.info(f"\nSummarizing chunk {i + 1}/{total_chunks}...")
+            logger.debug(f"Chunk preview:\n{prompt_input['code'][:500]}...")
+            if rolling:
+                prompt_input["state"] = format_state(state, state_token_budget())
+            logger.debug(f"\n>>> Prompt Input for Chunk {i + 1}:\n{json.dumps(prompt_input, indent=2)}\n")
+
+            # result = run_with_llm(prompt_input)
+            objects = summarize_chunk(chain, prompt_input, schema, prompt_template, tier, escalation)
+            if rolling:
+                update_state(state, objects)
+            else:
+                results.extend(objects)
+        except Exception as e:
+            logger.error(f"[Error] Failed summarizing chunk {i + 1}: {e}")
+
+    return finish_entry(path, [final_record(state)] if rolling else results, facts)
+
+
+async def asummarize_code(code, language, path, limiter):
+    """Async variant of summarize_code: all chunks of the file are sent concurrently (one after the other in
+    rolling mode), bounded by the shared limiter. Chunk order is preserved for the merge."""
+    facts = await aextract_facts(code, language) if STATIC_ANALYSIS else None
+    route, prompt_template, schema, prompt_inputs, rolling = prepare_requests(code, language, path, facts)
+    (tier, chain), escalation = route[0], route[1:]
+    backend = get_backend_name()
+    job = get_scheduler(backend).new_job()
+    total_chunks = len(prompt_inputs)
+
+    async def run_chunk(i, prompt_input):
+        async with limiter.slot(backend, (job, i)):
+            try:
+                logger.info(f"\nSummarizing chunk {i + 1}/{total_chunks} of {path}...")
+                return await asummarize_chunk(chain, prompt_input, schema, prompt_template, priority=(job, i),
+                                              tier=tier, escalation=escalation)
+            except Exception as e:
+                logger.error(f"[Error] Failed summarizing chunk {i + 1} of {path}: {e}")
+                return []
+
+    if rolling:
+        state = new_state()
+        for i, prompt_input in enumerate(prompt_inputs):
+            prompt_input["state"] = format_state(state, state_token_budget())
+            update_state(state, await run_chunk(i, prompt_input))
+        return finish_entry(path, [final_record(state)], facts)
+
+    results = await asyncio.gather(*(run_chunk(i, p) for i, p in enumerate(prompt_inputs)))
+    return finish_entry(path, [obj for chunk_objects in results for obj in chunk_objects], facts)
+
+
+def parse_valid_results(result, schema=CODE_ANALYSIS_SCHEMA):
+    """Schema-valid analysis objects in one LLM result (empty if the response failed validation)."""
+    valid = []
+    with get_run_metrics().stage("parse"):
+        for obj in extract_json_objects([result]):
+            errors = validate(obj, schema)
+            if errors:
+                logger.debug(f"Response failed validation: {errors}")
+            else:
+                valid.append(obj)
+    return valid
+
+
+def _log_invalid(prompt_input, attempt):
+    logger.warning(f"Chunk {prompt_input['chunk_num']}/{prompt_input['total_chunks']} of "
+                   f"{prompt_input['file_path']} failed schema validation (attempt {attempt + 1})")
+
+
+def _salvage(result, schema):
+    # Out of retries: keep the fields that do match the schema rather than losing the chunk
+    return [sanitize(obj, schema) for obj in extract_json_objects([result])]
+
+
+def attempt_plan(chain, tier, escalation):
+    """(tier, chain, attempts) in the order they are tried: a tier that can still escalate gets
+    ROUTING_CHEAP_ATTEMPTS attempts, the last one the usual STRUCTURED_MAX_RETRIES retries."""
+    steps = [(tier, chain), *escalation]
+    return [(step_tier, step_chain, ROUTING_CHEAP_ATTEMPTS if i < len(steps) - 1 else STRUCTURED_MAX_RETRIES + 1)
+            for i, (step_tier, step_chain) in enumerate(steps)]
+
+
+def _log_escalation(prompt_input, tier):
+    get_run_metrics().count("escalations")
+    logger.info(f"Escalating chunk {prompt_input['chunk_num']}/{prompt_input['total_chunks']} of "
+                f"{prompt_input['file_path']} to the {tier.name} model {tier.model}")
+
+
+def summarize_chunk(chain, prompt_input, schema=CODE_ANALYSIS_SCHEMA, prompt_template=None, tier=DEFAULT_TIER,
+                    escalation=()):
+    """Analysis objects for one chunk from `chain` (running `tier`'s model). Only a response that fails schema
+    validation is retried, at most STRUCTURED_MAX_RETRIES times; with `escalation` [(tier, chain)] the retries go
+    to the stronger tiers instead, see attempt_plan."""
+    parse = lambda raw: parse_valid_results(raw, schema)
+    result = None
+    for step, (step_tier, step_chain, attempts) in enumerate(attempt_plan(chain, tier, escalation)):
+        if step:
+            _log_escalation(prompt_input, step_tier)
+        for attempt in range(attempts):
+            result = run_with_longchain(step_chain, prompt_input, prompt_template, parse, step_tier.max_tokens,
+                                        step_tier.model)
+            logger.debug(f"\nRaw LLM Output:\n{result}\n")
+            valid = parse(result)
+            if valid:
+                return valid
+            _log_invalid(prompt_input, attempt)
+    return _salvage(result, schema)
+
+
+async def asummarize_chunk(chain, prompt_input, schema=CODE_ANALYSIS_SCHEMA, prompt_template=None, priority=(0,),
+                           tier=DEFAULT_TIER, escalation=()):
+    parse = lambda raw: parse_valid_results(raw, schema)
+    result = None
+    for step, (step_tier, step_chain, attempts) in enumerate(attempt_plan(chain, tier, escalation)):
+        if step:
+            _log_escalation(prompt_input, step_tier)
+        for attempt in range(attempts):
+            result = await arun_with_longchain(step_chain, prompt_input, prompt_template, parse,
+                                               step_tier.max_tokens, priority, step_tier.model)
+            logger.debug(f"\nRaw LLM Output:\n{result}\n")
+            valid = parse(result)
+            if valid:
+                return valid
+            _log_invalid(prompt_input, attempt)
+    return _salvage(result, schema)
+
+
+def render_prompt(prompt_input, prompt_template=None):
+    prompt_template = prompt_template or get_code_analysis_prompt()
+    return prompt_template.format_prompt(**prompt_input).to_string()
+
+
+def get_chunk_cache_key(prompt_text, model=MODEL_NAME):
+    return make_cache_key(prompt_text, model, TEMPERATURE)
+
+
+def lookup_cached_result(cache, key):
+    entry = cache.get(key)
+    get_run_metrics().count("cache_misses" if entry is None else "cache_hits")
+    if entry is None:
+        return None
+    parsed = entry["parsed"]
+    # A single parsed object skips re-extraction; anything else is re-parsed from the raw text
+    return parsed[0] if parsed and len(parsed) == 1 else entry["raw"]
+
+
+def store_result(cache, key, result, parse=None):
+    parsed = (parse or parse_valid_results)(result)
+    # Unparsable or invalid generations are not cached so the next run retries them
+    if parsed:
+        cache.put(key, result, parsed)
+
+
+def run_with_longchain(chain, prompt_input, prompt_template=None, parse=None, output_tokens=MAX_TOKENS,
+                       model=MODEL_NAME):
+    """Cached result for the rendered prompt on `model` (the chain's), or the chain's output once the backend's
+    rate budget allows. Transient failures (429, 5xx, timeouts) are retried by the scheduler."""
+    prompt_text = render_prompt(prompt_input, prompt_template)
+    cache = get_llm_cache()
+    key = get_chunk_cache_key(prompt_text, model) if cache is not None else None
+    if cache is not None:
+        cached = lookup_cached_result(cache, key)
+        if cached is not None:
+            return cached
+    scheduler = get_scheduler(get_backend_name())
+    # Includes waiting for rate budget and retries; the model's own latency is recorded by the usage callback
+    with get_run_metrics().stage("llm_call"):
+        result = scheduler.run(lambda: chain.invoke(prompt_input),
+                               estimate_request_tokens(prompt_text, output_tokens))
+    if cache is not None:
+        store_result(cache, key, result, parse)
+    return result
+
+
+async def arun_with_longchain(chain, prompt_input, prompt_template=None, parse=None, output_tokens=MAX_TOKENS,
+                              priority=(0,), model=MODEL_NAME):
+    prompt_text = render_prompt(prompt_input, prompt_template)
+    cache = get_llm_cache()
+    key = get_chunk_cache_key(prompt_text, model) if cache is not None else None
+    if cache is not None:
+        cached = lookup_cached_result(cache, key)
+        if cached is not None:
+            return cached
+    scheduler = get_scheduler(get_backend_name())
+    with get_run_metrics().stage("llm_call"):
+        result = await scheduler.arun(lambda: chain.ainvoke(prompt_input),
+                                      estimate_request_tokens(prompt_text, output_tokens), priority)
+    if cache is not None:
+        store_result(cache, key, result, parse)
     return result
 
 
@@ -1,24 +1,33 @@
 import json
 
-from config import MAX_INPUT_TOKENS, BUFFER_TOKENS
-from prompts.project_summary_prompt import get_project_summary_prompt
-from utils.chains import build_chain_for_project
+from config import MAX_INPUT_TOKENS, BUFFER_TOKENS, MAX_CONCURRENCY, CHARS_PER_TOKEN, MAX_TOKENS, \
+    PROJECT_SUMMARY_MODE, SUMMARY_REDUCE_MAX_LEVELS
+from prompts.project_summary_prompt import get_project_summary_prompt, get_summary_merge_prompt
+from utils.chains import build_chain_for_project, build_chain_for_partial_summary, build_chain_for_summary_merge, \
+    get_backend_name, get_backend_limits
 
 import re
 from collections import defaultdict
 
-from utils.token_aware_chunking import estimate_tokens
+from langchain_core.runnables import RunnableLambda
+
+from utils.token_counter import count_static_tokens, count_tokens, count_tokens_batch
 from utils.logging_utils import setup_logger
+from utils.metrics import get_run_metrics
+from utils.scheduler import get_scheduler, estimate_request_tokens
 
 logger = setup_logger()
 
 
 def get_summary_token_budget(template_str, placeholder_key="grouped_descriptions"):
     prompt_prefix = template_str.replace("{" + placeholder_key + "}", "")
-    return MAX_INPUT_TOKENS - BUFFER_TOKENS - estimate_tokens(prompt_prefix)
+    return MAX_INPUT_TOKENS - BUFFER_TOKENS - count_static_tokens(prompt_prefix)
 
 
-def group_files_by_role(descriptions):
+def group_files_by_role(descriptions, centrality=None):
+    """Role -> [{"path", "summary", "centrality"}]. With `centrality` (path -> score from the symbol index) each role
+    lists its most central files first; pack_grouped_sections then takes them across roles by that score, so they
+    are the last to be cut or split from the project summary."""
     structure = defaultdict(list)
 
     role_keywords = {
@@ -31,6 +40,9 @@ def group_files_by_role(descriptions):
     }
 
     for file_entry in descriptions:
+        if file_entry.get("duplicate_of"):
+            continue  # its representative already describes the same code
+        score = (centrality or {}).get(file_entry["file"], 0.0)
         path = file_entry["file"].lower()
         summary = file_entry.get("description", {}).get("file_summary", "")
         matched = False
@@ -39,7 +51,8 @@ def group_files_by_role(descriptions):
             if pattern.search(path):
                 structure[role].append({
                     "path": path,
-                    "summary": summary
+                    "summary": summary,
+                    "centrality": score
                 })
                 matched = True
                 break
@@ -47,50 +60,150 @@ def group_files_by_role(descriptions):
         if not matched:
             structure["Other"].append({
                 "path": path,
-                "summary": summary
+                "summary": summary,
+                "centrality": score
             })
 
+    if centrality:
+        for files in structure.values():
+            files.sort(key=lambda f: f["centrality"], reverse=True)
     return structure
 
 
-def summarize_project(file_descriptions):
-    grouped = group_files_by_role(file_descriptions)
-    template = get_project_summary_prompt()  # returns PromptTemplate or str
-    token_budget = get_summary_token_budget(template.template if hasattr(template, 'template') else template)
+def clip_to_tokens(text, token_budget):
+    if count_tokens(text) <= token_budget:
+        return text
+    return text[:int(token_budget * CHARS_PER_TOKEN)]
 
-    grouped_descriptions = ""
-    current_tokens = 0
 
+def pack_grouped_sections(grouped, token_budget):
+    """Packs every role group's summary lines into sections of at most `token_budget` tokens, each listing its
+    lines under their role headers. Lines are taken role by role or, when the files have a centrality score, in
+    order of centrality across all roles, so the first section holds the most central files whatever their role.
+    A role that does not fit the current section continues in the next one under a repeated header."""
+    items = []
     for role, summaries in grouped.items():
-        if not summaries:
-            continue
-
-        header = f"\n### {role.title()} Files\n"
-        header_tokens = estimate_tokens(header)
-
-        chunk = ""
-        chunk_tokens = header_tokens
-
-        for s in summaries:
-            summary_text = s.get("summary", "").strip()
-            if summary_text:
-                line = f"- {summary_text}\n"
-                line_tokens = estimate_tokens(line)
-
-                if current_tokens + chunk_tokens + line_tokens > token_budget:
-                    break  # stop appending if we're about to go over budget
-
-                chunk += line
-                chunk_tokens += line_tokens
+        items.extend((role, f"- {s.get('summary', '').strip()}\n", s.get("centrality", 0.0))
+                     for s in summaries if s.get("summary", "").strip())
+    items.sort(key=lambda item: -item[2])  # stable: without centrality the role order is kept
+
+    sections = []
+    current, current_tokens = {}, 0  # role -> lines of the section being filled
+
+    def render(section):
+        return "".join(f"\n### {role.title()} Files\n" + "".join(lines) for role, lines in section.items())
+
+    header_tokens = {role: count_static_tokens(f"\n### {role.title()} Files\n") for role in grouped}
+    for (role, line, _), line_tokens in zip(items, count_tokens_batch([line for _, line, _ in items])):
+        if header_tokens[role] + line_tokens > token_budget:
+            line = clip_to_tokens(line, token_budget - header_tokens[role]) + "\n"
+            line_tokens = token_budget - header_tokens[role]
+        needed = line_tokens + (0 if role in current else header_tokens[role])
+        if current and current_tokens + needed > token_budget:
+            sections.append(render(current))
+            current, current_tokens = {}, 0
+            needed = line_tokens + header_tokens[role]
+        current.setdefault(role, []).append(line)
+        current_tokens += needed
+
+    if current:
+        sections.append(render(current))
+    return sections
+
+
+def pack_texts(texts, token_budget):
+    groups, current, current_tokens = [], [], 0
+    for text, tokens in zip(texts, count_tokens_batch(texts)):
+        if current and current_tokens + tokens > token_budget:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def invoke_scheduled(chain, prompt_input):
+    """chain.invoke within the backend's rate budget, with retries; the cost is estimated from the inputs."""
+    cost = estimate_request_tokens(" ".join(str(v) for v in prompt_input.values()), MAX_TOKENS)
+    with get_run_metrics().stage("llm_call"):
+        return get_scheduler(get_backend_name()).run(lambda: chain.invoke(prompt_input), cost)
+
+
+def run_chain_parallel(chain, inputs, fallbacks):
+    """Runs independent summary calls concurrently; a failed call contributes its fallback text instead."""
+    limit = min(MAX_CONCURRENCY, get_backend_limits().get(get_backend_name(), MAX_CONCURRENCY))
+    outputs = RunnableLambda(lambda prompt_input: invoke_scheduled(chain, prompt_input)).batch(
+        inputs, config={"max_concurrency": max(1, limit)}, return_exceptions=True)
+    results = []
+    for output, fallback in zip(outputs, fallbacks):
+        if isinstance(output, Exception) or not str(output).strip():
+            logger.error(f"[Error] Intermediate summary failed, passing its input through: {output}")
+            results.append(fallback)
+        else:
+            results.append(str(output).strip())
+    return results
+
+
+def format_partial_summaries(summaries):
+    return "\n".join(f"\n### Part {i + 1}\n{summary}\n" for i, summary in enumerate(summaries))
+
+
+def reduce_sections(sections, token_budget):
+    """Map-reduce over sections that together exceed one context window.
+
+    Each section is summarized in parallel, then the intermediate summaries are merged in rounds of as many
+    as fit one merge prompt until they fit `token_budget` together. The number of rounds grows
+    logarithmically with the number of sections.
+    """
+    logger.info(f"File summaries exceed one context window, summarizing {len(sections)} sections first")
+    summaries = run_chain_parallel(build_chain_for_partial_summary(),
+                                   [{"grouped_descriptions": s} for s in sections],
+                                   [clip_to_tokens(s, token_budget // 2) for s in sections])
+
+    merge_template = get_summary_merge_prompt()
+    merge_budget = get_summary_token_budget(merge_template.template, "partial_summaries")
+    merge_chain = build_chain_for_summary_merge()
+
+    for level in range(1, SUMMARY_REDUCE_MAX_LEVELS + 1):
+        combined = format_partial_summaries(summaries)
+        if count_tokens(combined) <= token_budget or len(summaries) == 1:
+            return clip_to_tokens(combined, token_budget)
+
+        groups = pack_texts(summaries, merge_budget)
+        if len(groups) == len(summaries):
+            # Each summary alone nearly fills a merge prompt: merge pairs so every round still halves the count
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+        logger.info(f"Merging {len(summaries)} intermediate summaries into {len(groups)} (level {level})")
+        inputs = [{"partial_summaries": clip_to_tokens(format_partial_summaries(g), merge_budget)} for g in groups]
+        summaries = run_chain_parallel(merge_chain, inputs,
+                                       [clip_to_tokens(" ".join(g), merge_budget // 2) for g in groups])
+
+    return clip_to_tokens(format_partial_summaries(summaries), token_budget)
+
+
+def summarize_project(file_descriptions, centrality=None):
+    """`file_descriptions` may be any iterable of file entries, e.g. a generator over the .jsonl stream;
+    only paths and one-line summaries are kept in memory. `centrality` orders each role's files, see
+    group_files_by_role."""
+    grouped = group_files_by_role(file_descriptions, centrality)
+    template = get_project_summary_prompt()  # returns PromptTemplate or str
+    token_budget = get_summary_token_budget(template.template if hasattr(template, 'template') else template)
 
-        if chunk:
-            grouped_descriptions += header + chunk
-            current_tokens += chunk_tokens
+    sections = pack_grouped_sections(grouped, token_budget)
+    if len(sections) <= 1:
+        grouped_descriptions = sections[0] if sections else ""
+    elif PROJECT_SUMMARY_MODE == "tree":
+        grouped_descriptions = reduce_sections(sections, token_budget)
+    else:
+        logger.warning(f"Project summary truncated to 1 of {len(sections)} sections (PROJECT_SUMMARY_MODE=truncate)")
+        grouped_descriptions = sections[0]
 
     # Build and call chain
     chain = build_chain_for_project()
     try:
-        result = chain.invoke({"grouped_descriptions": grouped_descriptions})
+        result = invoke_scheduled(chain, {"grouped_descriptions": grouped_descriptions})
         return json.loads(result)
     except Exception as e:
         logger.error(f"[Error] Failed generating project summary: {e}")
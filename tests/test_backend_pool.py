@@ -0,0 +1,152 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import utils.chains as chains
+from prompts.language_prompts import get_code_analysis_prompt
+from utils.backend_pool import BackendPool, Endpoint, NoHealthyEndpointError, WEIGHTED_ROUND_ROBIN, \
+    parse_endpoint_spec
+
+
+class StubOllama:
+    """Minimal Ollama server: /api/tags for health checks, /api/chat answering with a fixed streamed message."""
+
+    def __init__(self, fail_chat=False):
+        self.chat_requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._reply(200, "application/json", json.dumps({"models": []}))
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub.chat_requests += 1
+                if fail_chat:
+                    self._reply(500, "application/json", json.dumps({"error": "model crashed"}))
+                    return
+                lines = [
+                    {"model": "codellama", "created_at": "2024-01-01T00:00:00Z",
+                     "message": {"role": "assistant", "content": '{"file_summary": "ok"}'}, "done": False},
+                    {"model": "codellama", "created_at": "2024-01-01T00:00:00Z",
+                     "message": {"role": "assistant", "content": ""}, "done": True, "done_reason": "stop",
+                     "prompt_eval_count": 10, "eval_count": 5},
+                ]
+                self._reply(200, "application/x-ndjson", "".join(json.dumps(line) + "\n" for line in lines))
+
+            def _reply(self, status, content_type, body):
+                data = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def pooled_backend(monkeypatch):
+    servers = []
+
+    def start(*fail_flags):
+        servers.extend(StubOllama(fail) for fail in fail_flags)
+        monkeypatch.setattr(chains, "USE_OPENAI", False)
+        monkeypatch.setattr(chains, "OLLAMA_HOSTS", [s.url for s in servers])
+        monkeypatch.setattr(chains, "BACKEND_EJECT_AFTER", 2)
+        chains.reset_clients()
+        return servers
+
+    yield start
+    chains.reset_clients()
+    for server in servers:
+        server.close()
+
+
+def prompt_input():
+    return {"language": "Python", "code": "x = 1", "file_path": "a.py", "chunk_num": 1, "total_chunks": 1}
+
+
+def test_requests_are_spread_across_endpoints(pooled_backend):
+    first, second = pooled_backend(False, False)
+    chain = chains.build_chain(get_code_analysis_prompt())
+
+    for _ in range(6):
+        assert "file_summary" in chain.invoke(prompt_input())
+
+    assert first.chat_requests == 3 and second.chat_requests == 3
+    assert chains.get_backend_limits()["ollama"] == 4  # two endpoints with two slots each
+
+
+def test_failing_endpoint_is_ejected_and_calls_fail_over(pooled_backend):
+    broken, healthy = pooled_backend(True, False)
+    chain = chains.build_chain(get_code_analysis_prompt())
+
+    async def run():
+        return await asyncio.gather(*(chain.ainvoke(prompt_input()) for _ in range(8)))
+
+    assert all("file_summary" in output for output in asyncio.run(run()))
+    assert broken.chat_requests <= 3  # ejected after two consecutive failures
+    assert healthy.chat_requests == 8
+
+
+def test_health_check_takes_unreachable_endpoint_out_of_rotation():
+    server = StubOllama()
+    dead = Endpoint("http://127.0.0.1:9")  # nothing listens on the discard port
+    pool = BackendPool([dead, Endpoint(server.url)])
+    try:
+        pool.check_health(timeout=0.5)
+        assert not dead.healthy
+        assert all(pool.try_acquire().url == server.url for _ in range(2))
+    finally:
+        server.close()
+
+
+def test_per_endpoint_concurrency_limit_is_respected():
+    endpoints = [Endpoint("http://a", max_concurrency=1), Endpoint("http://b", max_concurrency=2)]
+    pool = BackendPool(endpoints)
+    peak = {e.url: 0 for e in endpoints}
+
+    async def call():
+        endpoint = await pool.acquire()
+        peak[endpoint.url] = max(peak[endpoint.url], endpoint.in_flight)
+        await asyncio.sleep(0.01)
+        pool.release(endpoint)
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(20)))
+
+    asyncio.run(run())
+    assert peak == {"http://a": 1, "http://b": 2}
+    assert all(e.in_flight == 0 for e in endpoints)
+
+
+def test_weighted_round_robin_follows_weights():
+    pool = BackendPool([parse_endpoint_spec("http://a|3|10"), parse_endpoint_spec("http://b")],
+                       strategy=WEIGHTED_ROUND_ROBIN)
+    picks = []
+    for _ in range(8):
+        endpoint = pool.try_acquire()
+        picks.append(endpoint.url)
+        pool.release(endpoint)
+    assert picks.count("http://a") == 6 and picks.count("http://b") == 2
+
+
+def test_rate_limited_endpoint_is_skipped_and_exhausted_pool_times_out():
+    pool = BackendPool([Endpoint("http://a", rpm=1)], acquire_timeout=0.05)
+    pool.release(pool.try_acquire())
+    assert pool.try_acquire() is None
+    with pytest.raises(NoHealthyEndpointError):
+        pool.acquire_sync()
@@ -0,0 +1,38 @@
+import json
+
+from benchmarks import bench_pipeline
+from benchmarks.fake_llm import FakeChatModel
+from benchmarks.synthetic_repo import generate_repo
+from runners import summarize_code as summarize_code_module
+from utils.chains import set_llm_factory
+
+
+def read_all(paths):
+    return [open(path).read() for path in paths]
+
+
+def test_synthetic_repo_is_deterministic(tmp_path):
+    first = generate_repo(str(tmp_path / "a"), files=8, languages=("Python", "Go"), lines=(10, 40), seed=3)
+    second = generate_repo(str(tmp_path / "b"), files=8, languages=("Python", "Go"), lines=(10, 40), seed=3)
+    assert [p.split("/a/", 1)[1] for p in first] == [p.split("/b/", 1)[1] for p in second]
+    assert read_all(first) == read_all(second)
+    assert {p.rsplit(".", 1)[1] for p in first} == {"py", "go"}
+
+
+def test_fake_model_answers_the_real_prompts(monkeypatch):
+    monkeypatch.setattr(summarize_code_module, "get_llm_cache", lambda: None)
+    set_llm_factory(lambda: FakeChatModel())
+    try:
+        entry = summarize_code_module.summarize_code("def load(path):\n    return path\n", "Python", "load.py")
+    finally:
+        set_llm_factory(None)
+    assert entry["description"]["file_summary"]
+    assert [m["method_name"] for m in entry["description"]["methods"]] == ["load"]
+
+
+def test_pipeline_report_is_json():
+    report = bench_pipeline.run(files=4, languages=("Python", "Java"), lines=(10, 30), latency=0)
+    json.dumps(report)
+    assert report["stages"]["scan"]["files"] == 4
+    assert report["end_to_end"]["llm_calls"] >= 2  # file summaries plus the project summary
+    assert report["end_to_end"]["tokens_per_file"] > 0
@@ -0,0 +1,19 @@
+import utils.chains as chains
+
+
+def test_chains_are_built_once_and_share_one_client(monkeypatch):
+    created = []
+    real_create = chains.create_llm
+    monkeypatch.setattr(chains, "create_llm", lambda *a: created.append(1) or real_create(*a))
+    chains.reset_clients()
+
+    first = chains.build_chain_for_language()
+    assert chains.build_chain_for_language() is first
+    project = chains.build_chain_for_project()
+    assert project is not first
+    assert len(created) == 1  # every prompt runs on the same pooled model
+
+    chains.reset_clients()
+    assert chains.build_chain_for_language() is not first
+    assert len(created) == 2
+    chains.reset_clients()
@@ -13,3 +13,36 @@ def test_token_budget_allocation():
     }
     tokens = get_available_code_tokens(template, prompt_input)
     assert tokens >= 100  # Ensure fallback safety works
+
+
+def _whitespace_token_counts(monkeypatch):
+    from utils import token_counter
+
+    class WhitespaceEncoder:
+        def encode(self, text, disallowed_special=()):
+            return text.split()
+
+        def encode_batch(self, texts, num_threads=8, disallowed_special=()):
+            return [t.split() for t in texts]
+
+    monkeypatch.setattr(token_counter, "get_encoder", lambda model_name=None: WhitespaceEncoder())
+
+
+def test_chunks_are_sized_in_tokens_and_fill_the_budget(monkeypatch):
+    from utils.token_aware_chunking import split_code_to_chunks
+    from utils.token_counter import count_tokens
+    _whitespace_token_counts(monkeypatch)
+
+    # ~5 chars per token: a character-sized splitter would produce about 5x as many chunks
+    code = "\n".join(f"    total = total + value_{i}" for i in range(2000))
+    budget = 1000
+    chunks = split_code_to_chunks(code, budget, overlap_tokens=0)
+
+    assert all(count_tokens(c) <= budget for c in chunks)
+    assert len(chunks) <= 2 * (count_tokens(code) // budget + 1)
+
+
+def test_small_file_stays_in_one_chunk(monkeypatch):
+    from utils.token_aware_chunking import split_code_to_chunks
+    _whitespace_token_counts(monkeypatch)
+    assert split_code_to_chunks("def f():\n    return 1\n", 100) == ["def f():\n    return 1\n"]
@@ -0,0 +1,59 @@
+import asyncio
+import random
+
+import main
+from utils.concurrency import ConcurrencyLimiter
+
+
+def test_limiter_bounds_in_flight_calls_per_backend_and_globally():
+    in_flight = {"ollama": 0, "total": 0}
+    peak = {"ollama": 0, "total": 0}
+
+    async def call(limiter, backend):
+        async with limiter.slot(backend):
+            in_flight["total"] += 1
+            in_flight[backend] = in_flight.get(backend, 0) + 1
+            peak["total"] = max(peak["total"], in_flight["total"])
+            peak[backend] = max(peak.get(backend, 0), in_flight[backend])
+            await asyncio.sleep(0.01)
+            in_flight["total"] -= 1
+            in_flight[backend] -= 1
+
+    async def run():
+        limiter = ConcurrencyLimiter(global_limit=3, backend_limits={"ollama": 2})
+        await asyncio.gather(*(call(limiter, "ollama" if i % 2 else "openai") for i in range(20)))
+
+    asyncio.run(run())
+    assert peak["ollama"] <= 2
+    assert peak["total"] <= 3
+
+
+def test_async_file_results_keep_input_order(monkeypatch):
+    async def fake_summarize(code, language, path, limiter):
+        await asyncio.sleep(random.random() / 100)
+        return {"file": path, "description": {}}
+
+    monkeypatch.setattr(main, "load_source", lambda path: ("Python", "x = 1"))
+    monkeypatch.setattr(main, "asummarize_code", fake_summarize)
+
+    files = [f"file_{i}.py" for i in range(25)]
+    results = asyncio.run(main.asummarize_files(files))
+    assert [r["file"] for r in results] == files
+
+
+def test_waiting_calls_get_slots_in_priority_order():
+    order = []
+
+    async def call(limiter, priority):
+        async with limiter.slot("ollama", priority):
+            order.append(priority)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        limiter = ConcurrencyLimiter(global_limit=4, backend_limits={"ollama": 1})
+        # A later file's chunks queue first; the earlier file's chunk must still go next
+        await asyncio.gather(call(limiter, (5, 0)), call(limiter, (5, 1)), call(limiter, (5, 2)),
+                             call(limiter, (1, 0)))
+
+    asyncio.run(run())
+    assert order == [(5, 0), (1, 0), (5, 1), (5, 2)]
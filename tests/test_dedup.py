@@ -0,0 +1,57 @@
+import main
+from runners.summarize_project import group_files_by_role
+from utils.dedup import find_duplicates, group_duplicates, minhash_signature, shingle_hashes, normalize_tokens, \
+    estimate_similarity
+
+
+def module_source(name, lines=60):
+    return "".join(f"def {name}_{i}(value):\n    return value * {i} + {name}_offset\n\n" for i in range(lines))
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_exact_and_near_duplicates_map_to_the_first_representative(tmp_path):
+    original = module_source("alpha")
+    near = original.replace("return value * 7 +", "return value * 70 +")
+    reformatted = original.replace("    return", "\treturn")  # whitespace-only change
+    paths = [
+        write(tmp_path, "a.py", original),
+        write(tmp_path, "b.py", original),
+        write(tmp_path, "c.py", near),
+        write(tmp_path, "d.py", reformatted),
+        write(tmp_path, "e.py", module_source("beta")),
+        write(tmp_path, "f.js", original),  # other extension, never grouped
+    ]
+    a, b, c, d, e, f = paths
+
+    duplicates = find_duplicates(paths)
+
+    assert duplicates == {b: a, c: a, d: a}
+    assert group_duplicates(duplicates) == {a: [b, c, d]}
+
+
+def test_similarity_estimate_tracks_the_amount_of_change():
+    base = normalize_tokens(module_source("alpha"))
+    same = minhash_signature(shingle_hashes(base))
+    assert estimate_similarity(same, minhash_signature(shingle_hashes(list(base)))) == 1.0
+    different = minhash_signature(shingle_hashes(normalize_tokens(module_source("gamma"))))
+    assert estimate_similarity(same, different) < 0.5
+
+
+def test_duplicates_reuse_the_representative_entry_and_leave_the_project_summary():
+    written = []
+    emit = main.with_duplicates(written.append, {"a.py": ["b.py"]})
+    emit({"file": "a.py", "description": {"file_summary": "does a"}})
+    emit({"file": "c.py", "description": {"file_summary": "does c"}})
+
+    assert written == [
+        {"file": "a.py", "description": {"file_summary": "does a"}},
+        {"file": "b.py", "description": {"file_summary": "does a"}, "duplicate_of": "a.py"},
+        {"file": "c.py", "description": {"file_summary": "does c"}},
+    ]
+    grouped = group_files_by_role(written)
+    assert sorted(item["path"] for items in grouped.values() for item in items) == ["a.py", "c.py"]
@@ -0,0 +1,68 @@
+import numpy as np
+
+import main
+from utils import embeddings
+from utils.embeddings import EmbeddingIndex, HashingEmbeddings, build_embedding_index, get_embedder, top_k
+
+ENTRIES = [
+    {"file": "db/pool.py", "description": {
+        "file_summary": "Manages a pool of database connections",
+        "methods": [{"method_name": "acquireConnection", "description": "Borrows a connection from the pool"},
+                    {"method_name": "release", "description": "Returns a connection to the pool"}]}},
+    {"file": "web/routes.py", "description": {
+        "file_summary": "HTTP routes for the checkout page",
+        "methods": [{"method_name": "render_cart", "description": "Renders the shopping cart template"}]}},
+    {"file": "web/routes_copy.py", "description": {"file_summary": "HTTP routes for the checkout page"},
+     "duplicate_of": "web/routes.py"},
+    {"file": "empty.py", "description": {}},
+]
+
+
+def test_build_and_search(tmp_path):
+    base_path = str(tmp_path / "demo_embeddings")
+    count = build_embedding_index(ENTRIES, base_path, ("hashing:256", HashingEmbeddings(256)), batch_size=2)
+    assert count == 5
+
+    index = EmbeddingIndex(base_path)
+    assert isinstance(index.matrix, np.memmap) and index.matrix.shape == (5, 256)
+    assert np.allclose(np.linalg.norm(index.matrix, axis=1), 1.0)
+
+    hits = index.search("acquire a database connection", k=2)
+    assert [(hit["file"], hit["kind"], hit["name"]) for hit in hits] == [
+        ("db/pool.py", "method", "acquireConnection"), ("db/pool.py", "file", "")]
+    assert hits[0]["score"] >= hits[1]["score"] > 0
+    assert index.search("shopping cart", k=1)[0]["name"] == "render_cart"
+    assert len(index.search("anything", k=50)) == 5
+
+
+def test_top_k_over_blocks_matches_full_sort(monkeypatch):
+    monkeypatch.setattr(embeddings, "_BLOCK_ROWS", 7)
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(50, 8)).astype(np.float32)
+    query = rng.normal(size=8).astype(np.float32)
+    rows, scores = top_k(matrix, query, 5)
+    expected = np.argsort(-(matrix @ query))[:5]
+    assert rows.tolist() == expected.tolist()
+    assert np.allclose(scores, (matrix @ query)[expected])
+
+
+class Unreachable:
+    def embed_query(self, text):
+        raise ConnectionError("connection refused")
+
+
+def test_falls_back_to_hashing_without_ollama(monkeypatch):
+    monkeypatch.setattr(embeddings, "embedder_for", lambda name: Unreachable())
+    name, model = get_embedder("ollama")
+    assert name.startswith("hashing:") and isinstance(model, HashingEmbeddings)
+
+
+def test_ollama_embeddings_use_the_configured_host(monkeypatch):
+    monkeypatch.setattr(embeddings, "OLLAMA_BASE_URL", "http://gpu-box:11434")
+    assert embeddings.embedder_for("ollama:nomic-embed-text").base_url == "http://gpu-box:11434"
+
+
+def test_search_without_an_index_reports_it(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(main, "OUTPUT_FOLDER", str(tmp_path) + "/")
+    main.main(["--local-path", str(tmp_path / "demo"), "--search", "database pool"])
+    assert "No embedding index for demo" in caplog.text
@@ -0,0 +1,42 @@
+from utils.extract import extract_json_objects
+
+
+def test_markdown_fenced_output():
+    raw = 'Here is the result:\n```json\n{"file_summary": "Parses {config}", "methods": []}\n```\nHope it helps!'
+    assert extract_json_objects([raw]) == [{"file_summary": "Parses {config}", "methods": []}]
+
+
+def test_multiple_objects_and_trailing_commas():
+    raw = '{"file_summary": "a", "methods": [{"method_name": "f",},],} then {"file_summary": "b"}'
+    assert extract_json_objects([raw]) == [
+        {"file_summary": "a", "methods": [{"method_name": "f"}]},
+        {"file_summary": "b"},
+    ]
+
+
+def test_truncated_object_keeps_complete_elements():
+    raw = ('{"file_summary": "x", "methods": [{"method_name": "f", "signature": "f()"}, '
+           '{"method_name": "g", "signa')
+    assert extract_json_objects([raw]) == [
+        {"file_summary": "x", "methods": [{"method_name": "f", "signature": "f()"}, {"method_name": "g"}]}
+    ]
+
+
+def test_escaped_quotes_and_braces_inside_strings():
+    raw = 'noise {"file_summary": "uses \\"{}\\" literally", "noteworthy": ["a } b"]} noise'
+    assert extract_json_objects([raw]) == [{"file_summary": 'uses "{}" literally', "noteworthy": ["a } b"]}]
+
+
+def test_nested_objects_are_found_under_a_wrapper():
+    raw = 'Result: {"analysis": {"file_summary": "inner"}}'
+    assert extract_json_objects([raw]) == [{"file_summary": "inner"}]
+    assert extract_json_objects([raw], required_key=None) == [{"analysis": {"file_summary": "inner"}}]
+
+
+def test_parsed_dicts_pass_through_and_garbage_is_dropped():
+    assert extract_json_objects([{"file_summary": "d"}, "{ not json }", "no braces"]) == [{"file_summary": "d"}]
+
+
+def test_stray_brace_in_prose_before_the_json():
+    raw = 'The class opens with { and then:\n{"file_summary": "a", "methods": []}'
+    assert extract_json_objects([raw]) == [{"file_summary": "a", "methods": []}]
@@ -0,0 +1,87 @@
+import json
+
+import main
+import runners.summarize_batch as summarize_batch
+import runners.summarize_code as summarize_code
+from utils import token_counter
+from utils.file_packing import pack_files, split_batch_response
+
+
+class WhitespaceEncoder:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+    def encode_batch(self, texts, num_threads=8, disallowed_special=()):
+        return [t.split() for t in texts]
+
+
+def source(name, words):
+    return (f"src/{name}.py", "Python", " ".join(["x"] * words))
+
+
+def test_small_files_are_bin_packed_in_scan_order(monkeypatch):
+    monkeypatch.setattr(token_counter, "get_encoder", lambda model_name=None: WhitespaceEncoder())
+    sources = [source("a", 40), source("b", 10), source("huge", 500), source("c", 40), source("d", 10)]
+
+    batches, leftovers = pack_files(sources, token_budget=100, max_files=8)
+
+    packed = [path for batch in batches for path, _, _ in batch]
+    assert sorted(packed) == ["src/a.py", "src/b.py", "src/c.py", "src/d.py"]
+    for batch in batches:
+        paths = [p for p, _, _ in batch]
+        assert paths == sorted(paths)  # scan order within a batch
+    assert [path for path, _, _ in leftovers] == ["src/huge.py"]
+
+
+def test_max_files_per_request_and_singletons(monkeypatch):
+    monkeypatch.setattr(token_counter, "get_encoder", lambda model_name=None: WhitespaceEncoder())
+    sources = [source(str(i), 5) for i in range(5)]
+    batches, leftovers = pack_files(sources, token_budget=1000, max_files=2)
+    assert [len(b) for b in batches] == [2, 2]
+    assert [path for path, _, _ in leftovers] == ["src/4.py"]
+
+
+def test_combined_response_is_split_per_file():
+    raw = "Here you go:\n```json\n" + json.dumps({"files": [
+        {"file_path": "src/a.py", "file_summary": "A", "methods": []},
+        {"file_path": "b.py", "file_summary": "B", "methods": []},
+    ]}) + "\n```"
+    entries = split_batch_response(raw, ["./repo/src/a.py", "./repo/src/b.py", "./repo/src/c.py"])
+    assert entries["./repo/src/a.py"]["file_summary"] == "A"
+    assert entries["./repo/src/b.py"]["file_summary"] == "B"
+    assert "./repo/src/c.py" not in entries
+
+
+def test_missing_files_fall_back_to_single_file_summaries(monkeypatch):
+    class FakeChain:
+        def invoke(self, prompt_input):
+            return json.dumps({"files": [{"file_path": "a.py", "file_summary": "A", "methods": []}]})
+
+    monkeypatch.setattr(summarize_code, "get_llm_cache", lambda: None)
+    monkeypatch.setattr(summarize_batch, "build_chain_for_file_batch", lambda model=None: FakeChain())
+    monkeypatch.setattr(summarize_batch, "summarize_code",
+                        lambda code, language, path: {"file": path, "description": {"file_summary": "single"}})
+
+    results = summarize_batch.summarize_file_batch([("a.py", "Python", "x = 1"), ("b.py", "Python", "y = 2")])
+
+    assert [r["file"] for r in results] == ["a.py", "b.py"]
+    assert results[0]["description"]["file_summary"] == "A"
+    assert results[1]["description"]["file_summary"] == "single"
+
+
+def test_batches_are_planned_from_disk_sizes_and_read_on_dispatch(tmp_path, monkeypatch):
+    paths = []
+    for name, size in (("a", 200), ("b", 300), ("big", 50000), ("c", 100)):
+        path = tmp_path / f"{name}.py"
+        path.write_text("x = 1\n" * (size // 6))
+        paths.append(str(path))
+    read = []
+    monkeypatch.setattr(main, "load_source", lambda path: read.append(path) or ("Python", "x = 1\n"))
+
+    planned, singles = main.plan_packing(paths)
+
+    assert read == []  # nothing is read while planning
+    assert planned == [[paths[0], paths[1], paths[3]]] and singles == [paths[2]]
+    batches, alone = main.load_batch(planned[0])
+    assert read == planned[0]
+    assert [[path for path, _, _ in batch] for batch in batches] == planned and alone == []
@@ -0,0 +1,71 @@
+import json
+import os
+import subprocess
+
+from utils.git_utils import get_changed_files, get_head_commit
+from utils.incremental import plan_incremental, merge_results
+
+
+def git(repo, *args):
+    subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True)
+
+
+def make_repo(tmp_path):
+    repo = tmp_path / "proj"
+    repo.mkdir()
+    git(repo, "init", "-q")
+    git(repo, "config", "user.email", "t@example.com")
+    git(repo, "config", "user.name", "t")
+    for name in ("keep.py", "edit.py", "gone.py", "old_name.py"):
+        (repo / name).write_text(f"# {name}\nx = 1\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "init")
+    return repo
+
+
+def test_changed_files_reports_each_change_kind(tmp_path):
+    repo = make_repo(tmp_path)
+    base = get_head_commit(str(repo))
+    (repo / "edit.py").write_text("x = 2\n")
+    (repo / "gone.py").unlink()
+    git(repo, "mv", "old_name.py", "new_name.py")
+    (repo / "added.py").write_text("y = 1\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "change")
+
+    changes = get_changed_files(str(repo), base)
+    assert changes["modified"] == ["edit.py"]
+    assert changes["deleted"] == ["gone.py"]
+    assert changes["added"] == ["added.py"]
+    assert changes["renamed"] == [("old_name.py", "new_name.py")]
+
+
+def test_plan_and_merge_only_touch_changed_files(tmp_path):
+    repo = make_repo(tmp_path)
+    base = get_head_commit(str(repo))
+    path = lambda name: os.path.join(str(repo), name)
+    previous = [{"file": path(n), "description": {"file_summary": n}}
+                for n in ("keep.py", "edit.py", "gone.py", "old_name.py")]
+    output = tmp_path / "summary.json"
+    output.write_text(json.dumps({"project": "proj", "commit": base, "files": previous}))
+
+    (repo / "edit.py").write_text("x = 2\n")
+    (repo / "gone.py").unlink()
+    git(repo, "mv", "old_name.py", "new_name.py")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "change")
+
+    files = [path(n) for n in ("edit.py", "keep.py", "new_name.py")]
+    plan = plan_incremental(str(repo), files, str(output))
+    assert sorted(plan.to_summarize) == [path("edit.py"), path("new_name.py")]
+
+    updated = [{"file": p, "description": {"file_summary": "new " + os.path.basename(p)}} for p in plan.to_summarize]
+    merged, changed = merge_results(plan, updated, files)
+    assert changed
+    assert [e["file"] for e in merged] == files
+    assert merged[1]["description"]["file_summary"] == "keep.py"
+
+
+def test_plan_falls_back_to_full_run_without_previous_results(tmp_path):
+    repo = make_repo(tmp_path)
+    assert plan_incremental(str(repo), [], str(tmp_path / "missing.json")) is None
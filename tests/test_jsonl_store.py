@@ -0,0 +1,51 @@
+import json
+
+from utils.file_utils import write_json
+from utils.jsonl_store import JsonlWriter, iter_jsonl, iter_ordered, jsonl_to_json, load_completed_paths
+
+
+def entry(path, summary="s"):
+    return {"file": path, "description": {"file_summary": summary, "methods": []}}
+
+
+def test_torn_last_record_is_ignored_on_resume(tmp_path):
+    stream = tmp_path / "run.jsonl"
+    with JsonlWriter(str(stream)) as writer:
+        writer.write(entry("a.py"))
+        writer.write(entry("b.py"))
+    with open(stream, "a") as f:
+        f.write('{"file": "c.py", "descr')  # crash mid-write
+
+    assert [r["file"] for r in iter_jsonl(str(stream))] == ["a.py", "b.py"]
+    assert load_completed_paths(str(stream)) == {"a.py", "b.py"}
+
+
+def test_post_pass_matches_aggregated_json_layout(tmp_path):
+    stream = tmp_path / "run.jsonl"
+    with JsonlWriter(str(stream), fsync_every=1) as writer:
+        for path in ("c.py", "a.py", "b.py", "a.py"):  # completion order, a.py re-run on resume
+            writer.write(entry(path, summary=f"latest {path}"))
+
+    order = ["a.py", "b.py", "c.py", "missing.py"]
+    header = {"project": "demo", "commit": None}
+    streamed = tmp_path / "streamed.json"
+    expected = tmp_path / "expected.json"
+    assert jsonl_to_json(str(stream), str(streamed), header, order) == 3
+
+    write_json({**header, "files": list(iter_ordered(str(stream), order))}, str(expected))
+    assert streamed.read_text() == expected.read_text()
+    assert [f["file"] for f in json.loads(streamed.read_text())["files"]] == ["a.py", "b.py", "c.py"]
+
+
+def test_resume_after_torn_write_keeps_appended_records(tmp_path):
+    stream = tmp_path / "run.jsonl"
+    with JsonlWriter(str(stream)) as writer:
+        writer.write(entry("a.py"))
+    with open(stream, "a") as f:
+        f.write('{"file": "b.py", "descr')  # crash mid-write
+
+    with JsonlWriter(str(stream), append=True) as writer:
+        writer.write(entry("c.py"))
+        writer.write(entry("d.py"))
+
+    assert [r["file"] for r in iter_jsonl(str(stream))] == ["a.py", "c.py", "d.py"]
@@ -0,0 +1,35 @@
+from utils.llm_cache import LLMCache, make_cache_key
+
+
+def test_cache_key_depends_on_prompt_model_and_temperature():
+    base = make_cache_key("prompt", "codellama", 0.2)
+    assert base == make_cache_key("prompt", "codellama", 0.2)
+    assert base != make_cache_key("prompt2", "codellama", 0.2)
+    assert base != make_cache_key("prompt", "gpt-4o", 0.2)
+    assert base != make_cache_key("prompt", "codellama", 0.7)
+
+
+def test_cache_round_trip_and_counters(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), max_bytes=1024 * 1024)
+    assert cache.get("missing") is None
+    cache.put("k", '{"file_summary": "x"}', [{"file_summary": "x"}])
+    entry = cache.get("k")
+    assert entry["raw"] == '{"file_summary": "x"}'
+    assert entry["parsed"] == [{"file_summary": "x"}]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_cache_persists_and_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = LLMCache(path, max_bytes=300)
+    for i in range(3):
+        cache.put(f"k{i}", "x" * 100)
+    cache.get("k0")  # k0 becomes most recently used
+    cache.put("k3", "x" * 100)
+    assert cache.total_bytes <= 300
+    assert cache.get("k1") is None
+    assert cache.get("k0") is not None
+    cache.close()
+
+    reopened = LLMCache(path, max_bytes=300)
+    assert reopened.get("k3") is not None
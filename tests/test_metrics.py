@@ -0,0 +1,72 @@
+import json
+import urllib.request
+
+from benchmarks.fake_llm import FakeChatModel
+from utils import metrics as metrics_module
+from utils.metrics import RunMetrics, UsageCallback, percentile, reset_run_metrics, serve_metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_nearest_rank_percentiles():
+    values = list(range(1, 101))
+    assert [percentile(values, q) for q in (0.5, 0.95, 0.99)] == [50, 95, 99]
+    assert percentile([], 0.5) is None
+
+
+def test_stages_files_and_cache_in_report():
+    clock = FakeClock()
+    metrics = RunMetrics(clock)
+    for seconds in (1.0, 3.0):
+        with metrics.stage("chunk"):
+            clock.now += seconds
+    metrics.record_file("a.py", 2.0)
+    metrics.count("cache_hits", 3)
+    metrics.count("cache_misses")
+
+    report = metrics.report(project="demo")
+
+    assert report["project"] == "demo"
+    assert report["stages"]["chunk"] == {"count": 2, "seconds": 4.0, "max": 3.0}
+    assert report["files"]["seconds"] == {"a.py": 2.0}
+    assert report["cache"] == {"hits": 3, "misses": 1, "hit_rate": 0.75}
+    json.dumps(report)
+
+
+def test_usage_callback_reads_usage_metadata():
+    metrics = reset_run_metrics()
+    callback = UsageCallback()
+    FakeChatModel().invoke("Here is the code: def f(): pass", config={"callbacks": [callback]})
+
+    llm = metrics.report()["llm"]
+    assert llm["calls"] == 1
+    assert llm["input_tokens"] > 0 and llm["output_tokens"] > 0
+    assert llm["latency"]["p50"] is not None
+
+
+def test_prometheus_text_and_endpoint(monkeypatch):
+    metrics = RunMetrics()
+    metrics.add_stage("scan", 0.5)
+    metrics.record_call(0.2, 100, 20)
+    monkeypatch.setattr(metrics_module, "_metrics", metrics)
+
+    text = metrics.prometheus_text()
+    assert 'insightfoundry_stage_seconds_total{stage="scan"} 0.500000' in text
+    assert "insightfoundry_input_tokens_total 100" in text
+    assert 'insightfoundry_llm_call_latency_seconds{quantile="0.99"} 0.2' in text
+    assert "insightfoundry_file_latency_seconds_count 0" in text
+
+    server = serve_metrics(0)
+    assert server.server_address[0] == "127.0.0.1"  # not exposed on other interfaces by default
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            assert response.read().decode() == text
+    finally:
+        server.shutdown()
+        server.server_close()
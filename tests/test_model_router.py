@@ -0,0 +1,115 @@
+import json
+
+import runners.summarize_batch as summarize_batch
+import runners.summarize_code as summarize_code
+from utils import model_router
+from utils.file_packing import get_pack_token_budget
+from utils.metrics import reset_run_metrics
+from utils.model_router import ModelTier, route_file
+
+TIERS = [
+    {"name": "small", "model": "tiny-coder", "context_limit": 2048, "max_tokens": 300, "max_score": 1.0},
+    {"name": "large", "model": "big-coder", "context_limit": 8000, "max_tokens": 600, "max_score": None},
+]
+
+GETTER = "class Point:\n    def get_x(self):\n        return self.x\n"
+SERVICE = "\n".join(f"def step_{i}(order):\n    if order.paid and order.items:\n        return ship(order)\n"
+                    f"    for item in order.items:\n        reserve(item)\n" for i in range(150))
+
+
+def test_trivial_files_go_to_the_cheap_tier(monkeypatch):
+    monkeypatch.setattr(model_router, "MODEL_ROUTING", True)
+    monkeypatch.setattr(model_router, "MODEL_TIERS", TIERS)
+    metrics = reset_run_metrics()
+
+    assert [t.name for t in route_file(GETTER, "Python", "point.py")] == ["small", "large"]
+    assert [t.name for t in route_file(SERVICE, "Python", "service.py")] == ["large"]
+    assert [t.name for t in route_file(GETTER, "Python", "point.py", {"file_complexity": 40})] == ["large"]
+    assert metrics.counters["routed_small"] == 1 and metrics.counters["routed_large"] == 2
+
+
+def test_without_routing_every_file_uses_the_default_model():
+    tiers = route_file(SERVICE, "Python", "service.py")
+    assert [t.model for t in tiers] == [summarize_code.MODEL_NAME]
+
+
+class ScriptedChain:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def invoke(self, prompt_input):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+PROMPT_INPUT = {"language": "Python", "file_path": "a.py", "chunk_num": 1, "total_chunks": 1, "code": "x = 1"}
+
+
+def test_invalid_cheap_response_escalates_to_the_next_tier(monkeypatch):
+    monkeypatch.setattr(summarize_code, "get_llm_cache", lambda: None)
+    metrics = reset_run_metrics()
+    small, large = ModelTier(**TIERS[0]), ModelTier(**TIERS[1])
+    cheap = ScriptedChain(['{"methods": "n/a"}'] * 5)
+    strong = ScriptedChain([json.dumps({"file_summary": "ok", "methods": []})])
+
+    objects = summarize_code.summarize_chunk(cheap, PROMPT_INPUT, tier=small, escalation=[(large, strong)])
+
+    assert objects == [{"file_summary": "ok", "methods": []}]
+    assert (cheap.calls, strong.calls) == (1, 1)
+    assert metrics.counters["escalations"] == 1
+
+
+def test_valid_cheap_response_is_not_escalated(monkeypatch):
+    monkeypatch.setattr(summarize_code, "get_llm_cache", lambda: None)
+    cheap = ScriptedChain([json.dumps({"file_summary": "ok", "methods": []})])
+    strong = ScriptedChain([])
+    small, large = ModelTier(**TIERS[0]), ModelTier(**TIERS[1])
+
+    summarize_code.summarize_chunk(cheap, PROMPT_INPUT, tier=small, escalation=[(large, strong)])
+    assert strong.calls == 0
+
+
+def test_routed_file_is_chunked_for_its_tier(monkeypatch):
+    monkeypatch.setattr(model_router, "MODEL_ROUTING", True)
+    monkeypatch.setattr(model_router, "MODEL_TIERS", TIERS)
+    monkeypatch.setattr(summarize_code, "get_llm_cache", lambda: None)
+    chunking, built = [], []
+    monkeypatch.setattr(summarize_code, "token_aware_chunking",
+                        lambda code, *a, context_limit, **k: chunking.append(context_limit) or [code])
+    chain = ScriptedChain([json.dumps({"file_summary": "Point", "file_complexity_estimate": 1, "methods": []})])
+    monkeypatch.setattr(summarize_code, "build_chain_for_language",
+                        lambda rolling, model, max_tokens: built.append((model, max_tokens)) or chain)
+
+    entry = summarize_code.summarize_code(GETTER, "Unknown", "point.py")
+
+    assert chunking == [2048]
+    assert built == [("tiny-coder", 300), ("big-coder", 600)]
+    assert entry["description"]["file_summary"] == "Point"
+
+
+class BatchChain:
+    def __init__(self, model, covered):
+        self.model, self.covered, self.batches = model, covered, []
+
+    def invoke(self, prompt_input):
+        paths = [p for p in ("a.py", "b.py") if f"### File: {p}" in prompt_input["files"]]
+        self.batches.append(paths)
+        return json.dumps({"files": [{"file_path": p, "file_summary": f"{p[0]} by {self.model}", "methods": []}
+                                     for p in paths if p in self.covered]})
+
+
+def test_packed_batch_goes_to_the_cheap_tier_and_escalates_missed_files(monkeypatch):
+    monkeypatch.setattr(model_router, "MODEL_ROUTING", True)
+    monkeypatch.setattr(model_router, "MODEL_TIERS", TIERS)
+    monkeypatch.setattr(summarize_code, "get_llm_cache", lambda: None)
+    metrics = reset_run_metrics()
+    chains = {"tiny-coder": BatchChain("tiny-coder", {"a.py"}), "big-coder": BatchChain("big-coder", {"a.py", "b.py"})}
+    monkeypatch.setattr(summarize_batch, "build_chain_for_file_batch", lambda model=None: chains[model])
+
+    results = summarize_batch.summarize_file_batch([("a.py", "Python", "x = 1"), ("b.py", "Python", "y = 2")])
+
+    assert [r["description"]["file_summary"] for r in results] == ["a by tiny-coder", "b by big-coder"]
+    assert chains["tiny-coder"].batches == [["a.py", "b.py"]] and chains["big-coder"].batches == [["b.py"]]
+    assert metrics.counters["routed_small"] == 1 and metrics.counters["escalations"] == 1
+    assert get_pack_token_budget() < get_pack_token_budget(TIERS[1]["context_limit"])  # sized for the cheap tier
@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_ollama import ChatOllama
+
+from utils.chains import get_llm, reset_clients
+from utils.metrics import UsageCallback, reset_run_metrics
+from utils.ollama_util import OllamaLifecycle, num_ctx_for, preload_models, unload_models
+
+
+class FakeOllama(BaseHTTPRequestHandler):
+    """Just enough of the Ollama API: load/unload via /api/generate, /api/ps and a streamed /api/chat."""
+    loaded = {}
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._json({"models": [{"name": name} for name in self.loaded]})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append((self.path, body))
+        if self.path == "/api/generate":
+            if body.get("keep_alive") == 0:
+                self.loaded.pop(body["model"], None)
+                self._json({"model": body["model"], "done": True, "done_reason": "unload"})
+            else:
+                time.sleep(0.05)
+                self.loaded[body["model"]] = body["options"]["num_ctx"]
+                self._json({"model": body["model"], "done": True, "done_reason": "load", "load_duration": 50_000_000})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for i, piece in enumerate(['{"file_summary": ', '"ok"}']):
+            self.wfile.write(json.dumps({"model": body["model"], "message": {"role": "assistant", "content": piece},
+                                         "done": False}).encode() + b"\n")
+            self.wfile.flush()
+            time.sleep(0.1)
+        self.wfile.write(json.dumps({"model": body["model"], "message": {"role": "assistant", "content": ""},
+                                     "done": True, "done_reason": "stop", "prompt_eval_count": 12,
+                                     "eval_count": 4}).encode() + b"\n")
+
+
+def start_server():
+    FakeOllama.loaded, FakeOllama.requests = {}, []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_preload_and_unload_over_http():
+    metrics = reset_run_metrics()
+    server, url = start_server()
+    try:
+        preload_models(["coder-small", "coder-large"], [url]).join(5)
+        assert FakeOllama.loaded == {"coder-small": num_ctx_for("coder-small"),
+                                     "coder-large": num_ctx_for("coder-large")}
+        assert all(body["keep_alive"] and body["stream"] is False for _, body in FakeOllama.requests)
+        assert metrics.stages["model_load"]["count"] == 2 and metrics.stages["model_load"]["max"] >= 0.05
+
+        unload_models(["coder-small"], [url])
+        lifecycle = OllamaLifecycle(url)
+        assert lifecycle.loaded_models() == ["coder-large"]
+        lifecycle.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_unreachable_server_only_logs():
+    server, url = start_server()
+    server.shutdown()
+    server.server_close()
+    preload_models(["coder"], [url]).join(5)
+    unload_models(["coder"], [url])
+
+
+def test_requests_reuse_the_preloaded_context_and_record_first_token_latency():
+    metrics = reset_run_metrics()
+    server, url = start_server()
+    try:
+        OllamaLifecycle(url).load("coder")
+        llm = ChatOllama(model="coder", base_url=url, num_ctx=num_ctx_for("coder"), callbacks=[UsageCallback()])
+        assert llm.invoke("summarize").content == '{"file_summary": "ok"}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    chat = [body for path, body in FakeOllama.requests if path == "/api/chat"][0]
+    assert chat["options"]["num_ctx"] == FakeOllama.loaded["coder"]  # same context: no reload
+    report = metrics.report()
+    first_token, total = report["llm"]["first_token_latency"]["max"], report["llm"]["latency"]["max"]
+    assert first_token is not None and first_token + 0.15 < total
+    assert report["llm"]["input_tokens"] == 12 and report["llm"]["output_tokens"] == 4
+
+
+def test_completion_budget_is_sent_as_num_predict():
+    server, url = start_server()
+    try:
+        get_llm(max_tokens=400, base_url=url, model="coder-small").invoke("summarize")
+    finally:
+        server.shutdown()
+        server.server_close()
+        reset_clients()
+
+    chat = [body for path, body in FakeOllama.requests if path == "/api/chat"][0]
+    assert chat["options"]["num_predict"] == 400
+    assert chat["options"]["num_ctx"] == num_ctx_for("coder-small")
@@ -30,3 +30,11 @@ def test_prompt_includes_instruction_to_return_json_only():
     """Check if the prompt explicitly asks to return ONLY JSON."""
     prompt = get_project_summary_prompt()
     assert "Return ONLY a valid JSON object." in prompt.template
+
+
+def test_multi_file_prompt_asks_for_one_entry_per_path():
+    from prompts.language_prompts import get_multi_file_analysis_prompt
+    prompt = get_multi_file_analysis_prompt()
+    assert set(prompt.input_variables) == {"file_count", "files"}
+    assert '"file_path"' in prompt.template
+    assert "Return ONLY a valid JSON object" in prompt.template
@@ -0,0 +1,64 @@
+import json
+
+from runners import summarize_code as summarize_code_module
+from utils.rolling_context import format_state, new_state, update_state
+
+
+def analysis(summary, *methods, complexity=2):
+    return {"file_summary": summary, "file_complexity_estimate": complexity,
+            "methods": [{"method_name": m, "signature": f"{m}()", "description": f"does {m}"} for m in methods],
+            "mocks": [], "assertions": [], "noteworthy": ["long file"]}
+
+
+def test_state_keeps_latest_summary_and_first_method_entry():
+    state = new_state()
+    update_state(state, [analysis("Parses input", "parse", "Reader.read(self)")])
+    update_state(state, [analysis("Parses and validates input", "read", "validate", complexity=5)])
+
+    assert state["file_summary"] == "Parses and validates input"
+    assert state["file_complexity_estimate"] == 5
+    assert [m["method_name"] for m in state["methods"]] == ["parse", "Reader.read(self)", "validate"]
+    assert state["noteworthy"] == ["long file"]
+    assert format_state(state, 200) == ("Summary so far: Parses and validates input\n"
+                                        "Methods already listed: parse, read, validate")
+
+
+def test_format_state_drops_oldest_names_over_budget():
+    state = new_state()
+    update_state(state, [analysis("s", *[f"method_{i}" for i in range(50)])])
+    text = format_state(state, 60)
+    assert "method_49" in text and "method_0," not in text
+    assert "earlier methods, then" in text
+
+
+class RollingChain:
+    def __init__(self):
+        self.inputs = []
+
+    def invoke(self, prompt_input):
+        self.inputs.append(dict(prompt_input))
+        n = prompt_input["chunk_num"]
+        # every chunk re-reports `shared`, as a model that sees overlapping code would
+        return json.dumps(analysis(f"Summary after chunk {n}", f"step{n}", "shared", complexity=n))
+
+
+def test_rolling_mode_carries_state_and_emits_one_record(monkeypatch):
+    chain = RollingChain()
+    monkeypatch.setattr(summarize_code_module, "CHUNK_MODE", "rolling")
+    monkeypatch.setattr(summarize_code_module, "STATIC_ANALYSIS", False)
+    monkeypatch.setattr(summarize_code_module, "get_llm_cache", lambda: None)
+    monkeypatch.setattr(summarize_code_module, "build_chain_for_language", lambda *a: chain)
+    overlaps = []
+    monkeypatch.setattr(summarize_code_module, "token_aware_chunking",
+                        lambda code, language, path, reserved, overlap, context_limit: overlaps.append(overlap) or ["a", "b", "c"])
+
+    entry = summarize_code_module.summarize_code("code", "Python", "big.py")
+
+    assert overlaps == [0]
+    assert [i["state"].splitlines()[0] for i in chain.inputs] == [
+        "Summary so far: (none yet)", "Summary so far: Summary after chunk 1", "Summary so far: Summary after chunk 2"]
+    assert chain.inputs[2]["state"].endswith("Methods already listed: step1, shared, step2")
+    description = entry["description"]
+    assert description["file_summary"] == "Summary after chunk 3"
+    assert description["file_complexity_estimate"] == 3
+    assert [m["method_name"] for m in description["methods"]] == ["step1", "shared", "step2", "step3"]
@@ -0,0 +1,67 @@
+import os
+import subprocess
+
+from utils.file_utils import infer_language_from_path
+from utils.scanner import GitIgnore, scan_code_files
+
+
+def make_tree(root):
+    files = {
+        "src/app.py": "print('hi')\n",
+        "src/util.JS": "export const x = 1;\n",
+        "src/app.min.js": "var a=1;\n",
+        "src/generated/api.py": "x = 1\n",
+        "src/generated/keep.py": "x = 1\n",
+        "src/notes.txt": "not code\n",
+        "src/empty.py": "",
+        "src/big.py": "x = 1\n" * 400,
+        "node_modules/lib/index.js": "module.exports = 1;\n",
+        "target/classes/Gen.java": "class Gen {}\n",
+        "logs/debug.py": "x = 1\n",
+        ".hidden/secret.py": "x = 1\n",
+        "output/result.py": "x = 1\n",
+        ".gitignore": "logs/\n/src/generated/*\n!/src/generated/keep.py\n",
+    }
+    for rel, content in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    (root / "src" / "blob.py").write_bytes(b"\x00\x01binary")
+    return root
+
+
+EXPECTED = ["src/app.py", "src/generated/keep.py", "src/util.JS"]
+
+
+def relative(root, files):
+    return [os.path.relpath(f, root).replace(os.sep, "/") for f in files]
+
+
+def test_walk_filters_ignored_vendored_generated_binary_and_large_files(tmp_path):
+    root = make_tree(tmp_path / "proj")
+    files = scan_code_files(str(root), {"output"}, use_git=False, max_bytes=1000)
+    assert relative(root, files) == EXPECTED
+
+
+def test_git_listing_gives_the_same_files(tmp_path):
+    root = make_tree(tmp_path / "proj")
+    subprocess.run(["git", "init", "-q", str(root)], check=True)
+    files = scan_code_files(str(root), {"output"}, use_git=True, max_bytes=1000)
+    assert relative(root, files) == EXPECTED
+
+
+def test_gitignore_rules():
+    rules = GitIgnore(["# comment", "*.log", "build/", "/top.py", "docs/**/*.md", "!keep.log"])
+    assert rules.match("a/b/x.log", False) is True
+    assert rules.match("keep.log", False) is False
+    assert rules.match("a/build", True) is True
+    assert rules.match("a/build", False) is None  # directory-only rule
+    assert rules.match("top.py", False) is True
+    assert rules.match("a/top.py", False) is None  # anchored to the .gitignore directory
+    assert rules.match("docs/a/b/readme.md", False) is True
+
+
+def test_language_lookup_by_extension():
+    assert infer_language_from_path("src/Main.java") == "Java"
+    assert infer_language_from_path("src/APP.PY") == "Python"
+    assert infer_language_from_path("Makefile") == "Unknown"
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.scheduler import RequestScheduler, TokenBucket, get_retry_after, is_retryable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse(status_code, headers)
+
+
+def test_token_bucket_refills_per_minute():
+    clock = FakeClock()
+    bucket = TokenBucket(600, clock)  # 10 per second
+    assert bucket.delay(600) == 0
+    bucket.take(600)
+    assert bucket.delay(10) == pytest.approx(1.0)
+    clock.now = 0.5
+    assert bucket.delay(10) == pytest.approx(0.5)
+    assert bucket.delay(10_000) == pytest.approx(59.5)  # capped at one full bucket
+
+
+def test_tokens_per_minute_budget_delays_expensive_requests():
+    clock = FakeClock()
+    scheduler = RequestScheduler(rpm=1000, tpm=6000, clock=clock)
+    scheduler._take(5000)
+    assert scheduler._delay(1000) == 0
+    assert scheduler._delay(2000) == pytest.approx(10.0)  # 1000 tokens short at 100 tokens/second
+
+
+def test_retry_after_header_forms():
+    assert get_retry_after(FakeAPIError(429, {"retry-after": "2"})) == 2.0
+    assert get_retry_after(FakeAPIError(429, {"retry-after-ms": "250"})) == 0.25
+    assert get_retry_after(FakeAPIError(429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+    assert get_retry_after(FakeAPIError(500)) is None
+    assert is_retryable(FakeAPIError(429)) and is_retryable(TimeoutError())
+    assert not is_retryable(FakeAPIError(400)) and not is_retryable(ValueError())
+
+
+def test_rate_limited_call_waits_for_retry_after_then_succeeds():
+    scheduler = RequestScheduler(max_retries=3, backoff_base=0.01)
+    attempts = []
+
+    def call():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise FakeAPIError(429, {"retry-after": "0.1"})
+        return "ok"
+
+    assert scheduler.run(call, cost=10) == "ok"
+    assert attempts[1] - attempts[0] >= 0.1
+    assert scheduler.retries == 1
+
+
+def test_non_retryable_and_exhausted_errors_are_raised():
+    scheduler = RequestScheduler(max_retries=2, backoff_base=0.001)
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise FakeAPIError(400)
+
+    with pytest.raises(FakeAPIError):
+        scheduler.run(bad_request, cost=1)
+    assert len(calls) == 1
+
+    async def always_down():
+        calls.append(1)
+        raise FakeAPIError(503)
+
+    with pytest.raises(FakeAPIError):
+        asyncio.run(scheduler.arun(always_down, cost=1))
+    assert len(calls) == 1 + 3
+
+
+def test_waiting_requests_are_released_in_priority_order():
+    scheduler = RequestScheduler(rpm=6000)  # one request every 10ms once the burst is used up
+    scheduler.requests.drain()
+    released = []
+
+    async def request(priority):
+        await scheduler.acquire(1, priority)
+        released.append(priority)
+
+    async def run():
+        await asyncio.gather(*(request((job, chunk)) for job in (2, 1, 0) for chunk in (1, 0)))
+
+    asyncio.run(run())
+    assert released == sorted(released)
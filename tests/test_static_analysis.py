@@ -0,0 +1,162 @@
+import json
+
+from runners import summarize_code as summarize_code_module
+from utils.static_analysis import apply_facts, chunk_line_spans, extract_facts, facts_for_chunk, format_facts, \
+    tree_facts
+
+PYTHON_SOURCE = '''import os
+
+
+def load(path, retries=3) -> str:
+    for attempt in range(retries):
+        if os.path.exists(path):
+            return open(path).read()
+    return ""
+
+
+class Store:
+    async def save(self, key, value):
+        if key and value:
+            return True
+        return False
+'''
+
+
+def test_python_methods_signatures_spans_and_complexity():
+    facts = extract_facts(PYTHON_SOURCE, "Python")
+    assert [(m["method_name"], m["signature"], m["start_line"], m["end_line"], m["complexity"])
+            for m in facts["methods"]] == [
+        ("load", "def load(path, retries=3) -> str", 4, 8, 3),
+        ("save", "async def save(self, key, value)", 12, 15, 3),
+    ]
+    assert facts["file_complexity"] == 6
+    assert extract_facts("def broken(:\n", "Python") is None
+
+
+class Node:
+    """Minimal stand-in for a tree-sitter node."""
+
+    def __init__(self, source, node_type, text, children=(), fields=None):
+        start = source.index(text)
+        self.type = node_type
+        self.is_named = node_type not in ("&&", "||")
+        self.start_byte, self.end_byte = start, start + len(text)
+        self.start_point = (source[:start].count("\n"), 0)
+        self.end_point = (source[:self.end_byte].count("\n"), 0)
+        self.children = list(children)
+        self.fields = fields or {}
+
+    def child_by_field_name(self, name):
+        return self.fields.get(name)
+
+
+def test_tree_sitter_functions_and_decision_points():
+    source = "function add(a, b) {\n  if (a && b) { return a; }\n  return b;\n}\nlet c = x ? 1 : 2;\n"
+    name = Node(source, "identifier", "add")
+    condition = Node(source, "binary_expression", "a && b", [Node(source, "&&", "&&")])
+    branch = Node(source, "if_statement", "if (a && b) { return a; }", [condition])
+    end = source.index("\n}\n") + 2
+    body = Node(source, "statement_block", source[source.index("{"):end], [branch])
+    function = Node(source, "function_declaration", source[:end], [name, body],
+                    {"name": name, "body": body})
+    ternary = Node(source, "ternary_expression", "x ? 1 : 2")
+    root = Node(source, "program", source, [function, ternary])
+
+    facts = tree_facts(source.encode(), root)
+
+    assert facts["methods"] == [{"method_name": "add", "qualified_name": "add", "signature": "function add(a, b)", "start_line": 1,
+                                 "end_line": 4, "complexity": 3}]
+    assert facts["file_complexity"] == 4  # the function plus the module-level ternary
+
+
+def test_real_parser_facts_for_java():
+    source = """package shop;
+
+public class Cart {
+    private int total;
+
+    public Cart(int total) { this.total = total; }
+
+    public int discount(int percent) {
+        if (percent > 50 && total > 0) {
+            return total / 2;
+        }
+        for (int i = 0; i < percent; i++) { total--; }
+        return total;
+    }
+}
+"""
+    facts = extract_facts(source, "Java")
+    assert [(m["method_name"], m["signature"], m["start_line"], m["end_line"], m["complexity"])
+            for m in facts["methods"]] == [
+        ("Cart", "public Cart(int total)", 6, 6, 1),
+        ("discount", "public int discount(int percent)", 8, 14, 4),
+    ]
+    assert facts["file_complexity"] == 5
+
+
+def test_facts_replace_llm_guesses_and_keep_descriptions():
+    facts = extract_facts(PYTHON_SOURCE, "Python")
+    llm = {"file_summary": "Loads and stores", "file_complexity_estimate": 42,
+           "methods": [{"method_name": "Store.save(self, key, value)", "description": "Saves a value",
+                        "complexity": 9}]}
+    merged = apply_facts(llm, facts)
+    assert merged["file_complexity_estimate"] == 6
+    assert [(m["method_name"], m["description"], m["complexity"]) for m in merged["methods"]] == [
+        ("load", "", 3), ("save", "Saves a value", 3)]
+
+
+def test_same_named_methods_keep_their_own_descriptions():
+    source = ("class A:\n    def save(self):\n        pass\n\n\n"
+              "def helper():\n    pass\n\n\n"
+              "class B:\n    def save(self):\n        pass\n")
+    facts = extract_facts(source, "Python")
+    assert [m["qualified_name"] for m in facts["methods"]] == ["A.save", "helper", "B.save"]  # source order
+
+    llm = {"file_summary": "s", "methods": [{"method_name": "B.save()", "description": "Saves B"},
+                                            {"method_name": "A.save", "description": "Saves A"},
+                                            {"method_name": "helper", "description": "Helps"}]}
+    assert [m["description"] for m in apply_facts(llm, facts)["methods"]] == ["Saves A", "Helps", "Saves B"]
+
+    unqualified = {"file_summary": "s", "methods": [{"method_name": "save", "description": "first"},
+                                                    {"method_name": "save", "description": "second"}]}
+    assert [m["description"] for m in apply_facts(unqualified, facts)["methods"]] == ["first", "", "second"]
+
+
+def test_chunk_facts_and_prompt_lines():
+    facts = extract_facts(PYTHON_SOURCE, "Python")
+    head, tail = PYTHON_SOURCE[:PYTHON_SOURCE.index("class Store")], PYTHON_SOURCE[PYTHON_SOURCE.index("class Store"):]
+    caller = "def main():\n    return load('a') and Store().save(1, 2)\n"
+    spans = chunk_line_spans(PYTHON_SOURCE + caller, [head, tail, caller])
+    assert spans == [(1, 8), (11, 15), (16, 17)]
+    assert [[m["method_name"] for m in facts_for_chunk(facts, *span)] for span in spans] == [["load"], ["save"], []]
+    assert format_facts(facts["methods"], 1000).splitlines() == [
+        "- load: def load(path, retries=3) -> str (lines 4-8)",
+        "- Store.save: async def save(self, key, value) (lines 12-15)",
+    ]
+    assert format_facts([], 1000) == "(no methods defined in this chunk)"
+
+
+class DescriptionChain:
+    def __init__(self):
+        self.inputs = []
+
+    def invoke(self, prompt_input):
+        self.inputs.append(prompt_input)
+        return json.dumps({"file_summary": "Loads and stores files",
+                           "methods": [{"method_name": "load", "description": "Reads a file with retries"}]})
+
+
+def test_summarize_code_asks_only_for_descriptions(monkeypatch):
+    chain = DescriptionChain()
+    monkeypatch.setattr(summarize_code_module, "build_chain_for_description", lambda *a: chain)
+    monkeypatch.setattr(summarize_code_module, "get_llm_cache", lambda: None)
+
+    entry = summarize_code_module.summarize_code(PYTHON_SOURCE, "Python", "store.py")
+
+    assert "- load: def load(path, retries=3) -> str (lines 4-8)" in chain.inputs[0]["facts"]
+    description = entry["description"]
+    assert description["file_complexity_estimate"] == 6
+    assert description["methods"][0] == {"method_name": "load", "signature": "def load(path, retries=3) -> str",
+                                          "description": "Reads a file with retries", "complexity": 3,
+                                          "start_line": 4, "end_line": 8}
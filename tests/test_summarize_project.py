@@ -0,0 +1,79 @@
+import json
+
+import runners.summarize_project as summarize_project
+from runners.summarize_project import pack_grouped_sections, group_files_by_role
+from utils import token_counter
+
+
+class WhitespaceEncoder:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+    def encode_batch(self, texts, num_threads=8, disallowed_special=()):
+        return [t.split() for t in texts]
+
+
+class FakeChain:
+    """Echoes a short digest of its input so merges shrink the text; the project chain answers with JSON."""
+
+    def __init__(self, calls, name):
+        self.calls = calls
+        self.name = name
+
+    def invoke(self, prompt_input):
+        text = str(next(iter(prompt_input.values())))
+        self.calls.append((self.name, text))
+        if self.name == "build_chain_for_project":
+            return json.dumps({"project_name": "demo"})
+        return f"digest of {len(text.split())} words"
+
+
+def descriptions(n):
+    return [{"file": f"src/service_{i}.py", "description": {"file_summary": f"file {i} " + "word " * 20}}
+            for i in range(n)]
+
+
+def test_sections_keep_every_file_within_budget(monkeypatch):
+    monkeypatch.setattr(token_counter, "get_encoder", lambda model_name=None: WhitespaceEncoder())
+    grouped = group_files_by_role(descriptions(50))
+    sections = pack_grouped_sections(grouped, 100)
+
+    assert len(sections) > 1
+    assert all(len(s.split()) <= 100 for s in sections)
+    joined = "".join(sections)
+    assert all(f"file {i} " in joined for i in range(50))
+    assert all(s.lstrip().startswith("### Services / Logic Files") for s in sections)
+
+
+def test_large_projects_are_map_reduced_instead_of_truncated(monkeypatch):
+    monkeypatch.setattr(token_counter, "get_encoder", lambda model_name=None: WhitespaceEncoder())
+    monkeypatch.setattr(summarize_project, "get_summary_token_budget", lambda template, key="": 60)
+    calls = []
+    for name in ("build_chain_for_partial_summary", "build_chain_for_summary_merge", "build_chain_for_project"):
+        monkeypatch.setattr(summarize_project, name, lambda name=name: FakeChain(calls, name))
+
+    result = summarize_project.summarize_project(descriptions(40))
+
+    assert result == {"project_name": "demo"}
+    map_calls = [text for name, text in calls if name == "build_chain_for_partial_summary"]
+    assert len(map_calls) > 1  # every section is summarized
+    final_name, final_input = calls[-1]
+    assert final_name == "build_chain_for_project"
+    assert "### Part 1" in final_input
+    assert len(final_input.split()) <= 60
+
+
+def test_most_central_files_come_first_across_roles(monkeypatch):
+    monkeypatch.setattr(token_counter, "get_encoder", lambda model_name=None: WhitespaceEncoder())
+    entries = [{"file": f"lib/other_{i}.py", "description": {"file_summary": f"other {i} " + "word " * 10}}
+               for i in range(20)]
+    entries.append({"file": "tests/conftest.py", "description": {"file_summary": "shared fixtures " + "word " * 10}})
+    centrality = {entry["file"]: 0.01 for entry in entries}
+    centrality["tests/conftest.py"] = 0.5
+
+    sections = pack_grouped_sections(group_files_by_role(entries, centrality), 60)
+
+    assert len(sections) > 1
+    assert sections[0].lstrip().startswith("### Tests Files\n- shared fixtures")
+    assert all(len(s.split()) <= 60 for s in sections)
+    assert sum(s.count("- other ") for s in sections) == 20
@@ -0,0 +1,74 @@
+import numpy as np
+
+from runners.summarize_project import group_files_by_role
+from utils import symbol_index
+from utils.symbol_index import build_symbol_index, pagerank
+
+
+def write(root, rel_path, text):
+    path = root / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return str(path)
+
+
+def build(tmp_path, monkeypatch, sources):
+    monkeypatch.setattr(symbol_index, "get_process_pool", lambda: None)
+    paths = [write(tmp_path / "repo", rel_path, text) for rel_path, text in sources.items()]
+    return build_symbol_index(paths, str(tmp_path / "index.sqlite")), str(tmp_path / "repo")
+
+
+def test_python_definitions_imports_and_centrality(tmp_path, monkeypatch):
+    index, root = build(tmp_path, monkeypatch, {
+        "app/models.py": "class User:\n    def save(self):\n        pass\n",
+        "app/store.py": "from app.models import User\n\nclass Store:\n    def save(self, user):\n        pass\n",
+        "app/service.py": "from .models import User\nfrom .store import Store\n\ndef register(name):\n"
+                          "    return Store().save(User())\n",
+        "app/api.py": "from app.service import register\n\ndef handle(entry):\n    return register(entry)\n",
+    })
+
+    assert [(d["path"], d["line"]) for d in index.where_defined("User")] == [(f"{root}/app/models.py", 1)]
+    assert [d["path"] for d in index.where_defined("Store.save")] == [f"{root}/app/store.py"]
+    assert {d["symbol"] for d in index.where_defined("save")} == {"User.save", "Store.save"}
+    assert index.where_defined("missing") == []
+
+    neighbours = index.neighbours(f"{root}/app/service.py")
+    assert sorted(neighbours["uses"]) == [f"{root}/app/models.py", f"{root}/app/store.py"]
+    assert neighbours["used_by"] == [f"{root}/app/api.py"]
+    centrality = index.centrality()
+    ranked = sorted(centrality, key=centrality.get, reverse=True)
+    assert ranked[0] == f"{root}/app/models.py" and ranked[-1] == f"{root}/app/api.py"
+    index.close()
+
+
+def test_regex_fallback_links_same_package_types_and_imports(tmp_path, monkeypatch):
+    index, root = build(tmp_path, monkeypatch, {
+        "src/com/shop/util/Money.java": "package com.shop.util;\n\npublic class Money {\n"
+                                        "    public static Money of(long cents) { return new Money(); }\n}\n",
+        "src/com/shop/Cart.java": "package com.shop;\n\nimport com.shop.util.Money;\n\npublic class Cart {\n"
+                                  "    public Money total() { return Money.of(0); }\n}\n",
+        "src/com/shop/Checkout.java": "package com.shop;\n\npublic class Checkout {\n"
+                                      "    private final Cart cart = new Cart();\n}\n",
+        "web/app.js": "const { fetchCart } = require('./client');\nfunction render() {}\n",
+        "web/client.js": "export function fetchCart() {}\n",
+    })
+
+    assert [d["kind"] for d in index.where_defined("Money")] == ["class"]
+    assert index.neighbours(f"{root}/src/com/shop/Cart.java")["uses"] == [f"{root}/src/com/shop/util/Money.java"]
+    assert index.neighbours(f"{root}/src/com/shop/Checkout.java")["uses"] == [f"{root}/src/com/shop/Cart.java"]
+    assert index.neighbours(f"{root}/web/app.js")["uses"] == [f"{root}/web/client.js"]
+    index.close()
+
+
+def test_pagerank_is_a_distribution_favouring_depended_on_nodes():
+    ranks = pagerank(3, [(0, 2, 1), (1, 2, 1)])
+    assert np.isclose(ranks.sum(), 1.0)
+    assert ranks[2] > ranks[0] == ranks[1]
+    assert np.allclose(pagerank(2, []), [0.5, 0.5])
+
+
+def test_project_summary_lists_central_files_first():
+    entries = [{"file": f"src/service_{i}.py", "description": {"file_summary": f"file {i}"}} for i in range(3)]
+    grouped = group_files_by_role(entries, {"src/service_2.py": 0.5, "src/service_0.py": 0.3})
+    assert [item["path"] for item in grouped["Services / Logic"]] == [
+        "src/service_2.py", "src/service_0.py", "src/service_1.py"]
@@ -0,0 +1,102 @@
+import re
+
+from utils import token_counter, syntax_chunking
+from utils.syntax_chunking import pack_nodes, syntax_aware_chunks
+
+
+class WhitespaceEncoder:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+    def encode_batch(self, texts, num_threads=8, disallowed_special=()):
+        return [t.split() for t in texts]
+
+
+class Node:
+    """Minimal stand-in for a tree-sitter node: byte span plus children."""
+
+    def __init__(self, start_byte, end_byte, children=()):
+        self.start_byte = start_byte
+        self.end_byte = end_byte
+        self.children = list(children)
+
+
+def function(name, body_words):
+    return f"def {name}():\n    " + " ".join(["x"] * body_words) + "\n\n"
+
+
+def build_module(parts):
+    source, nodes = "", []
+    for text in parts:
+        nodes.append(Node(len(source), len(source) + len(text)))
+        source += text
+    return source.encode(), Node(0, len(source), nodes)
+
+
+def no_split(text, budget):
+    raise AssertionError("whole definitions should not be split")
+
+
+def test_whole_definitions_are_packed_without_splitting(monkeypatch):
+    monkeypatch.setattr(token_counter, "get_encoder", lambda model_name=None: WhitespaceEncoder())
+    parts = [function(f"f{i}", 20) for i in range(10)]  # 22 tokens each
+    source, root = build_module(parts)
+
+    chunks = pack_nodes(source, root, 50, no_split)
+
+    assert "".join(chunks) == source.decode()
+    assert all(len(c.split()) <= 50 for c in chunks)
+    assert len(chunks) == 5  # two definitions per chunk
+    assert all(c.startswith("def ") for c in chunks)
+
+
+def test_oversize_definition_is_packed_from_its_children(monkeypatch):
+    monkeypatch.setattr(token_counter, "get_encoder", lambda model_name=None: WhitespaceEncoder())
+    header = "class Big:\n"
+    methods = [function(f"m{i}", 30) for i in range(4)]
+    source = header + "".join(methods)
+    offset, children = len(header), []
+    for m in methods:
+        children.append(Node(offset, offset + len(m)))
+        offset += len(m)
+    class_node = Node(0, len(source), [Node(0, len(header) - 1)] + children)
+    root = Node(0, len(source), [class_node])
+
+    chunks = pack_nodes(source.encode(), root, 70, no_split)
+
+    assert "".join(chunks) == source
+    assert chunks[0].startswith("class Big:\ndef m0")
+    assert all(len(c.split()) <= 70 for c in chunks)
+
+
+def test_oversize_leaf_falls_back_to_splitter(monkeypatch):
+    monkeypatch.setattr(token_counter, "get_encoder", lambda model_name=None: WhitespaceEncoder())
+    source, root = build_module([function("huge", 200)])
+    calls = []
+    chunks = pack_nodes(source, root, 50, lambda text, budget: calls.append(text) or ["a", "b"])
+    assert calls == [source.decode()]
+    assert chunks == ["a", "b"]
+
+
+def test_unparsable_language_returns_none(monkeypatch):
+    monkeypatch.setattr(token_counter, "get_encoder", lambda model_name=None: WhitespaceEncoder())
+    monkeypatch.setattr(syntax_chunking, "get_parser", lambda language: None)
+    code = function("f", 500)
+    assert syntax_aware_chunks(code, "Cobol", 100, no_split) is None
+    assert syntax_aware_chunks(code, "Cobol", 1000, no_split) == [code]
+
+
+def test_real_parser_chunks_python_along_definitions(monkeypatch):
+    monkeypatch.setattr(token_counter, "get_encoder", lambda model_name=None: WhitespaceEncoder())
+    assert syntax_chunking.get_parser("Python") is not None
+    body = "".join(f"    x{i} = {i}\n" for i in range(6))  # 18 tokens
+    code = "import os\n\n\n" + "".join(f"def f{i}():\n{body}\n\n" for i in range(6)) + "class Big:\n" + "".join(
+        f"    def m{i}(self):\n{body.replace('    ', '        ')}\n" for i in range(4))
+
+    chunks = syntax_aware_chunks(code, "Python", 50, no_split)
+
+    assert "".join(chunks).strip() == code.strip()
+    assert len(chunks) > 1 and all(len(c.split()) <= 50 for c in chunks)
+    assert all(c.lstrip().startswith(("import", "def ", "class ")) for c in chunks)
+    assert not any(re.fullmatch(r"\s*(?:class|def) [^\n]*:\s*", c) for c in chunks)  # no header-only chunk
+    assert any(c.lstrip().startswith("class Big:\n    def m0") for c in chunks)
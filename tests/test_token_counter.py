@@ -0,0 +1,52 @@
+from prompts.language_prompts import get_code_analysis_prompt
+from utils import token_counter
+from utils.token_counter import count_tokens, count_tokens_batch, estimate_tokens_fast, count_prompt_prefix_tokens
+
+
+class FakeEncoder:
+    """Whitespace tokenizer standing in for tiktoken."""
+
+    def __init__(self):
+        self.encode_calls = 0
+
+    def encode(self, text, disallowed_special=()):
+        self.encode_calls += 1
+        return text.split()
+
+    def encode_batch(self, texts, num_threads=8, disallowed_special=()):
+        return [t.split() for t in texts]
+
+
+def use_fake_encoder(monkeypatch):
+    fake = FakeEncoder()
+    monkeypatch.setattr(token_counter, "get_encoder", lambda model_name=None: fake)
+    monkeypatch.setattr(token_counter, "_prefix_token_cache", {})
+    return fake
+
+
+def test_character_ratio_estimate():
+    assert estimate_tokens_fast("") == 0
+    assert estimate_tokens_fast("abcd" * 10) == 10
+    assert estimate_tokens_fast("abcde", chars_per_token=2) == 3
+
+
+def test_batch_matches_individual_counts(monkeypatch):
+    use_fake_encoder(monkeypatch)
+    texts = ["one", "two words", "three little words", ""]
+    assert count_tokens_batch(texts) == [count_tokens(t) for t in texts]
+
+
+def test_prompt_prefix_is_rendered_once_per_shape(monkeypatch):
+    fake = use_fake_encoder(monkeypatch)
+    template = get_code_analysis_prompt()
+    base = {"language": "Java", "chunk_num": 1, "total_chunks": 100, "code": "ignored code"}
+
+    first = count_prompt_prefix_tokens(template, {**base, "file_path": "a/B.java"})
+    calls_after_first = fake.encode_calls
+    second = count_prompt_prefix_tokens(template, {**base, "file_path": "a/b/c/Deeper.java"})
+
+    # Only the file path is encoded for the second file of the same shape
+    assert fake.encode_calls == calls_after_first + 1
+    assert second == first
+    rendered = template.format_prompt(**{**base, "file_path": "a/B.java", "code": ""}).to_string()
+    assert first == len(rendered.split())
@@ -0,0 +1,60 @@
+import json
+
+import runners.summarize_code as summarize_code
+from prompts.schemas import CODE_ANALYSIS_SCHEMA
+from utils.validation import validate, sanitize
+
+
+def test_schema_accepts_prompt_shaped_output():
+    obj = {
+        "file_summary": "Rental service",
+        "file_complexity_estimate": "3",
+        "methods": [{"method_name": "rent", "signature": "void rent()", "description": "Rents", "complexity": 2}],
+        "mocks": [], "assertions": [], "noteworthy": ["long method"],
+    }
+    assert validate(obj, CODE_ANALYSIS_SCHEMA) == []
+
+
+def test_schema_reports_missing_and_mistyped_fields():
+    errors = validate({"methods": "none", "mocks": [1]}, CODE_ANALYSIS_SCHEMA)
+    assert "$: missing required field 'file_summary'" in errors
+    assert "$.methods: expected array, got str" in errors
+    assert "$.mocks[0]: expected string, got int" in errors
+
+
+def test_sanitize_keeps_only_matching_parts():
+    obj = {"file_summary": "x", "methods": [{"method_name": "f"}, {"method_name": "g", "description": "d"}],
+           "mocks": "Mockito", "noteworthy": ["ok", 3]}
+    assert sanitize(obj, CODE_ANALYSIS_SCHEMA) == {
+        "file_summary": "x", "methods": [{"method_name": "g", "description": "d"}], "noteworthy": ["ok"]}
+
+
+class ScriptedChain:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def invoke(self, prompt_input):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+PROMPT_INPUT = {"language": "Python", "file_path": "a.py", "chunk_num": 1, "total_chunks": 1, "code": "x = 1"}
+
+
+def test_only_invalid_responses_are_retried(monkeypatch):
+    monkeypatch.setattr(summarize_code, "get_llm_cache", lambda: None)
+    good = json.dumps({"file_summary": "ok", "methods": []})
+    chain = ScriptedChain(["I cannot comply", '{"methods": "n/a"}', good])
+
+    assert summarize_code.summarize_chunk(chain, PROMPT_INPUT) == [{"file_summary": "ok", "methods": []}]
+    assert chain.calls == 3
+
+
+def test_retries_are_capped_and_valid_fields_salvaged(monkeypatch):
+    monkeypatch.setattr(summarize_code, "get_llm_cache", lambda: None)
+    monkeypatch.setattr(summarize_code, "STRUCTURED_MAX_RETRIES", 1)
+    chain = ScriptedChain(['{"file_summary": "partial", "methods": 5}'] * 5)
+
+    assert summarize_code.summarize_chunk(chain, PROMPT_INPUT) == [{"file_summary": "partial"}]
+    assert chain.calls == 2
@@ -0,0 +1,65 @@
+import multiprocessing
+import time
+
+from runners.distributed import run_coordinator, run_worker
+from utils.work_queue import WorkQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_expired_leases_are_requeued_and_stale_workers_cannot_complete(tmp_path):
+    clock = FakeClock()
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), lease_seconds=10, max_attempts=2, clock=clock)
+    queue.enqueue(["a.py", "b.py"])
+    assert queue.enqueue(["a.py"]) == 0
+
+    first = queue.lease("w1")
+    assert first.path == "a.py" and first.attempts == 1
+    clock.now += 11  # w1 stalls past its lease
+    second = queue.lease("w2")
+    assert (second.path, second.attempts) == ("a.py", 2)
+
+    assert not queue.complete(first, "w1", {"file": "a.py", "description": "stale"})
+    assert queue.complete(second, "w2", {"file": "a.py", "description": "fresh"})
+    assert [(path, result["description"]) for _, path, result in queue.iter_completed()] == [("a.py", "fresh")]
+
+    third = queue.lease("w2")
+    queue.fail(third, "w2", "boom")  # first failure: back to pending
+    assert queue.lease("w1").attempts == 2
+    clock.now += 11  # out of attempts once this lease expires
+    assert queue.lease("w1") is None
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 1, "failed": 1}
+    assert queue.failed_tasks() == [("b.py", "lease expired")]
+    assert queue.is_finished()
+
+
+def fake_summarize(path):
+    time.sleep(0.01)
+    return {"file": path, "description": {"file_summary": f"summary of {path}"}} if path != "skip.py" else None
+
+
+def test_coordinator_with_worker_processes(tmp_path):
+    queue_path = str(tmp_path / "queue.sqlite")
+    paths = [f"src/file{i}.py" for i in range(30)] + ["skip.py"]
+    queue = WorkQueue(queue_path, lease_seconds=30)
+    queue.enqueue(paths)
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=run_worker, args=(queue_path, fake_summarize, f"w{i}", 0.05))
+               for i in range(3)]
+    for worker in workers:
+        worker.start()
+
+    emitted = []
+    run_coordinator(queue, paths, emitted.append, poll_seconds=0.05)
+    for worker in workers:
+        worker.join(10)
+
+    assert sorted(entry["file"] for entry in emitted) == sorted(paths[:-1])
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 31, "failed": 0}
+    assert all(worker.exitcode == 0 for worker in workers)
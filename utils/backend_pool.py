@@ -0,0 +1,232 @@
+import asyncio
+import threading
+import time
+import urllib.request
+from collections import deque
+
+from langchain_core.runnables import Runnable
+
+from utils.logging_utils import setup_logger
+
+logger = setup_logger()
+
+LEAST_OUTSTANDING = "least_outstanding"
+WEIGHTED_ROUND_ROBIN = "weighted_round_robin"
+
+
+class NoHealthyEndpointError(RuntimeError):
+    pass
+
+
+class Endpoint:
+    """One backend server with its own concurrency and requests-per-minute limits."""
+
+    def __init__(self, url, weight=1, max_concurrency=2, rpm=None):
+        self.url = url.rstrip("/")
+        self.weight = max(1, weight)
+        self.max_concurrency = max(1, max_concurrency)
+        self.rpm = rpm
+        self.in_flight = 0
+        self.served = 0
+        self.consecutive_failures = 0
+        self.healthy = True
+        self.ejected_until = 0.0
+        self.current_weight = 0  # smooth weighted round robin state
+        self._recent = deque()  # start times of requests in the last minute
+
+    def is_live(self, now):
+        return self.healthy and self.ejected_until <= now
+
+    def has_capacity(self, now):
+        if self.in_flight >= self.max_concurrency:
+            return False
+        if self.rpm:
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.rpm:
+                return False
+        return True
+
+    def __repr__(self):
+        return f"Endpoint({self.url}, in_flight={self.in_flight}, healthy={self.healthy})"
+
+
+def parse_endpoint_spec(spec, default_concurrency=2, default_rpm=None):
+    """'http://host:11434' or 'http://host:11434|weight|max_concurrency'."""
+    parts = spec.strip().split("|")
+    weight = int(parts[1]) if len(parts) > 1 and parts[1] else 1
+    concurrency = int(parts[2]) if len(parts) > 2 and parts[2] else default_concurrency
+    return Endpoint(parts[0], weight=weight, max_concurrency=concurrency, rpm=default_rpm)
+
+
+class BackendPool:
+    """Distributes requests over several endpoints.
+
+    Selection is least-outstanding-requests (ties go to the endpoint that served fewest) or smooth weighted
+    round robin. An endpoint is ejected for `eject_seconds` after `eject_after` consecutive failures and
+    re-admitted when the cool-down passes or a health check succeeds.
+    """
+
+    def __init__(self, endpoints, strategy=LEAST_OUTSTANDING, eject_after=3, eject_seconds=30.0,
+                 health_path="/api/tags", acquire_timeout=600.0):
+        if not endpoints:
+            raise ValueError("BackendPool needs at least one endpoint")
+        self.endpoints = list(endpoints)
+        self.strategy = strategy
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.health_path = health_path
+        self.acquire_timeout = acquire_timeout
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._health_thread = None
+        self._stop = threading.Event()
+
+    @property
+    def capacity(self):
+        return sum(e.max_concurrency for e in self.endpoints)
+
+    def _select(self, exclude):
+        now = time.monotonic()
+        live = [e for e in self.endpoints if e.is_live(now)]
+        preferred = [e for e in live if e.url not in exclude] or live
+        candidates = [e for e in preferred if e.has_capacity(now)]
+        if not candidates:
+            return None
+        if self.strategy == WEIGHTED_ROUND_ROBIN:
+            total = sum(e.weight for e in candidates)
+            for e in candidates:
+                e.current_weight += e.weight
+            chosen = max(candidates, key=lambda e: e.current_weight)
+            chosen.current_weight -= total
+        else:
+            chosen = min(candidates, key=lambda e: (e.in_flight / e.weight, e.served / e.weight))
+        chosen.in_flight += 1
+        chosen.served += 1
+        if chosen.rpm:
+            chosen._recent.append(now)
+        return chosen
+
+    def try_acquire(self, exclude=()):
+        with self._lock:
+            return self._select(set(exclude))
+
+    def acquire_sync(self, exclude=()):
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._released:
+            while True:
+                endpoint = self._select(set(exclude))
+                if endpoint is not None:
+                    return endpoint
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise NoHealthyEndpointError(f"No backend endpoint available: {self.endpoints}")
+                # Wake on release, or periodically for rate-limit windows and ejection cool-downs
+                self._released.wait(min(remaining, 0.25))
+
+    async def acquire(self, exclude=()):
+        deadline = time.monotonic() + self.acquire_timeout
+        delay = 0.005
+        while True:
+            endpoint = self.try_acquire(exclude)
+            if endpoint is not None:
+                return endpoint
+            if time.monotonic() > deadline:
+                raise NoHealthyEndpointError(f"No backend endpoint available: {self.endpoints}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+    def release(self, endpoint, ok=True):
+        with self._released:
+            endpoint.in_flight -= 1
+            if ok:
+                endpoint.consecutive_failures = 0
+            else:
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.eject_after:
+                    self._eject(endpoint)
+            self._released.notify_all()
+
+    def _eject(self, endpoint):
+        endpoint.ejected_until = time.monotonic() + self.eject_seconds
+        endpoint.consecutive_failures = 0
+        logger.warning(f"Ejecting backend {endpoint.url} for {self.eject_seconds:.0f}s after repeated failures")
+
+    def check_health(self, timeout=2.0):
+        """Probes every endpoint once; unhealthy endpoints get no traffic, recovered ones rejoin."""
+        for endpoint in self.endpoints:
+            try:
+                with urllib.request.urlopen(endpoint.url + self.health_path, timeout=timeout) as response:
+                    ok = 200 <= response.status < 300
+            except Exception:
+                ok = False
+            with self._released:
+                if ok and (not endpoint.healthy or endpoint.ejected_until > time.monotonic()):
+                    logger.info(f"Backend {endpoint.url} is healthy again")
+                    endpoint.ejected_until = 0.0
+                elif not ok and endpoint.healthy:
+                    logger.warning(f"Backend {endpoint.url} failed its health check")
+                endpoint.healthy = ok
+                self._released.notify_all()
+
+    def start_health_checks(self, interval):
+        if self._health_thread is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.check_health()
+
+        self._health_thread = threading.Thread(target=loop, name="backend-health", daemon=True)
+        self._health_thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+class PooledChain(Runnable):
+    """`prompt | model` where the model half runs on the endpoint leased from the pool for each call.
+
+    The prompt is rendered before leasing, so bad input never counts against an endpoint. A failed call is
+    released as a failure and retried once on a different endpoint if the pool has one.
+    """
+
+    def __init__(self, pool, prompt, chain_for_endpoint, max_attempts=2):
+        self.pool = pool
+        self.prompt = prompt
+        self.chain_for_endpoint = chain_for_endpoint
+        self.max_attempts = max(1, min(max_attempts, len(pool.endpoints)))
+
+    def invoke(self, input, config=None, **kwargs):
+        prompt_value = self.prompt.invoke(input, config)
+        tried, last_error = set(), None
+        for _ in range(self.max_attempts):
+            endpoint = self.pool.acquire_sync(exclude=tried)
+            tried.add(endpoint.url)
+            try:
+                result = self.chain_for_endpoint(endpoint.url).invoke(prompt_value, config, **kwargs)
+            except Exception as e:
+                self.pool.release(endpoint, ok=False)
+                logger.warning(f"Request to {endpoint.url} failed: {e}")
+                last_error = e
+                continue
+            self.pool.release(endpoint, ok=True)
+            return result
+        raise last_error
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        prompt_value = await self.prompt.ainvoke(input, config)
+        tried, last_error = set(), None
+        for _ in range(self.max_attempts):
+            endpoint = await self.pool.acquire(exclude=tried)
+            tried.add(endpoint.url)
+            try:
+                result = await self.chain_for_endpoint(endpoint.url).ainvoke(prompt_value, config, **kwargs)
+            except Exception as e:
+                self.pool.release(endpoint, ok=False)
+                logger.warning(f"Request to {endpoint.url} failed: {e}")
+                last_error = e
+                continue
+            self.pool.release(endpoint, ok=True)
+            return result
+        raise last_error
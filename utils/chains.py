@@ -1,32 +1,183 @@
 import json
+import threading
 
-from config import MODEL_NAME, MAX_TOKENS, USE_OPENAI
+import httpx
+
+from config import MODEL_NAME, MAX_TOKENS, USE_OPENAI, TEMPERATURE, PACK_OUTPUT_TOKENS, STRUCTURED_OUTPUT, \
+    HTTP_POOL_SIZE, HTTP_TIMEOUT, OLLAMA_KEEP_ALIVE, OLLAMA_BASE_URL, BACKEND_CONCURRENCY, OLLAMA_HOSTS, \
+    OLLAMA_HOST_CONCURRENCY, OLLAMA_HOST_RPM, BACKEND_POOL_STRATEGY, BACKEND_EJECT_AFTER, BACKEND_EJECT_SECONDS, BACKEND_HEALTH_INTERVAL
 from langchain_ollama import ChatOllama
 from langchain_openai import ChatOpenAI
 from langchain_core.runnables import RunnableSequence
 from langchain.schema.output_parser import StrOutputParser
-from prompts.language_prompts import get_code_analysis_prompt
-from prompts.project_summary_prompt import get_project_summary_prompt
+from prompts.language_prompts import get_code_analysis_prompt, get_multi_file_analysis_prompt, \
+    get_code_description_prompt
+from prompts.schemas import CODE_ANALYSIS_SCHEMA, CODE_DESCRIPTION_SCHEMA, get_multi_file_analysis_schema
+from prompts.project_summary_prompt import get_project_summary_prompt, get_partial_summary_prompt, \
+    get_summary_merge_prompt
+from utils.backend_pool import BackendPool, PooledChain, parse_endpoint_spec
 from utils.logging_utils import setup_logger
+from utils.metrics import usage_callback
+from utils.ollama_util import num_ctx_for
 
 logger = setup_logger()
 
+# Process-wide registries: one chat model (and HTTP connection pool) per (backend, model, endpoint),
+# one chain per (backend, model, endpoint, prompt, call options)
+_registry_lock = threading.Lock()
+_llm_registry = {}
+_chain_registry = {}
+_backend_pool = None
+_llm_factory = None  # (backend name, factory) replacing the configured backend, e.g. a fake model in benchmarks
+
+
+def build_chain(prompt, max_tokens=MAX_TOKENS, output_schema=None, model=None):
+    """Chain for `prompt` on `model` (default MODEL_NAME). With OLLAMA_HOSTS configured this is a PooledChain that
+    renders the prompt and runs the model on whichever endpoint the backend pool picks."""
+    pool = get_backend_pool()
+    if pool is None:
+        return build_endpoint_chain(prompt, max_tokens, output_schema, model=model)
+    return PooledChain(pool, prompt,
+                       lambda base_url: build_endpoint_chain(None, max_tokens, output_schema, base_url, model))
+
+
+def build_endpoint_chain(prompt, max_tokens=MAX_TOKENS, output_schema=None, base_url=None, model=None):
+    """`prompt | model | parser` on one endpoint; without a prompt the chain takes an already rendered prompt."""
+    key = (get_backend_name(), model or MODEL_NAME, base_url, prompt.template if prompt else None, max_tokens,
+           json.dumps(output_schema, sort_keys=True) if output_schema else None)
+    with _registry_lock:
+        chain = _chain_registry.get(key)
+    if chain is None:
+        llm = get_llm(max_tokens, output_schema, base_url, model)
+        chain = RunnableSequence(prompt | llm | StrOutputParser()) if prompt else llm | StrOutputParser()
+        with _registry_lock:
+            chain = _chain_registry.setdefault(key, chain)
+    return chain
+
+
+def create_llm(base_url=None, pool_size=HTTP_POOL_SIZE, model=None):
+    """Chat model for the configured backend. Its HTTP clients keep up to `pool_size` keep-alive connections,
+    so reusing the model reuses TCP/TLS connections."""
+    if _llm_factory is not None:
+        return _llm_factory[1]()
+    model = model or MODEL_NAME
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    logger.info(f"Using model: {model} (OpenAI: {USE_OPENAI}) at {base_url or 'default host'}, "
+                f"connection pool size {pool_size}")
+    if USE_OPENAI:
+        # max_retries=0: retries and backoff are done by the request scheduler, which also sees the rate limits
+        return ChatOpenAI(model=model, temperature=TEMPERATURE, max_tokens=MAX_TOKENS, max_retries=0,
+                          http_client=httpx.Client(limits=limits, timeout=HTTP_TIMEOUT),
+                          http_async_client=httpx.AsyncClient(limits=limits, timeout=HTTP_TIMEOUT))
+    # num_ctx matches the preload (utils.ollama_util), so the first request does not reload the model
+    return ChatOllama(model=model, temperature=TEMPERATURE, keep_alive=OLLAMA_KEEP_ALIVE, num_ctx=num_ctx_for(model),
+                      base_url=base_url or OLLAMA_BASE_URL, client_kwargs={"limits": limits, "timeout": HTTP_TIMEOUT})
+
+
+def get_shared_llm(base_url=None, model=None):
+    key = (get_backend_name(), model or MODEL_NAME, base_url)
+    with _registry_lock:
+        if key not in _llm_registry:
+            pool_size = HTTP_POOL_SIZE
+            if base_url is not None and _backend_pool is not None:
+                pool_size = next((e.max_concurrency for e in _backend_pool.endpoints if e.url == base_url),
+                                 HTTP_POOL_SIZE)
+            llm = create_llm(base_url, pool_size, model)
+            llm.callbacks = [*(llm.callbacks or []), usage_callback]  # latency and token usage per call
+            _llm_registry[key] = llm
+        return _llm_registry[key]
+
+
+def get_llm(max_tokens=MAX_TOKENS, output_schema=None, base_url=None, model=None):
+    """The shared chat model (`model`, default MODEL_NAME) with per-call options bound: the completion budget
+    `max_tokens` (num_predict on Ollama) and, with `output_schema`, the backend's structured output: Ollama
+    constrains decoding to the schema, OpenAI's JSON mode guarantees a JSON object (the prompt carries the field
+    list)."""
+    llm = get_shared_llm(base_url, model)
+    if USE_OPENAI:
+        options = {"max_tokens": max_tokens}
+        if output_schema:
+            options["response_format"] = {"type": "json_object"}
+        return llm.bind(**options)
+    options = {"format": output_schema} if output_schema else {}
+    if isinstance(llm, ChatOllama):
+        # Per-call options replace the model's own, so num_ctx and temperature are carried over
+        options["options"] = {"num_ctx": llm.num_ctx, "temperature": llm.temperature, "num_predict": max_tokens}
+    return llm.bind(**options) if options else llm
+
+
+def get_backend_pool():
+    """The Ollama endpoint pool built from OLLAMA_HOSTS, or None when a single default server is used."""
+    global _backend_pool
+    if USE_OPENAI or not OLLAMA_HOSTS or _llm_factory is not None:
+        return None
+    with _registry_lock:
+        if _backend_pool is None:
+            endpoints = [parse_endpoint_spec(spec, OLLAMA_HOST_CONCURRENCY, OLLAMA_HOST_RPM or None)
+                         for spec in OLLAMA_HOSTS]
+            _backend_pool = BackendPool(endpoints, BACKEND_POOL_STRATEGY, BACKEND_EJECT_AFTER, BACKEND_EJECT_SECONDS)
+            _backend_pool.check_health()
+            _backend_pool.start_health_checks(BACKEND_HEALTH_INTERVAL)
+            logger.info(f"Backend pool: {len(endpoints)} Ollama endpoints, capacity {_backend_pool.capacity}")
+        return _backend_pool
 
-def build_chain(prompt):
-    llm = get_llm()
-    logger.info(f"Using model: {MODEL_NAME} (OpenAI: {USE_OPENAI})")
-    return RunnableSequence(prompt | llm | StrOutputParser())
 
+def get_backend_limits():
+    """Per-backend concurrency limits; with a backend pool the Ollama limit is the pool's total capacity."""
+    limits = dict(BACKEND_CONCURRENCY)
+    pool = get_backend_pool()
+    if pool is not None:
+        limits[get_backend_name()] = pool.capacity
+    return limits
 
-def get_llm():
-    llm = ChatOpenAI(model=MODEL_NAME, temperature=0.2, max_tokens=MAX_TOKENS) if USE_OPENAI else ChatOllama(
-        model=MODEL_NAME, temperature=0.2)
-    return llm
 
+def reset_clients():
+    """Drops all cached models, chains and the backend pool, e.g. after changing the backend configuration."""
+    global _backend_pool
+    with _registry_lock:
+        _llm_registry.clear()
+        _chain_registry.clear()
+        if _backend_pool is not None:
+            _backend_pool.stop()
+        _backend_pool = None
 
-def build_chain_for_language():
-    return build_chain(get_code_analysis_prompt())
+
+def set_llm_factory(factory, backend="fake"):
+    """Builds every chat model with `factory()` instead of the configured backend, reported as `backend` (so it
+    gets that backend's limits); None restores the configured backend."""
+    global _llm_factory
+    _llm_factory = (backend, factory) if factory is not None else None
+    reset_clients()
+
+
+def get_backend_name():
+    if _llm_factory is not None:
+        return _llm_factory[0]
+    return "openai" if USE_OPENAI else "ollama"
+
+
+def build_chain_for_language(rolling=False, model=None, max_tokens=MAX_TOKENS):
+    return build_chain(get_code_analysis_prompt(rolling), max_tokens,
+                       output_schema=CODE_ANALYSIS_SCHEMA if STRUCTURED_OUTPUT else None, model=model)
+
+
+def build_chain_for_description(rolling=False, model=None, max_tokens=MAX_TOKENS):
+    return build_chain(get_code_description_prompt(rolling), max_tokens,
+                       output_schema=CODE_DESCRIPTION_SCHEMA if STRUCTURED_OUTPUT else None, model=model)
+
+
+def build_chain_for_file_batch(model=None):
+    return build_chain(get_multi_file_analysis_prompt(), max_tokens=PACK_OUTPUT_TOKENS,
+                       output_schema=get_multi_file_analysis_schema() if STRUCTURED_OUTPUT else None, model=model)
 
 
 def build_chain_for_project():
     return build_chain(get_project_summary_prompt())
+
+
+def build_chain_for_partial_summary():
+    return build_chain(get_partial_summary_prompt())
+
+
+def build_chain_for_summary_merge():
+    return build_chain(get_summary_merge_prompt())
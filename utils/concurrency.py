@@ -0,0 +1,70 @@
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+
+from config import MAX_CONCURRENCY, BACKEND_CONCURRENCY
+
+
+class PrioritySemaphore:
+    """asyncio semaphore that wakes its waiters lowest priority first (in arrival order among equals)."""
+
+    def __init__(self, value):
+        self._value = value
+        self._waiters = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority=(0,)):
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # granted just before the cancellation: pass the slot on
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+
+class ConcurrencyLimiter:
+    """Bounds in-flight LLM calls globally and per backend. Waiting calls get a slot in priority order, so the
+    scheduler's (job, chunk) ranks already apply before a request holds a slot.
+
+    Create one per run: the semaphores bind to the event loop they are first used on.
+    """
+
+    def __init__(self, global_limit=MAX_CONCURRENCY, backend_limits=None):
+        self.global_limit = max(1, global_limit)
+        self.backend_limits = dict(BACKEND_CONCURRENCY if backend_limits is None else backend_limits)
+        self._global = PrioritySemaphore(self.global_limit)
+        self._backends = {}
+
+    def _backend_semaphore(self, backend):
+        if backend not in self._backends:
+            limit = self.backend_limits.get(backend, self.global_limit)
+            self._backends[backend] = PrioritySemaphore(max(1, limit))
+        return self._backends[backend]
+
+    @asynccontextmanager
+    async def slot(self, backend, priority=(0,)):
+        # Backend first so a saturated backend does not hold global slots while waiting
+        backend_semaphore = self._backend_semaphore(backend)
+        await backend_semaphore.acquire(priority)
+        try:
+            await self._global.acquire(priority)
+            try:
+                yield
+            finally:
+                self._global.release()
+        finally:
+            backend_semaphore.release()
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import DEDUP_THRESHOLD, MINHASH_PERMUTATIONS, LSH_BANDS, SHINGLE_SIZE, DEDUP_MIN_TOKENS, SCAN_WORKERS
+from utils.logging_utils import setup_logger
+
+logger = setup_logger()
+
+_TOKEN = re.compile(r"[A-Za-z_]\w*|\d+|\S")
+_rng = np.random.default_rng(20240611)  # fixed seed: signatures must be comparable across runs
+_PERM_A = _rng.integers(1, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_SHINGLE_BASE = np.uint64(1099511628211)
+_BLOCK = 4096
+
+
+def normalize_tokens(code):
+    """Identifiers, numbers and punctuation; whitespace and layout differences disappear."""
+    return _TOKEN.findall(code)
+
+
+def shingle_hashes(tokens, size=SHINGLE_SIZE):
+    """64-bit hashes of every run of `size` consecutive tokens."""
+    token_hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "little") for t in tokens),
+        dtype=np.uint64, count=len(tokens))
+    if len(token_hashes) < size:
+        return np.unique(token_hashes)
+    shingles = np.zeros(len(token_hashes) - size + 1, dtype=np.uint64)
+    with np.errstate(over="ignore"):  # arithmetic is mod 2**64 on purpose
+        for offset in range(size):
+            shingles = shingles * _SHINGLE_BASE + token_hashes[offset:len(shingles) + offset]
+    return np.unique(shingles)
+
+
+def minhash_signature(shingles):
+    """MinHash over multiply-shift hash permutations: one minimum per permutation."""
+    signature = np.full(MINHASH_PERMUTATIONS, np.iinfo(np.uint64).max, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for start in range(0, len(shingles), _BLOCK):
+            block = shingles[start:start + _BLOCK]
+            hashed = (_PERM_A[:, None] * block[None, :] + _PERM_B[:, None]) >> np.uint64(32)
+            signature = np.minimum(signature, hashed.min(axis=1))
+    return signature
+
+
+def estimate_similarity(a, b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float(np.mean(a == b))
+
+
+def file_fingerprint(path):
+    """(sha256 of the content, MinHash signature or None when the file is too short to compare reliably)."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        logger.warning(f"Dedup cannot read {path}: {e}")
+        return None, None
+    digest = hashlib.sha256(data).hexdigest()
+    tokens = normalize_tokens(data.decode("utf-8", errors="replace"))
+    if len(tokens) < DEDUP_MIN_TOKENS:
+        return digest, None
+    return digest, minhash_signature(shingle_hashes(tokens))
+
+
+def find_duplicates(paths, threshold=DEDUP_THRESHOLD, bands=LSH_BANDS, workers=SCAN_WORKERS):
+    """Maps each duplicate path to the representative it duplicates; representatives are not in the map.
+
+    Files are compared only with files of the same extension. Identical content is matched by hash. Near
+    duplicates are found with MinHash/LSH: signatures are split into `bands`, files sharing any band become
+    candidates, and a candidate counts only if its estimated similarity to the representative (not to another
+    duplicate) reaches `threshold`. The first file of a group in `paths` order is its representative.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        fingerprints = list(pool.map(file_fingerprint, paths))
+
+    rows = MINHASH_PERMUTATIONS // bands
+    by_digest = {}
+    buckets = {}
+    signatures = {}
+    duplicates = {}
+    exact = 0
+    for path, (digest, signature) in zip(paths, fingerprints):
+        if digest is None:
+            continue
+        ext = os.path.splitext(path)[1].lower()
+        representative = by_digest.get((ext, digest))
+        if representative is not None:
+            duplicates[path] = representative
+            exact += 1
+            continue
+        by_digest[(ext, digest)] = path
+        if signature is None:
+            continue
+
+        band_keys = [(ext, i, signature[i * rows:(i + 1) * rows].tobytes()) for i in range(bands)]
+        candidates = dict.fromkeys(rep for key in band_keys for rep in buckets.get(key, ()))
+        best = max(candidates, key=lambda rep: estimate_similarity(signature, signatures[rep]), default=None)
+        if best is not None and estimate_similarity(signature, signatures[best]) >= threshold:
+            duplicates[path] = best
+            continue
+        signatures[path] = signature
+        for key in band_keys:
+            buckets.setdefault(key, []).append(path)
+
+    if duplicates:
+        logger.info(f"Dedup: {len(duplicates)} of {len(paths)} files duplicate another file "
+                    f"({exact} identical, {len(duplicates) - exact} near-identical) and reuse its summary")
+    return duplicates
+
+
+def group_duplicates(duplicates):
+    """Representative -> list of its duplicates, in input order."""
+    members = {}
+    for path, representative in duplicates.items():
+        members.setdefault(representative, []).append(path)
+    return members
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE, EMBEDDING_DIM, SEARCH_TOP_K, \
+    OLLAMA_BASE_URL
+from utils.logging_utils import setup_logger
+
+logger = setup_logger()
+
+_WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+_BLOCK_ROWS = 65536  # rows of the memory-mapped matrix scored at a time
+
+
+class HashingEmbeddings(Embeddings):
+    """Offline bag-of-words embedding: lower-cased words and the parts of camelCase/snake_case identifiers are
+    hashed into `dim` signed buckets, weighted 1 + log(count). Good enough to find summaries sharing vocabulary
+    with the query when no embedding model is available."""
+
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.dim = dim
+
+    def _embed(self, text):
+        words = Counter(w.lower() for w in _WORD.findall(text))
+        words.update(w.lower() for w in re.findall(r"\w+", text) if len(_WORD.findall(w)) > 1)  # whole identifiers
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word, count in words.items():
+            digest = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+            vector[digest % self.dim] += (1 if digest >> 63 else -1) * (1 + math.log(count))
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def embedder_for(name):
+    """The embedding model recorded as `name` in an index ("ollama:<model>" or "hashing:<dim>")."""
+    backend, _, arg = name.partition(":")
+    if backend == "ollama":
+        from langchain_ollama import OllamaEmbeddings
+        return OllamaEmbeddings(model=arg, base_url=OLLAMA_BASE_URL)
+    return HashingEmbeddings(int(arg or EMBEDDING_DIM))
+
+
+def get_embedder(backend=EMBEDDING_BACKEND):
+    """(name, embeddings) for the configured backend; hashing embeddings when the Ollama model is not reachable."""
+    if backend == "ollama":
+        name = f"ollama:{EMBEDDING_MODEL}"
+        embedder = embedder_for(name)
+        try:
+            embedder.embed_query("ping")
+            return name, embedder
+        except Exception as e:
+            logger.warning(f"Ollama embedding model {EMBEDDING_MODEL} unavailable, using hashing embeddings: {e}")
+    return f"hashing:{EMBEDDING_DIM}", HashingEmbeddings(EMBEDDING_DIM)
+
+
+def collect_items(entries):
+    """One searchable item per file summary and per method description. Duplicates are skipped: their
+    representative has the same text."""
+    for entry in entries:
+        if entry.get("duplicate_of"):
+            continue
+        description = entry.get("description") or {}
+        summary = str(description.get("file_summary") or "").strip()
+        if summary:
+            yield {"file": entry["file"], "kind": "file", "name": "", "text": summary}
+        for method in description.get("methods") or []:
+            name = str(method.get("method_name") or "").strip()
+            text = str(method.get("description") or "").strip()
+            if name or text:
+                yield {"file": entry["file"], "kind": "method", "name": name, "text": f"{name}: {text}"}
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def build_embedding_index(entries, base_path, embedder=None, batch_size=EMBEDDING_BATCH_SIZE):
+    """Embeds the file summaries and method descriptions of `entries` in batches into a unit-length float32 matrix
+    at `<base_path>.npy`, written through a memory map, with the items' metadata in `<base_path>.json`.
+    `embedder` is a (name, embeddings) pair, by default get_embedder(). Returns the number of items."""
+    items = list(collect_items(entries))
+    name, model = embedder or get_embedder()
+    matrix_path = base_path + ".npy"
+    if os.path.dirname(base_path):
+        os.makedirs(os.path.dirname(base_path), exist_ok=True)
+    matrix = None
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        vectors = np.asarray(model.embed_documents([item["text"] for item in batch]), dtype=np.float32)
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(matrix_path, mode="w+", dtype=np.float32,
+                                               shape=(len(items), vectors.shape[1]))
+        matrix[start:start + len(batch)] = _normalize(vectors)
+    if matrix is None:
+        np.save(matrix_path, np.zeros((0, 0), dtype=np.float32))
+    else:
+        matrix.flush()
+        del matrix
+    with open(base_path + ".json", "w", encoding="utf-8") as f:
+        json.dump({"embedder": name, "items": items}, f)
+    logger.info(f"Embedded {len(items)} summaries with {name} into {matrix_path}")
+    return len(items)
+
+
+def top_k(matrix, query, k):
+    """Row indices and cosine scores of the `k` rows most similar to the unit-length `query`, best first. The
+    matrix is scored block by block, so a memory-mapped matrix is never loaded whole."""
+    best_rows, best_scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    for start in range(0, len(matrix), _BLOCK_ROWS):
+        scores = np.asarray(matrix[start:start + _BLOCK_ROWS] @ query, dtype=np.float32)
+        rows = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        best_rows = np.concatenate([best_rows, rows + start])
+        best_scores = np.concatenate([best_scores, scores[rows]])
+        if len(best_rows) > k:
+            keep = np.argpartition(-best_scores, k - 1)[:k]
+            best_rows, best_scores = best_rows[keep], best_scores[keep]
+    order = np.lexsort((best_rows, -best_scores))
+    return best_rows[order], best_scores[order]
+
+
+class EmbeddingIndex:
+    """Read side of build_embedding_index: the matrix stays memory-mapped and queries are embedded with the model
+    the index was built with."""
+
+    def __init__(self, base_path, embedder=None):
+        with open(base_path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.items = meta["items"]
+        self.embedder_name = meta["embedder"]
+        self.matrix = np.load(base_path + ".npy", mmap_mode="r")
+        self._model = embedder or embedder_for(self.embedder_name)
+
+    def search(self, query, k=SEARCH_TOP_K):
+        """The `k` items whose summaries are closest to `query` by cosine similarity, with their `score`."""
+        if not self.items or k <= 0:
+            return []
+        vector = _normalize(np.asarray([self._model.embed_query(query)], dtype=np.float32))[0]
+        rows, scores = top_k(self.matrix, vector, k)
+        return [{**self.items[row], "score": round(float(score), 4)} for row, score in zip(rows, scores)]
@@ -1,7 +1,127 @@
 import json
+import re
+from collections import deque
 
+# Characters the scanner has to look at; everything else is skipped by the regex engine
+_SIGNIFICANT = re.compile(r'[{}\[\]",\\]')
+# A JSON string, or a comma followed only by whitespace and a closing bracket
+_TRAILING_COMMA = re.compile(r'"(?:\\.|[^"\\])*"|,(\s*[}\]])')
+_CLOSERS = {"{": "}", "[": "]"}
 
-def extract_json_objects(raw_chunks):
+
+def _remove_trailing_commas(text):
+    return _TRAILING_COMMA.sub(lambda m: m.group(1) if m.group(1) is not None else m.group(0), text)
+
+
+def _closers(open_brackets):
+    return "".join(_CLOSERS[b] for b in reversed(open_brackets))
+
+
+def iter_json_spans(text, pos=0):
+    """Yields (start, candidates) for each top-level {...} in `text[pos:]` in one linear pass.
+
+    Quotes and escapes are tracked so braces inside strings are ignored, and text outside objects (prose,
+    markdown fences) is skipped. `candidates` are (end, suffix) pairs to try in order: a complete object has the
+    single candidate (end, ""); an object cut off by the end of the text is first closed where it stops, then
+    after its last complete element.
+    """
+    stack = []
+    start = None
+    in_string = False
+    escaped_at = -1
+    # Last point where the open object could be cut and closed: (end index, open brackets at that point)
+    checkpoint = None
+
+    for m in _SIGNIFICANT.finditer(text, pos):
+        ch, i = m.group(), m.start()
+        if in_string:
+            if ch == "\\" and escaped_at != i:
+                escaped_at = i + 1
+            elif ch == '"' and escaped_at != i:
+                in_string = False
+            continue
+        if not stack:
+            if ch == "{":
+                start = i
+                stack.append(ch)
+                checkpoint = (i + 1, "{")
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+            checkpoint = (i + 1, "".join(stack))
+        elif ch in "}]":
+            stack.pop()
+            if not stack:
+                yield start, [(i + 1, "")]
+                checkpoint = None
+            else:
+                checkpoint = (i + 1, "".join(stack))
+        elif ch == ",":
+            checkpoint = (i, "".join(stack))
+
+    if stack:
+        candidates = [(len(text), ('"' if in_string else "") + _closers(stack))]
+        if checkpoint is not None:
+            candidates.append((checkpoint[0], _closers(checkpoint[1])))
+        yield start, candidates
+
+
+def _parse_span(text, start, candidates):
+    for end, suffix in candidates:
+        candidate = text[start:end] + suffix
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            pass
+        try:
+            return json.loads(_remove_trailing_commas(candidate))
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def iter_json_values(text):
+    """Parsed top-level objects of `text`. An object left open at the end of the text that does not parse is
+    usually a stray `{` in prose before the real JSON, so scanning resumes at the next `{` after it."""
+    pos = 0
+    while pos != -1:
+        resume = -1
+        for start, candidates in iter_json_spans(text, pos):
+            obj = _parse_span(text, start, candidates)
+            if obj is not None:
+                yield obj
+            elif candidates[0][1]:  # the unclosed tail
+                resume = text.find("{", start + 1)
+        pos = resume
+
+
+def _qualifying_dicts(obj, required_key):
+    """The object itself if it qualifies, otherwise the outermost nested dicts that do."""
+    if required_key is None or (isinstance(obj, dict) and required_key in obj):
+        return [obj] if isinstance(obj, dict) else []
+    found = []
+    pending = deque(obj.values() if isinstance(obj, dict) else obj if isinstance(obj, list) else [])
+    while pending:
+        item = pending.popleft()
+        if isinstance(item, dict):
+            if required_key in item:
+                found.append(item)
+            else:
+                pending.extend(item.values())
+        elif isinstance(item, list):
+            pending.extend(item)
+    return found
+
+
+def extract_json_objects(raw_chunks, required_key="file_summary"):
+    """Parses JSON objects out of raw LLM outputs in time linear in their length.
+
+    Handles prose or markdown fences around the JSON, several objects in one response, trailing commas and
+    responses truncated mid-object (the object is closed after its last complete element). When an object
+    lacks `required_key`, the outermost nested objects that have it are returned instead.
+    """
     json_objects = []
 
     for raw in raw_chunks:
@@ -9,6 +129,8 @@ def extract_json_objects(raw_chunks):
         if isinstance(raw, dict):
             json_objects.append(raw)
             continue
+        if not isinstance(raw, str):
+            continue
 
         # Try parsing entire string as JSON
         try:
@@ -17,28 +139,9 @@ def extract_json_objects(raw_chunks):
                 json_objects.append(json_obj)
                 continue
         except json.JSONDecodeError:
-            pass  # fallback to manual parsing below
+            pass  # fallback to scanning below
 
-        # If string contains multiple JSON blocks, try to extract each
-        try:
-            start = 0
-            while start < len(raw):
-                start = raw.find("{", start)
-                if start == -1:
-                    break
-                end = raw.find("}", start)
-                while end != -1:
-                    try:
-                        candidate = raw[start:end + 1]
-                        obj = json.loads(candidate)
-                        if isinstance(obj, dict) and "file_summary" in obj:
-                            json_objects.append(obj)
-                            break
-                    except json.JSONDecodeError:
-                        pass
-                    end = raw.find("}", end + 1)
-                start += 1
-        except Exception:
-            continue
+        for obj in iter_json_values(raw):
+            json_objects.extend(_qualifying_dicts(obj, required_key))
 
     return json_objects
@@ -0,0 +1,107 @@
+import os
+
+from config import PACK_MAX_FILE_TOKENS, PACK_MAX_FILES, PACK_OUTPUT_TOKENS, BUFFER_TOKENS, CHARS_PER_TOKEN
+from prompts.language_prompts import get_multi_file_analysis_prompt
+from utils.extract import extract_json_objects
+from utils.model_router import get_model_tiers
+from utils.token_counter import count_tokens_batch, count_static_tokens
+
+
+def estimate_file_tokens(path):
+    """Tokens of a file estimated from its size on disk, before it is read; None when it cannot be read."""
+    try:
+        return os.path.getsize(path) / CHARS_PER_TOKEN
+    except OSError:
+        return None
+
+
+def is_small_file(path, max_tokens=PACK_MAX_FILE_TOKENS):
+    """Pre-budgeting check from the size on disk, before the file is read."""
+    tokens = estimate_file_tokens(path)
+    return tokens is not None and tokens <= max_tokens
+
+
+def format_file_block(path, language, code):
+    return f"### File: {path} ({language})\n-------------------\n{code}\n-------------------\n"
+
+
+def get_pack_token_budget(context_limit=None):
+    """Tokens of file blocks per packed request. Packed batches go to the cheapest model tier first, so they are
+    sized for its context limit."""
+    template = get_multi_file_analysis_prompt()
+    prefix = template.format_prompt(file_count=PACK_MAX_FILES, files="").to_string()
+    context_limit = context_limit or get_model_tiers()[0].context_limit
+    return context_limit - BUFFER_TOKENS - PACK_OUTPUT_TOKENS - count_static_tokens(prefix)
+
+
+def pack_files(sources, token_budget=None, max_files=PACK_MAX_FILES, sizes=None):
+    """First-fit-decreasing bin packing of (path, language, code) sources into request batches. Only the path of
+    a source is used when its token `sizes` are given, e.g. estimates for files not read yet.
+
+    Returns (batches, leftovers): batches of two or more files, and sources that did not share a request
+    (oversize for the budget or alone in their bin) and should be summarized on their own.
+    Files keep their scan order within a batch, and batches are ordered by their first file.
+    """
+    token_budget = get_pack_token_budget() if token_budget is None else token_budget
+    order = {src[0]: i for i, src in enumerate(sources)}
+    sizes = count_tokens_batch([format_file_block(*src) for src in sources]) if sizes is None else sizes
+
+    bins = []  # [tokens used, [sources]]
+    leftovers = []
+    for src, size in sorted(zip(sources, sizes), key=lambda pair: (-pair[1], order[pair[0][0]])):
+        if size > token_budget:
+            leftovers.append(src)
+            continue
+        for b in bins:
+            if b[0] + size <= token_budget and len(b[1]) < max_files:
+                b[0] += size
+                b[1].append(src)
+                break
+        else:
+            bins.append([size, [src]])
+
+    batches = []
+    for _, members in bins:
+        if len(members) == 1:
+            leftovers.append(members[0])
+        else:
+            batches.append(sorted(members, key=lambda src: order[src[0]]))
+    batches.sort(key=lambda batch: order[batch[0][0]])
+    leftovers.sort(key=lambda src: order[src[0]])
+    return batches, leftovers
+
+
+def build_pack_prompt_input(batch):
+    return {
+        "file_count": len(batch),
+        "files": "\n".join(format_file_block(*src) for src in batch),
+    }
+
+
+def _match_path(reported, paths):
+    if reported in paths:
+        return reported
+    reported = os.path.normpath(reported.strip())
+    for path in paths:
+        normalized = os.path.normpath(path)
+        if normalized == reported or normalized.endswith(os.sep + reported.lstrip(os.sep)):
+            return path
+    return None
+
+
+def split_batch_response(raw, paths):
+    """Maps each requested path to its entry from a combined multi-file response.
+    Paths the model skipped or mangled beyond recognition are missing from the result."""
+    entries = []
+    for obj in extract_json_objects([raw], required_key=None):
+        if isinstance(obj.get("files"), list):
+            entries.extend(e for e in obj["files"] if isinstance(e, dict))
+        elif "file_path" in obj:
+            entries.append(obj)
+
+    by_path = {}
+    for entry in entries:
+        path = _match_path(str(entry.get("file_path", "")), paths)
+        if path is not None and path not in by_path:
+            by_path[path] = entry
+    return by_path
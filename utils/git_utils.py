@@ -26,3 +26,77 @@ def get_repo_name_from_url(git_url: str) -> str:
     # Extract last part of the path, remove .git if present
     repo_name = os.path.splitext(os.path.basename(urlparse(git_url).path))[0]
     return repo_name or "repo"
+
+
+def is_git_repo(path: str) -> bool:
+    return os.path.isdir(os.path.join(path, ".git"))
+
+
+def clone_or_fetch(git_url: str, base_path: str = "."):
+    """Updates an existing clone in place (fetch + hard reset to the remote default branch),
+    cloning only when there is no checkout yet."""
+    repo_name = get_repo_name_from_url(git_url)
+    clone_path = os.path.join(base_path, repo_name)
+
+    if not is_git_repo(clone_path):
+        return clone_repo(git_url, base_path)
+
+    logger.info(f"Fetching {git_url} into existing clone at {clone_path}")
+    subprocess.run(["git", "-C", clone_path, "fetch", "--prune", "origin"], check=True)
+    subprocess.run(["git", "-C", clone_path, "reset", "--hard", _remote_default_ref(clone_path)], check=True)
+    return repo_name, clone_path
+
+
+def _remote_default_ref(repo_path: str) -> str:
+    result = subprocess.run(["git", "-C", repo_path, "symbolic-ref", "--short", "refs/remotes/origin/HEAD"],
+                            capture_output=True, text=True)
+    if result.returncode == 0 and result.stdout.strip():
+        return result.stdout.strip()
+    return "@{upstream}"
+
+
+def get_head_commit(repo_path: str):
+    result = subprocess.run(["git", "-C", repo_path, "rev-parse", "HEAD"], capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def get_changed_files(repo_path: str, base_commit: str, head: str = "HEAD"):
+    """Files changed between two commits, as repo-relative paths grouped by change type.
+    Renames are reported as (old_path, new_path) pairs."""
+    result = subprocess.run(
+        ["git", "-C", repo_path, "diff", "--name-status", "-M", "-z", base_commit, head],
+        capture_output=True, text=True, check=True,
+    )
+    changes = {"added": [], "modified": [], "deleted": [], "renamed": []}
+    fields = result.stdout.split("\0")
+    i = 0
+    while i < len(fields) and fields[i]:
+        status = fields[i]
+        kind = status[0]
+        if kind in ("R", "C"):
+            old_path, new_path = fields[i + 1], fields[i + 2]
+            if kind == "R":
+                changes["renamed"].append((old_path, new_path))
+            else:
+                changes["added"].append(new_path)
+            i += 3
+            continue
+        path = fields[i + 1]
+        if kind == "A":
+            changes["added"].append(path)
+        elif kind == "D":
+            changes["deleted"].append(path)
+        else:  # M, T (type change), U (unmerged)
+            changes["modified"].append(path)
+        i += 2
+    return changes
+
+
+def list_git_files(repo_path: str):
+    """Tracked and untracked-but-not-ignored files relative to `repo_path`, or None if git cannot list them."""
+    result = subprocess.run(["git", "-C", repo_path, "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+                            capture_output=True)
+    if result.returncode != 0:
+        return None
+    paths = result.stdout.decode("utf-8", errors="surrogateescape").split("\0")
+    return sorted({p for p in paths if p})
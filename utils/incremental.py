@@ -0,0 +1,97 @@
+import json
+import os
+
+from utils.git_utils import get_changed_files, is_git_repo
+from utils.logging_utils import setup_logger
+
+logger = setup_logger()
+
+
+def _norm(path):
+    return os.path.normpath(path)
+
+
+def load_previous_results(output_path):
+    """Returns (commit, file entries) from a previous file-level summary, or (None, []) if there is none."""
+    if not os.path.exists(output_path):
+        return None, []
+    try:
+        with open(output_path) as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable previous results at {output_path}: {e}")
+        return None, []
+    return data.get("commit"), data.get("files", [])
+
+
+class IncrementalPlan:
+    """What to re-summarize since `base_commit`, and which previous entries to drop."""
+
+    def __init__(self, base_commit, previous_entries, to_summarize, removed):
+        self.base_commit = base_commit
+        self.previous_entries = previous_entries
+        self.to_summarize = to_summarize
+        self.removed = removed
+
+
+def plan_incremental(project_path, files, previous_output_path, base_commit=None):
+    """Builds an IncrementalPlan, or returns None when a full run is needed
+    (no git checkout, no base commit, or no previous results to merge into)."""
+    recorded_commit, previous_entries = load_previous_results(previous_output_path)
+    base_commit = base_commit or recorded_commit
+
+    if not is_git_repo(project_path):
+        logger.info(f"{project_path} is not a git checkout, running a full analysis")
+        return None
+    if not base_commit or not previous_entries:
+        logger.info("No previous analysis commit recorded, running a full analysis")
+        return None
+
+    try:
+        changes = get_changed_files(project_path, base_commit)
+    except Exception as e:
+        logger.warning(f"Could not diff against {base_commit}, running a full analysis: {e}")
+        return None
+
+    changed = {_norm(os.path.join(project_path, p)) for p in changes["added"] + changes["modified"]}
+    changed |= {_norm(os.path.join(project_path, new)) for _, new in changes["renamed"]}
+    removed = {_norm(os.path.join(project_path, p)) for p in changes["deleted"]}
+    removed |= {_norm(os.path.join(project_path, old)) for old, _ in changes["renamed"]}
+
+    current = {_norm(p) for p in files}
+    previous = {_norm(e["file"]) for e in previous_entries}
+    # Entries for files that are no longer scanned (deleted, or newly ignored) are dropped as well
+    removed |= previous - current
+
+    to_summarize = [p for p in files if _norm(p) in changed or _norm(p) not in previous]
+
+    logger.info(f"Incremental analysis since {base_commit[:12]}: {len(to_summarize)} to summarize, "
+                f"{len(removed & previous)} removed, {len(current) - len(to_summarize)} unchanged")
+    return IncrementalPlan(base_commit, previous_entries, to_summarize, removed)
+
+
+def merge_results(plan, updated_entries, files):
+    """Merges fresh summaries into the previous ones, ordered like `files`.
+    Returns (entries, changed) where `changed` says whether any file summary differs from before."""
+    previous = {_norm(e["file"]): e for e in plan.previous_entries}
+    updated = {_norm(e["file"]): e for e in updated_entries}
+
+    attempted = {_norm(p) for p in plan.to_summarize}
+
+    changed = any(key in previous for key in plan.removed)
+    merged = []
+    for path in files:
+        key = _norm(path)
+        if key in updated:
+            entry = updated[key]
+            old = previous.get(key)
+            if old is None or old.get("description") != entry.get("description"):
+                changed = True
+            merged.append(entry)
+        elif key in previous and key not in plan.removed:
+            if key in attempted:
+                # Changed but now skipped (e.g. emptied): its old summary is stale
+                changed = True
+                continue
+            merged.append(previous[key])
+    return merged, changed
@@ -0,0 +1,125 @@
+import json
+import os
+import textwrap
+
+from config import STREAM_FSYNC_EVERY
+from utils.logging_utils import setup_logger
+
+logger = setup_logger()
+
+
+def _truncate_torn_tail(path):
+    """Cuts a record torn by a crash off the end of `path`, so appended records start on a fresh line."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            step = min(65536, position)
+            f.seek(position - step)
+            block = f.read(step)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position < end:
+            logger.warning(f"Dropping incomplete last record of {path} ({end - position} bytes) before resuming")
+            f.truncate(position)
+
+
+class JsonlWriter:
+    """Appends one JSON record per line as results complete, fsyncing every `fsync_every` records
+    so a crash loses at most the last few files."""
+
+    def __init__(self, path, append=False, fsync_every=STREAM_FSYNC_EVERY):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self.count = 0
+        if append:
+            _truncate_torn_tail(path)
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        self.count += 1
+        if self.count % self.fsync_every == 0:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _iter_lines_with_offsets(path):
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        offset = 0
+        for line in f:
+            start, offset = offset, offset + len(line)
+            if not line.endswith(b"\n"):
+                logger.warning(f"Ignoring incomplete last record in {path}")
+                return
+            try:
+                yield start, json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Ignoring corrupt record at byte {start} of {path}")
+
+
+def iter_jsonl(path):
+    """Yields complete records; a torn last line from a crash is skipped."""
+    for _, record in _iter_lines_with_offsets(path):
+        yield record
+
+
+def load_completed_paths(path, key="file"):
+    return {os.path.normpath(record[key]) for record in iter_jsonl(path) if key in record}
+
+
+def iter_ordered(path, order, key="file"):
+    """Yields the latest record for each path in `order`, holding only a path -> byte offset index in memory.
+    Records for paths not in `order` are skipped."""
+    offsets = {}
+    for offset, record in _iter_lines_with_offsets(path):
+        if key in record:
+            offsets[os.path.normpath(record[key])] = offset
+    with open(path, "rb") as f:
+        for item in order:
+            offset = offsets.get(os.path.normpath(item))
+            if offset is None:
+                continue
+            f.seek(offset)
+            yield json.loads(f.readline())
+
+
+def jsonl_to_json(jsonl_path, json_path, header, order, list_key="files"):
+    """Streams the JSONL records into the aggregated JSON document, laid out like write_json's output."""
+    if os.path.dirname(json_path):
+        os.makedirs(os.path.dirname(json_path), exist_ok=True)
+    tmp_path = json_path + ".tmp"
+    written = 0
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        out.write("{\n")
+        for k, v in header.items():
+            out.write(f"  {json.dumps(k)}: {textwrap.indent(json.dumps(v, indent=2), '  ').lstrip()},\n")
+        out.write(f"  {json.dumps(list_key)}: [")
+        for record in iter_ordered(jsonl_path, order):
+            out.write(",\n" if written else "\n")
+            out.write(textwrap.indent(json.dumps(record, indent=2), "    "))
+            written += 1
+        out.write("\n  ]\n}" if written else "]\n}")
+    os.replace(tmp_path, json_path)
+    return written
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from config import LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES
+from utils.logging_utils import setup_logger
+
+logger = setup_logger()
+
+
+def make_cache_key(prompt_text, model_name, temperature):
+    """Content address of one LLM call: the fully rendered prompt (template + chunk text + metadata),
+    the model and the sampling temperature."""
+    h = hashlib.sha256()
+    for part in (prompt_text, model_name, repr(float(temperature))):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class LLMCache:
+    """SQLite-backed store of raw LLM output and its parsed JSON, with size-based LRU eviction."""
+
+    def __init__(self, path=LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_BYTES):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, raw TEXT NOT NULL, parsed TEXT, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT raw, parsed FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        raw, parsed = row
+        return {"raw": raw, "parsed": json.loads(parsed) if parsed is not None else None}
+
+    def put(self, key, raw, parsed=None):
+        parsed_text = json.dumps(parsed) if parsed is not None else None
+        size = len(raw.encode("utf-8")) + (len(parsed_text.encode("utf-8")) if parsed_text else 0)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, raw, parsed, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, raw, parsed_text, size, time.time()),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        # Trim to 90% so a full cache does not evict on every put
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        rows = self._conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._total_bytes -= size
+            evicted += 1
+        logger.debug(f"LLM cache evicted {evicted} entries, {self._total_bytes} bytes remain")
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bytes": self._total_bytes,
+        }
+
+    def log_stats(self):
+        s = self.stats()
+        logger.info(f"LLM cache: {s['hits']} hits, {s['misses']} misses (hit rate {s['hit_rate']:.1%}), "
+                    f"{s['bytes']} bytes on disk")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+
+
+def get_llm_cache():
+    """Process-wide cache, or None when caching is disabled."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = LLMCache()
+    return _cache
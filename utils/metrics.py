@@ -0,0 +1,228 @@
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import METRICS_HOST
+from utils.logging_utils import setup_logger
+
+logger = setup_logger()
+
+PROMETHEUS_PREFIX = "insightfoundry"
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of `values` (0 < q <= 1), None when there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def latency_summary(values):
+    summary = {f"p{round(q * 100)}": percentile(values, q) for q in QUANTILES}
+    summary["max"] = max(values) if values else None
+    return {k: round(v, 4) if v is not None else None for k, v in summary.items()}
+
+
+class RunMetrics:
+    """Timings and counters of one run. Thread-safe; stage times are summed over concurrent workers, so in async
+    mode they measure busy time rather than wall time. Stages nest: e.g. `chunk` includes its `token_count`."""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = clock()
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.file_seconds = {}
+        self.call_seconds = []
+        self.first_token_seconds = []
+        self.counters = {"llm_calls": 0, "llm_errors": 0, "input_tokens": 0, "output_tokens": 0}
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"count": 0, "seconds": 0.0, "max": 0.0})
+            stage["count"] += 1
+            stage["seconds"] += seconds
+            stage["max"] = max(stage["max"], seconds)
+
+    @contextmanager
+    def stage(self, name):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.add_stage(name, self.clock() - start)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_file(self, path, seconds):
+        with self._lock:
+            self.file_seconds[path] = seconds
+
+    def record_call(self, seconds, input_tokens=0, output_tokens=0, error=False):
+        with self._lock:
+            self.call_seconds.append(seconds)
+            self.counters["llm_errors" if error else "llm_calls"] += 1
+            self.counters["input_tokens"] += input_tokens
+            self.counters["output_tokens"] += output_tokens
+
+    def record_first_token(self, seconds):
+        with self._lock:
+            self.first_token_seconds.append(seconds)
+
+    def report(self, **extra):
+        """Everything as one JSON-serializable dict; `extra` is added at the top level."""
+        with self._lock:
+            counters = dict(self.counters)
+            hits, misses = counters.get("cache_hits", 0), counters.get("cache_misses", 0)
+            calls = counters["llm_calls"]
+            return {
+                **extra,
+                "wall_seconds": round(self.clock() - self.started, 3),
+                "stages": {name: {"count": s["count"], "seconds": round(s["seconds"], 4), "max": round(s["max"], 4)}
+                           for name, s in self.stages.items()},
+                "llm": {
+                    "calls": calls,
+                    "errors": counters["llm_errors"],
+                    "retries": counters.get("llm_retries", 0),
+                    "input_tokens": counters["input_tokens"],
+                    "output_tokens": counters["output_tokens"],
+                    "tokens_per_call": round((counters["input_tokens"] + counters["output_tokens"]) / calls, 1)
+                    if calls else None,
+                    "latency": latency_summary(self.call_seconds),
+                    "first_token_latency": latency_summary(self.first_token_seconds),
+                },
+                "cache": {"hits": hits, "misses": misses,
+                          "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None},
+                "files": {
+                    "count": len(self.file_seconds),
+                    "latency": latency_summary(list(self.file_seconds.values())),
+                    "seconds": {path: round(s, 4) for path, s in self.file_seconds.items()},
+                },
+                "counters": counters,
+            }
+
+    def prometheus_text(self):
+        """The metrics in the Prometheus text exposition format."""
+        with self._lock:
+            stages = {name: dict(s) for name, s in self.stages.items()}
+            counters = dict(self.counters)
+            summaries = {"llm_call_latency_seconds": list(self.call_seconds),
+                         "llm_first_token_latency_seconds": list(self.first_token_seconds),
+                         "file_latency_seconds": list(self.file_seconds.values())}
+        p = PROMETHEUS_PREFIX
+        lines = [f"# TYPE {p}_stage_seconds_total counter"]
+        lines += [f'{p}_stage_seconds_total{{stage="{name}"}} {s["seconds"]:.6f}' for name, s in stages.items()]
+        lines.append(f"# TYPE {p}_stage_runs_total counter")
+        lines += [f'{p}_stage_runs_total{{stage="{name}"}} {s["count"]}' for name, s in stages.items()]
+        for name, value in counters.items():
+            lines += [f"# TYPE {p}_{name}_total counter", f"{p}_{name}_total {value}"]
+        for name, values in summaries.items():
+            lines.append(f"# TYPE {p}_{name} summary")
+            for q in QUANTILES:
+                value = percentile(values, q)
+                lines.append(f'{p}_{name}{{quantile="{q}"}} {value if value is not None else "NaN"}')
+            lines += [f"{p}_{name}_sum {sum(values):.6f}", f"{p}_{name}_count {len(values)}"]
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path, **extra):
+        with open(path, "w") as f:
+            json.dump(self.report(**extra), f, indent=2)
+
+    def write_prometheus(self, path):
+        with open(path, "w") as f:
+            f.write(self.prometheus_text())
+
+
+_metrics = RunMetrics()
+
+
+def get_run_metrics():
+    return _metrics
+
+
+def reset_run_metrics():
+    """Starts a fresh set of metrics, e.g. at the beginning of a run."""
+    global _metrics
+    _metrics = RunMetrics()
+    return _metrics
+
+
+class UsageCallback(BaseCallbackHandler):
+    """Records the latency, time to the first streamed token and token usage (from the message's usage_metadata,
+    or the provider's token_usage) of every chat model call into the current run metrics."""
+
+    run_inline = True  # cheap bookkeeping; no need for an executor hop in async runs
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self._started = {}
+        self._first_token_seen = set()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = self.clock()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = self.clock()
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        # ChatOllama streams internally even for invoke, so this fires for every response
+        start = self._started.get(run_id)
+        if start is not None and run_id not in self._first_token_seen:
+            self._first_token_seen.add(run_id)
+            get_run_metrics().record_first_token(self.clock() - start)
+
+    def _elapsed(self, run_id):
+        self._first_token_seen.discard(run_id)
+        start = self._started.pop(run_id, None)
+        return self.clock() - start if start is not None else 0.0
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        if not input_tokens and not output_tokens:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            input_tokens, output_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        get_run_metrics().record_call(self._elapsed(run_id), input_tokens, output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        get_run_metrics().record_call(self._elapsed(run_id), error=True)
+
+
+usage_callback = UsageCallback()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = get_run_metrics().prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port, host=METRICS_HOST):
+    """Serves the current run metrics at http://host:port/metrics from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Serving Prometheus metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
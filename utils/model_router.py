@@ -0,0 +1,59 @@
+import re
+
+from config import MODEL_NAME, MAX_TOKENS, MODEL_ROUTING, MODEL_TIERS, ROUTING_SCORE_WEIGHTS, ROUTING_LANGUAGE_BIAS
+from utils.logging_utils import setup_logger
+from utils.metrics import get_run_metrics
+from utils.token_aware_chunking import get_model_context_limit
+from utils.token_counter import count_tokens
+
+logger = setup_logger()
+
+_BRANCH = re.compile(r"\b(?:if|elif|for|while|case|catch|except|when)\b|&&|\|\|")
+
+
+class ModelTier:
+    """One model of the routing table with its own context limit (sizes the chunks) and completion budget."""
+
+    def __init__(self, name, model, context_limit=None, max_tokens=MAX_TOKENS, max_score=None):
+        self.name = name
+        self.model = model
+        self.context_limit = context_limit or get_model_context_limit(model)
+        self.max_tokens = max_tokens
+        self.max_score = max_score  # None: takes every file that reaches it
+
+    def __repr__(self):
+        return f"ModelTier({self.name}: {self.model})"
+
+
+DEFAULT_TIER = ModelTier("default", MODEL_NAME)
+
+
+def get_model_tiers():
+    """Configured tiers, cheapest first; only the default model when routing is off."""
+    if not MODEL_ROUTING:
+        return [DEFAULT_TIER]
+    return [ModelTier(**spec) for spec in MODEL_TIERS]
+
+
+def route_score(code, language, facts=None):
+    """How demanding a file is, from its size, token count and complexity (exact with static facts, otherwise a
+    count of branching keywords) plus a per-language bias. About 1.0 is a mid-sized file of moderate logic."""
+    complexity = facts["file_complexity"] if facts else 1 + len(_BRANCH.findall(code))
+    return (len(code.encode("utf-8")) * ROUTING_SCORE_WEIGHTS["bytes"]
+            + count_tokens(code) * ROUTING_SCORE_WEIGHTS["tokens"]
+            + complexity * ROUTING_SCORE_WEIGHTS["complexity"]
+            + ROUTING_LANGUAGE_BIAS.get(language, 0.0))
+
+
+def route_file(code, language, path, facts=None, tiers=None):
+    """The tiers a file may use: the cheapest one whose max_score covers its score, followed by the stronger
+    tiers its chunks escalate to."""
+    tiers = tiers or get_model_tiers()
+    if len(tiers) == 1:
+        return tiers
+    score = route_score(code, language, facts)
+    start = next((i for i, tier in enumerate(tiers) if tier.max_score is None or score <= tier.max_score),
+                 len(tiers) - 1)
+    logger.info(f"Routing {path} (score {score:.2f}) to the {tiers[start].name} model {tiers[start].model}")
+    get_run_metrics().count(f"routed_{tiers[start].name}")
+    return tiers[start:]
@@ -1,12 +1,94 @@
-import subprocess
+import threading
+import time
+
+import httpx
+
+from config import OLLAMA_BASE_URL, OLLAMA_HOSTS, OLLAMA_KEEP_ALIVE, OLLAMA_NUM_CTX, HTTP_TIMEOUT, MAX_TOKENS
+from utils.backend_pool import parse_endpoint_spec
 from utils.logging_utils import setup_logger
+from utils.metrics import get_run_metrics
+from utils.model_router import get_model_tiers
+from utils.token_aware_chunking import get_model_context_limit
 
 logger = setup_logger()
 
 
-def stop_ollama_model(model):
-    try:
-        subprocess.run(["ollama", "stop", model], check=True)
-        logger.info(f"Stopped Ollama model: {model}")
-    except:
-        logger.error(f"Could not stop model: {model}")
+def num_ctx_for(model):
+    """Context window requested from Ollama for `model`: OLLAMA_NUM_CTX, or room for the largest chunk budget of
+    the tiers using the model plus their completion budget. Preloads and requests must agree on it, otherwise
+    Ollama reloads the model."""
+    if OLLAMA_NUM_CTX:
+        return OLLAMA_NUM_CTX
+    sizes = [tier.context_limit + tier.max_tokens for tier in get_model_tiers() if tier.model == model]
+    return max(sizes) if sizes else get_model_context_limit(model) + MAX_TOKENS
+
+
+def ollama_endpoints():
+    """Base URLs of the Ollama servers in use: OLLAMA_HOSTS, or the single default server."""
+    return [parse_endpoint_spec(spec).url for spec in OLLAMA_HOSTS] or [OLLAMA_BASE_URL]
+
+
+class OllamaLifecycle:
+    """Loads and unloads models on one Ollama server through its HTTP API: /api/generate without a prompt loads
+    a model (and sets how long it stays loaded), keep_alive=0 unloads it, /api/ps lists the loaded models."""
+
+    def __init__(self, base_url=OLLAMA_BASE_URL, timeout=HTTP_TIMEOUT, clock=time.perf_counter):
+        self.base_url = base_url.rstrip("/")
+        self.clock = clock
+        self._client = httpx.Client(base_url=self.base_url, timeout=timeout)
+
+    def _generate(self, payload):
+        response = self._client.post("/api/generate", json={**payload, "stream": False})
+        response.raise_for_status()
+        return response.json()
+
+    def load(self, model, keep_alive=OLLAMA_KEEP_ALIVE, num_ctx=None):
+        """Loads `model` with the run's keep_alive and num_ctx (a no-op for Ollama when it is already loaded that
+        way). Returns the seconds it took; recorded as the `model_load` stage."""
+        start = self.clock()
+        body = self._generate({"model": model, "keep_alive": keep_alive,
+                               "options": {"num_ctx": num_ctx or num_ctx_for(model)}})
+        seconds = self.clock() - start
+        get_run_metrics().add_stage("model_load", seconds)
+        logger.info(f"Loaded {model} on {self.base_url} in {seconds:.2f}s "
+                    f"(server load time {body.get('load_duration', 0) / 1e9:.2f}s)")
+        return seconds
+
+    def unload(self, model):
+        self._generate({"model": model, "keep_alive": 0})
+        logger.info(f"Unloaded Ollama model {model} on {self.base_url}")
+
+    def loaded_models(self):
+        response = self._client.get("/api/ps")
+        response.raise_for_status()
+        return [m.get("name") for m in response.json().get("models", [])]
+
+    def close(self):
+        self._client.close()
+
+
+def _each_endpoint(action, models, endpoints):
+    # `action` is an OllamaLifecycle method name; failures are logged, the requests themselves report errors later
+    for base_url in endpoints or ollama_endpoints():
+        lifecycle = OllamaLifecycle(base_url)
+        try:
+            for model in models:
+                try:
+                    getattr(lifecycle, action)(model)
+                except Exception as e:
+                    logger.warning(f"Ollama at {base_url}: could not {action} {model}: {e}")
+        finally:
+            lifecycle.close()
+
+
+def preload_models(models, endpoints=None):
+    """Starts loading `models` on every Ollama endpoint in a background thread, so the load overlaps with
+    scanning and the first chunk does not pay for it. Returns the thread."""
+    thread = threading.Thread(target=_each_endpoint, args=("load", list(models), endpoints), daemon=True,
+                              name="ollama-preload")
+    thread.start()
+    return thread
+
+
+def unload_models(models, endpoints=None):
+    _each_endpoint("unload", list(models), endpoints)
@@ -0,0 +1,62 @@
+from config import ROLLING_STATE_TOKENS
+from prompts.language_prompts import ROLLING_STATE_SECTION
+from utils.static_analysis import method_key
+from utils.token_counter import count_static_tokens, count_tokens
+
+LIST_FIELDS = ("mocks", "assertions", "noteworthy")
+
+
+def new_state():
+    """What the chunks sent so far found out about a file."""
+    return {"file_summary": "", "file_complexity_estimate": None, "methods": [], "mocks": [], "assertions": [],
+            "noteworthy": []}
+
+
+def update_state(state, objects):
+    """Folds one chunk's analysis objects into `state`: the latest summary and complexity estimate replace the
+    previous ones (they cover the file so far), methods and list entries are added unless already known."""
+    known = {method_key(m.get("method_name", "")) for m in state["methods"]}
+    for obj in objects:
+        if str(obj.get("file_summary") or "").strip():
+            state["file_summary"] = str(obj["file_summary"]).strip()
+        if obj.get("file_complexity_estimate") not in (None, ""):
+            state["file_complexity_estimate"] = obj["file_complexity_estimate"]
+        for method in obj.get("methods") or []:
+            key = method_key(method.get("method_name", ""))
+            if key and key not in known:
+                known.add(key)
+                state["methods"].append(method)
+        for field in LIST_FIELDS:
+            for item in obj.get(field) or []:
+                if isinstance(item, str) and item.strip() and item.strip() not in state[field]:
+                    state[field].append(item.strip())
+    return state
+
+
+def state_token_budget():
+    """Tokens left for the state itself once the rolling instructions are paid for."""
+    return max(50, ROLLING_STATE_TOKENS - count_static_tokens(ROLLING_STATE_SECTION))
+
+
+def format_state(state, token_budget):
+    """Compact text of the state for the next chunk's prompt: the summary so far and the names of the methods
+    already listed. Names are dropped from the front (the oldest) when the state exceeds `token_budget`."""
+    summary = f"Summary so far: {state['file_summary'] or '(none yet)'}"
+    names = [method_key(m.get("method_name", "")) for m in state["methods"]]
+    budget = token_budget - count_tokens(summary)
+    kept = []
+    for name in reversed(names):
+        budget -= count_tokens(name) + 1
+        if budget < 0:
+            break
+        kept.append(name)
+    kept.reverse()
+    listed = ", ".join(kept) if kept else "(none yet)"
+    if len(kept) < len(names):
+        listed = f"{len(names) - len(kept)} earlier methods, then {listed}"
+    return f"{summary}\nMethods already listed: {listed}"
+
+
+def final_record(state):
+    """The file record after the last chunk."""
+    return {key: (list(value) if isinstance(value, list) else value) for key, value in state.items()}
@@ -0,0 +1,211 @@
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from config import EXTENSION_LANGUAGE_MAP, VENDORED_DIRS, GENERATED_FILE_PATTERNS, MAX_FILE_BYTES, \
+    BINARY_SNIFF_BYTES, SCAN_USE_GIT, SCAN_WORKERS
+from utils.git_utils import is_git_repo, list_git_files
+from utils.logging_utils import setup_logger
+
+logger = setup_logger()
+
+
+def glob_to_regex(pattern):
+    """gitignore-style glob: `*` and `?` stop at `/`, `**` crosses directories."""
+    out, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            chars = pattern[i + 1:end]
+            out.append("[" + ("^" + chars[1:] if chars.startswith("!") else chars) + "]")
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+_GENERATED = [glob_to_regex(p) for p in GENERATED_FILE_PATTERNS]
+
+
+class GitIgnore:
+    """Rules of one .gitignore file. Paths are matched relative to the directory that holds it; later rules win."""
+
+    def __init__(self, lines):
+        self.rules = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            line = line[1:] if negate else line
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            # A slash anywhere but the end anchors the pattern to this directory; otherwise it matches any name
+            anchored = "/" in line
+            if line.startswith("**/") and "/" not in line[3:]:
+                line, anchored = line[3:], False
+            if line:
+                self.rules.append((glob_to_regex(line.lstrip("/")), negate, dir_only, anchored))
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                return cls(f.readlines())
+        except OSError:
+            return None
+
+    def match(self, rel_path, is_dir):
+        """True if ignored, False if re-included by a `!` rule, None if no rule applies."""
+        name = rel_path.rsplit("/", 1)[-1]
+        result = None
+        for regex, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path if anchored else name):
+                result = not negate
+        return result
+
+
+def language_for_path(path):
+    return EXTENSION_LANGUAGE_MAP.get(os.path.splitext(path)[1].lower())
+
+
+def _skip_reason(name, is_dir, ignore_set):
+    """Why a directory entry is dropped by name alone, before any I/O."""
+    if name.startswith("."):
+        return "hidden"
+    if name in ignore_set:
+        return "ignored"
+    if is_dir:
+        return "vendored" if name in VENDORED_DIRS else None
+    if language_for_path(name) is None:
+        return "unsupported"
+    if any(regex.match(name) for regex in _GENERATED):
+        return "generated"
+    return None
+
+
+def _is_gitignored(ignores, rel_path, is_dir):
+    ignored = None
+    for base, gitignore in ignores:
+        result = gitignore.match(rel_path[len(base) + 1:] if base else rel_path, is_dir)
+        if result is not None:
+            ignored = result
+    return bool(ignored)
+
+
+def _scan_dir(base_path, rel_dir, ignores, ignore_set):
+    """One directory level: candidate files, subdirectories with the .gitignore rules that apply in them, and
+    skip counts."""
+    full_dir = os.path.join(base_path, rel_dir) if rel_dir else base_path
+    gitignore = GitIgnore.load(os.path.join(full_dir, ".gitignore"))
+    if gitignore is not None:
+        ignores = ignores + [(rel_dir, gitignore)]
+    files, subdirs, skipped = [], [], Counter()
+    try:
+        with os.scandir(full_dir) as entries:
+            for entry in entries:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                reason = _skip_reason(entry.name, is_dir, ignore_set)
+                if reason is None and _is_gitignored(ignores, rel_path, is_dir):
+                    reason = "gitignored"
+                if reason is not None:
+                    skipped[reason] += 1
+                elif is_dir:
+                    subdirs.append((rel_path, ignores))
+                elif entry.is_file():
+                    files.append(rel_path)
+    except OSError as e:
+        logger.warning(f"Cannot list {full_dir}: {e}")
+    return files, subdirs, skipped
+
+
+def walk_candidates(base_path, ignore_set, skipped, workers=SCAN_WORKERS):
+    """Relative paths of candidate files, listing each directory level in parallel."""
+    candidates = []
+    frontier = [("", [])]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while frontier:
+            next_frontier = []
+            for files, subdirs, dir_skipped in pool.map(lambda d: _scan_dir(base_path, d[0], d[1], ignore_set),
+                                                        frontier):
+                candidates.extend(files)
+                next_frontier.extend(subdirs)
+                skipped.update(dir_skipped)
+            frontier = next_frontier
+    return candidates
+
+
+def git_candidates(base_path, ignore_set, skipped):
+    """Candidate files from `git ls-files` (git applies .gitignore), or None if git cannot list them."""
+    listed = list_git_files(base_path)
+    if listed is None:
+        return None
+    candidates = []
+    for rel_path in listed:
+        parts = rel_path.split("/")
+        reason = next((r for r in (_skip_reason(p, True, ignore_set) for p in parts[:-1]) if r), None)
+        reason = reason or _skip_reason(parts[-1], False, ignore_set)
+        if reason is not None:
+            skipped[reason] += 1
+        else:
+            candidates.append(rel_path)
+    return candidates
+
+
+def check_file(path, max_bytes=MAX_FILE_BYTES, sniff_bytes=BINARY_SNIFF_BYTES):
+    """None if the file should be summarized, otherwise why not: empty, too large, binary or unreadable.
+    Only the first `sniff_bytes` are read; a NUL byte marks binary content."""
+    try:
+        size = os.stat(path).st_size
+        if size == 0:
+            return "empty"
+        if size > max_bytes:
+            return "too_large"
+        with open(path, "rb") as f:
+            return "binary" if b"\0" in f.read(sniff_bytes) else None
+    except OSError:
+        return "unreadable"
+
+
+def scan_code_files(base_path, ignore_set, use_git=SCAN_USE_GIT, max_bytes=MAX_FILE_BYTES, workers=SCAN_WORKERS):
+    """Supported source files under `base_path`, sorted by path.
+
+    Names are filtered first (hidden, ignored, vendored, generated, unsupported extension) so the size check and
+    binary sniff only touch files that would be summarized; those checks run on a thread pool.
+    """
+    skipped = Counter()
+    candidates = git_candidates(base_path, ignore_set, skipped) if use_git and is_git_repo(base_path) else None
+    if candidates is None:
+        candidates = walk_candidates(base_path, ignore_set, skipped, workers)
+
+    paths = [os.path.join(base_path, *rel_path.split("/")) for rel_path in sorted(candidates)]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        reasons = list(pool.map(lambda p: check_file(p, max_bytes), paths))
+
+    files = []
+    for path, reason in zip(paths, reasons):
+        if reason is None:
+            files.append(path)
+        else:
+            skipped[reason] += 1
+            logger.debug(f"Skipping {reason} file: {path}")
+    summary = ", ".join(f"{count} {reason}" for reason, count in sorted(skipped.items()))
+    logger.info(f"Scan found {len(files)} source files" + (f" (skipped {summary})" if summary else ""))
+    return files
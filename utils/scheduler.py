@@ -0,0 +1,225 @@
+import asyncio
+import email.utils
+import heapq
+import itertools
+import random
+import threading
+import time
+
+import httpx
+import openai
+
+from config import RATE_LIMITS, LLM_MAX_RETRIES, BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS
+from utils.logging_utils import setup_logger
+from utils.metrics import get_run_metrics
+from utils.token_counter import count_tokens
+
+logger = setup_logger()
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Budget refilling continuously at `per_minute` units per minute, holding at most one minute's worth."""
+
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.clock = clock
+        self.level = float(per_minute)
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount):
+        """Seconds until `amount` units are available. A request larger than the bucket waits for a full bucket."""
+        self._refill()
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def drain(self):
+        self._refill()
+        self.level = min(self.level, 0.0)
+
+
+def get_status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable(error):
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError, TimeoutError, ConnectionError)):
+        return True
+    return get_status_code(error) in RETRYABLE_STATUS
+
+
+def get_retry_after(error):
+    """Seconds from the Retry-After (or retry-after-ms) header of the failed response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_request_tokens(prompt_text, output_tokens):
+    """Tokens a request counts against a tokens-per-minute limit: the prompt plus the reserved completion."""
+    return count_tokens(prompt_text) + output_tokens
+
+
+class RequestScheduler:
+    """Starts LLM requests only when the requests-per-minute and tokens-per-minute budgets allow, and retries
+    rate-limited, failed-over or timed-out requests with jittered exponential backoff.
+
+    Waiting async requests are released in priority order (lowest first); callers pass (job, chunk) so chunks
+    of files that are already in flight go before chunks of files started later. A 429 pauses every request
+    until its Retry-After has passed instead of letting the others trip the limit too.
+    """
+
+    def __init__(self, rpm=0, tpm=0, max_retries=LLM_MAX_RETRIES, backoff_base=BACKOFF_BASE_SECONDS,
+                 backoff_max=BACKOFF_MAX_SECONDS, clock=time.monotonic):
+        self.requests = TokenBucket(rpm, clock) if rpm else None
+        self.tokens = TokenBucket(tpm, clock) if tpm else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.clock = clock
+        self.paused_until = 0.0
+        self.retries = 0
+        self._lock = threading.Lock()
+        self._jobs = itertools.count()
+        self._seq = itertools.count()
+        self._waiters = []
+        self._loop = None
+        self._timer = None
+
+    def new_job(self):
+        """Priority rank for a new file; earlier files are served first."""
+        return next(self._jobs)
+
+    def _delay(self, cost):
+        delay = max(0.0, self.paused_until - self.clock())
+        if self.requests:
+            delay = max(delay, self.requests.delay(1))
+        if self.tokens:
+            delay = max(delay, self.tokens.delay(cost))
+        return delay
+
+    def _take(self, cost):
+        if self.requests:
+            self.requests.take(1)
+        if self.tokens:
+            self.tokens.take(cost)
+
+    def acquire_sync(self, cost):
+        while True:
+            with self._lock:
+                delay = self._delay(cost)
+                if delay <= 0:
+                    self._take(cost)
+                    return
+            time.sleep(delay)
+
+    async def acquire(self, cost, priority=(0,)):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._loop is not loop:
+                # Waiters and timers belong to the loop of a previous run
+                self._loop, self._waiters, self._timer = loop, [], None
+            heapq.heappush(self._waiters, (priority, next(self._seq), cost, future))
+        self._release_waiters()
+        await future
+
+    def _release_waiters(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            while self._waiters:
+                _, _, cost, future = self._waiters[0]
+                if future.done():
+                    heapq.heappop(self._waiters)
+                    continue
+                delay = self._delay(cost)
+                if delay > 0:
+                    # The head waits for budget and nothing overtakes it
+                    self._timer = self._loop.call_later(delay, self._release_waiters)
+                    return
+                heapq.heappop(self._waiters)
+                self._take(cost)
+                future.set_result(None)
+
+    def _retry_delay(self, error, attempt):
+        """Seconds to wait before retrying `error`, or None when it should be raised."""
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, self.backoff_base)
+        else:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))  # full jitter
+        if get_status_code(error) == 429:
+            with self._lock:
+                self.paused_until = max(self.paused_until, self.clock() + delay)
+                for bucket in (self.requests, self.tokens):
+                    if bucket:
+                        bucket.drain()
+        self.retries += 1
+        get_run_metrics().count("llm_retries")
+        logger.warning(f"LLM request failed ({type(error).__name__}: {error}), retry {attempt + 1}/"
+                       f"{self.max_retries} in {delay:.1f}s")
+        return delay
+
+    def run(self, call, cost):
+        """Calls `call()` once the budgets allow, retrying transient failures."""
+        for attempt in itertools.count():
+            self.acquire_sync(cost)
+            try:
+                return call()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def arun(self, call, cost, priority=(0,)):
+        """Async variant of run; `call` returns an awaitable."""
+        for attempt in itertools.count():
+            await self.acquire(cost, priority)
+            try:
+                return await call()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(backend):
+    """Process-wide scheduler for `backend`, so every chain on it shares one budget."""
+    with _schedulers_lock:
+        if backend not in _schedulers:
+            limits = RATE_LIMITS.get(backend, {})
+            _schedulers[backend] = RequestScheduler(limits.get("rpm", 0), limits.get("tpm", 0))
+        return _schedulers[backend]
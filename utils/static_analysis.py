@@ -0,0 +1,239 @@
+import ast
+import asyncio
+import multiprocessing
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from radon.complexity import cc_visit
+from radon.visitors import ComplexityVisitor, Function
+
+from config import STATIC_ANALYSIS_WORKERS
+from utils.logging_utils import setup_logger
+from utils.metrics import get_run_metrics
+from utils.syntax_chunking import get_parser
+from utils.token_counter import count_tokens
+
+logger = setup_logger()
+
+# tree-sitter node types of named functions/methods across the supported grammars
+FUNCTION_NODE_TYPES = {
+    "function_definition", "function_declaration", "method_declaration", "method_definition",
+    "constructor_declaration", "function_item", "method", "singleton_method", "local_function_statement",
+}
+# tree-sitter node types of classes and similar containers of methods
+CLASS_NODE_TYPES = {
+    "class_definition", "class_declaration", "interface_declaration", "enum_declaration", "struct_item",
+    "enum_item", "trait_item", "struct_specifier", "class_specifier", "type_spec", "class", "module",
+    "object_declaration", "record_declaration",
+}
+# Nodes that add a path through the code (one each to cyclomatic complexity)
+DECISION_NODE_TYPES = {
+    "if_statement", "elif_clause", "if_expression", "if", "elsif", "unless",
+    "for_statement", "for_in_statement", "enhanced_for_statement", "foreach_statement", "for_expression",
+    "for", "while_statement", "while_expression", "while", "do_statement", "loop_expression", "until",
+    "case_clause", "switch_case", "switch_section", "expression_case", "type_case", "when", "when_entry",
+    "match_arm", "catch_clause", "except_clause", "rescue", "conditional_expression", "ternary_expression",
+}
+# Short-circuit operators are anonymous nodes; keywords like the `if` inside an if_statement are too, and must not
+# count a second time, so the types above only count as named nodes
+DECISION_OPERATORS = {"&&", "||", "and", "or", "??"}
+
+
+def _python_signature(node):
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def python_facts(code):
+    """Functions and methods with radon's cyclomatic complexity; nested functions count toward their parent."""
+    signatures = {node.lineno: _python_signature(node) for node in ast.walk(ast.parse(code))
+                  if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+    methods = [{
+        "method_name": block.name,
+        "qualified_name": block.fullname,
+        "signature": signatures.get(block.lineno, block.name),
+        "start_line": block.lineno,
+        "end_line": block.endline,
+        "complexity": block.complexity,
+    } for block in cc_visit(code) if isinstance(block, Function)]
+    methods.sort(key=lambda m: m["start_line"])  # radon lists functions before class methods
+    return {"file_complexity": ComplexityVisitor.from_code(code).total_complexity, "methods": methods}
+
+
+def _text(source, node):
+    return source[node.start_byte:node.end_byte].decode("utf-8", errors="replace")
+
+
+def _function_name(source, node):
+    name = node.child_by_field_name("name")
+    if name is None:
+        # C/C++: the name sits inside nested declarators, e.g. `int *Foo::bar(int x)`
+        declarator = node.child_by_field_name("declarator")
+        while declarator is not None and declarator.child_by_field_name("declarator") is not None:
+            declarator = declarator.child_by_field_name("declarator")
+        name = declarator
+    return _text(source, name) if name is not None else None
+
+
+def _signature(source, node):
+    body = node.child_by_field_name("body")
+    end = body.start_byte if body is not None else node.end_byte
+    text = source[node.start_byte:end].decode("utf-8", errors="replace")
+    if body is None:
+        text = text.split("\n", 1)[0]
+    return re.sub(r"\s+", " ", text).strip().rstrip("{:").strip()
+
+
+def _count_decisions(node):
+    """Decision points under `node`, not descending into nested functions (they are measured on their own)."""
+    count = 0
+    stack = list(node.children)
+    while stack:
+        child = stack.pop()
+        if child.type in FUNCTION_NODE_TYPES:
+            continue
+        if child.type in DECISION_OPERATORS or (child.is_named and child.type in DECISION_NODE_TYPES):
+            count += 1
+        stack.extend(child.children)
+    return count
+
+
+def tree_facts(source, root):
+    """Named functions and methods of a tree-sitter tree with a decision-point count of their complexity."""
+    methods = []
+    stack = [(root, "")]
+    while stack:
+        node, prefix = stack.pop()
+        if node.type in CLASS_NODE_TYPES and node.child_by_field_name("name") is not None:
+            prefix = prefix + _text(source, node.child_by_field_name("name")) + "."
+        elif node.type in FUNCTION_NODE_TYPES:
+            name = _function_name(source, node)
+            if name:
+                methods.append({
+                    "method_name": name,
+                    "qualified_name": prefix + name,
+                    "signature": _signature(source, node),
+                    "start_line": node.start_point[0] + 1,
+                    "end_line": node.end_point[0] + 1,
+                    "complexity": 1 + _count_decisions(node),
+                })
+        stack.extend((child, prefix) for child in reversed(node.children))
+    # Like radon's total: every function's complexity plus the branches outside any function
+    file_complexity = sum(m["complexity"] for m in methods) + _count_decisions(root)
+    return {"file_complexity": max(1, file_complexity), "methods": methods}
+
+
+def extract_facts(code, language):
+    """Method inventory (name, signature, line span, cyclomatic complexity) and file complexity, computed
+    locally. None when the language has no analyzer or the code does not parse."""
+    with get_run_metrics().stage("analyze"):
+        try:
+            if language.lower() == "python":
+                return python_facts(code)
+            parser = get_parser(language)
+            if parser is None:
+                return None
+            source = code.encode("utf-8")
+            tree = parser.parse(source)
+            if tree.root_node.has_error:
+                return None
+            return tree_facts(source, tree.root_node)
+        except Exception as e:
+            logger.debug(f"Static analysis failed for {language} code: {e}")
+            return None
+
+
+_pool = None
+
+
+def get_process_pool():
+    """Process pool for CPU-bound analysis, or None to run inline (STATIC_ANALYSIS_WORKERS=0). Workers are spawned,
+    not forked: by the time the pool starts, main runs the metrics, health-check and preload threads."""
+    global _pool
+    if _pool is None and STATIC_ANALYSIS_WORKERS > 0:
+        _pool = ProcessPoolExecutor(max_workers=STATIC_ANALYSIS_WORKERS,
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def aextract_facts(code, language):
+    """extract_facts on the process pool, so parsing many files runs on all cores without blocking the loop."""
+    pool = get_process_pool()
+    if pool is None:
+        return extract_facts(code, language)
+    # Timed here: the worker process records into its own, discarded metrics
+    with get_run_metrics().stage("analyze"):
+        return await asyncio.get_running_loop().run_in_executor(pool, extract_facts, code, language)
+
+
+def chunk_line_spans(code, chunks):
+    """(first line, last line) of each chunk in `code`. Chunks are searched in order from the previous chunk's
+    start, which allows for overlap; a chunk the splitter altered is assumed to follow the previous one."""
+    spans, search_from, next_line = [], 0, 1
+    for chunk in chunks:
+        text = chunk.strip()
+        offset = code.find(text, search_from) if text else -1
+        start_line = code.count("\n", 0, offset) + 1 if offset != -1 else next_line
+        spans.append((start_line, start_line + text.count("\n")))
+        search_from = max(search_from, offset)
+        next_line = spans[-1][1] + 1
+    return spans
+
+
+def facts_for_chunk(facts, start_line, end_line):
+    """Extracted methods whose definition overlaps lines `start_line`-`end_line` of the file."""
+    return [m for m in facts["methods"] if m["start_line"] <= end_line and m["end_line"] >= start_line]
+
+
+def format_facts(methods, token_budget):
+    """One line per method for the prompt, cut off at `token_budget` tokens."""
+    lines, used = [], 0
+    for m in methods:
+        line = f"- {m['qualified_name']}: {m['signature']} (lines {m['start_line']}-{m['end_line']})"
+        used += count_tokens(line)
+        if used > token_budget:
+            break
+        lines.append(line)
+    return "\n".join(lines) or "(no methods defined in this chunk)"
+
+
+def method_key(name, qualified=False):
+    # "Class.method(args)", "Class::method" and "method" all match the extracted "method"; the qualified key keeps
+    # the enclosing class ("Class.method"), which tells apart same-named methods of different classes
+    parts = re.split(r"[.:]+", str(name).split("(", 1)[0].strip())
+    return ".".join(parts[-2:]) if qualified else parts[-1]
+
+
+def apply_facts(description, facts):
+    """Replaces LLM guesses with the measured facts: the file complexity, and every extracted method with its
+    signature, line span and complexity plus the LLM's description of it. Descriptions are matched by class and
+    name; one named without its class goes to the next extracted method of that name."""
+    by_qualified, by_name = {}, defaultdict(list)
+    for method in description.get("methods", []):
+        name, text = method.get("method_name", ""), method.get("description", "")
+        by_qualified.setdefault(method_key(name, qualified=True), text)
+        by_name[method_key(name)].append(text)
+    methods = []
+    for m in facts["methods"]:
+        text = by_qualified.get(method_key(m["qualified_name"], qualified=True))
+        if text is None:
+            unqualified = by_name[m["method_name"]]
+            text = unqualified.pop(0) if unqualified else ""
+        methods.append({
+            "method_name": m["method_name"],
+            "signature": m["signature"],
+            "description": text,
+            "complexity": m["complexity"],
+            "start_line": m["start_line"],
+            "end_line": m["end_line"],
+        })
+    return {**description, "file_complexity_estimate": facts["file_complexity"], "methods": methods}
@@ -0,0 +1,289 @@
+import ast
+import os
+import re
+import sqlite3
+from collections import defaultdict
+
+import numpy as np
+
+from config import SYMBOL_MAX_DEFINITIONS, PAGERANK_DAMPING
+from utils.logging_utils import setup_logger
+from utils.scanner import language_for_path
+from utils.static_analysis import CLASS_NODE_TYPES, FUNCTION_NODE_TYPES, get_process_pool
+from utils.syntax_chunking import get_parser
+
+logger = setup_logger()
+
+REFERENCE_NODE_TYPES = {"identifier", "type_identifier", "field_identifier", "property_identifier", "constant"}
+
+# Fallback for languages without a parser: (pattern, kind); the `name` group is the defined symbol
+DEFINITION_PATTERNS = [
+    (re.compile(r"^[ \t]*(?:export\s+)?(?:default\s+)?(?:(?:public|private|protected|internal|abstract|final|static|"
+                r"sealed|partial|data|open|pub(?:\([^)]*\))?)\s+)*(?P<kind>class|interface|struct|enum|trait|object|"
+                r"record|module)\s+(?P<name>[A-Za-z_]\w*)", re.MULTILINE), None),
+    (re.compile(r"^[ \t]*(?:export\s+)?(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?(?:def|function|func|fn|fun)\s+"
+                r"(?:\([^)]*\)\s*)?(?P<name>[A-Za-z_]\w*)", re.MULTILINE), "function"),
+    (re.compile(r"^[ \t]*(?:(?:public|private|protected|static|final|abstract|synchronized|virtual|override|async|"
+                r"internal)\s+)+[\w<>\[\],.?]+\s+(?P<name>[A-Za-z_]\w*)\s*\(", re.MULTILINE), "method"),
+]
+IMPORT_PATTERNS = [
+    re.compile(r"^[ \t]*import\s+(?:static\s+)?([\w.]+)\s*;?\s*$", re.MULTILINE),  # Java, Kotlin, Python
+    re.compile(r"^[ \t]*from\s+(\.*[\w.]*)\s+import\b", re.MULTILINE),  # Python
+    re.compile(r"\bfrom\s+['\"]([^'\"]+)['\"]"),  # JavaScript / TypeScript
+    re.compile(r"\brequire(?:_once|_relative)?\(?\s*['\"]([^'\"]+)['\"]"),  # Node, Ruby, PHP
+    re.compile(r"^[ \t]*import\s+['\"]([^'\"]+)['\"]", re.MULTILINE),  # Go, side-effect JS imports
+    re.compile(r"^[ \t]*#include\s+\"([^\"]+)\"", re.MULTILINE),  # C / C++
+    re.compile(r"^[ \t]*use\s+([\w:\\]+)", re.MULTILINE),  # Rust, PHP
+    re.compile(r"^[ \t]*using\s+([\w.]+)\s*;", re.MULTILINE),  # C#
+]
+GO_IMPORT_BLOCK = re.compile(r"^import\s*\(([^)]*)\)", re.MULTILINE)
+IDENTIFIER = re.compile(r"\b[A-Za-z_]\w{2,}\b")
+
+
+def _line(text, offset):
+    return text.count("\n", 0, offset) + 1
+
+
+def python_symbols(code):
+    """(definitions, imports, references) of Python code; methods are qualified with their class. Python names
+    other modules explicitly, so only imported names count as references; local variables named like a function
+    elsewhere would otherwise link unrelated files."""
+    tree = ast.parse(code)
+    definitions, imports, references = [], [], set()
+
+    def visit(node, prefix):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                kind = "class" if isinstance(child, ast.ClassDef) else ("method" if prefix else "function")
+                definitions.append((child.name, prefix + child.name, kind, child.lineno))
+                if isinstance(child, ast.ClassDef):
+                    visit(child, prefix + child.name + ".")
+            elif not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                visit(child, prefix)
+
+    visit(tree, "")
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = "." * node.level + (node.module or "")
+            imports.extend(f"{module}.{alias.name}" if module.strip(".") else module + alias.name
+                           for alias in node.names)
+            references.update(alias.name for alias in node.names)
+    return definitions, imports, references
+
+
+def tree_symbols(source, root):
+    """Definitions and referenced identifiers of a tree-sitter tree."""
+    definitions, references = [], set()
+    stack = [(root, "")]
+    while stack:
+        node, prefix = stack.pop()
+        if node.type in FUNCTION_NODE_TYPES or node.type in CLASS_NODE_TYPES:
+            name_node = node.child_by_field_name("name")
+            if name_node is not None:
+                name = source[name_node.start_byte:name_node.end_byte].decode("utf-8", errors="replace")
+                kind = "class" if node.type in CLASS_NODE_TYPES else ("method" if prefix else "function")
+                definitions.append((name, prefix + name, kind, node.start_point[0] + 1))
+                if node.type in CLASS_NODE_TYPES:
+                    prefix = prefix + name + "."
+        elif node.type in REFERENCE_NODE_TYPES:
+            references.add(source[node.start_byte:node.end_byte].decode("utf-8", errors="replace"))
+        stack.extend((child, prefix) for child in reversed(node.children))
+    return definitions, references
+
+
+def regex_symbols(code):
+    definitions = []
+    for pattern, kind in DEFINITION_PATTERNS:
+        for match in pattern.finditer(code):
+            definitions.append((match["name"], match["name"], kind or match["kind"], _line(code, match.start())))
+    return definitions, set(IDENTIFIER.findall(code))
+
+
+def regex_imports(code):
+    imports = [m for pattern in IMPORT_PATTERNS for m in pattern.findall(code)]
+    for block in GO_IMPORT_BLOCK.findall(code):
+        imports.extend(re.findall(r"\"([^\"]+)\"", block))
+    return imports
+
+
+def file_symbols(path):
+    """Definitions `(name, qualified name, kind, line)`, imports and referenced identifiers of one file."""
+    language = language_for_path(path) or "Unknown"
+    result = {"path": path, "language": language, "definitions": [], "imports": [], "references": set()}
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            code = f.read()
+        if language == "Python":
+            result["definitions"], result["imports"], result["references"] = python_symbols(code)
+            return result
+        result["imports"] = regex_imports(code)
+        parser = get_parser(language)
+        if parser is not None:
+            source = code.encode("utf-8")
+            result["definitions"], result["references"] = tree_symbols(source, parser.parse(source).root_node)
+        else:
+            result["definitions"], result["references"] = regex_symbols(code)
+    except Exception as e:
+        logger.debug(f"Symbol extraction failed for {path}: {e}")
+    return result
+
+
+def _module_keys(path):
+    """Lookup keys of a file for import resolution: its path without extension and the shorter suffixes."""
+    stem = os.path.splitext(os.path.normpath(path))[0].replace(os.sep, "/")
+    if stem.endswith("/__init__") or stem.endswith("/index"):
+        stem = stem.rsplit("/", 1)[0]
+    parts = stem.split("/")
+    return ["/".join(parts[i:]) for i in range(len(parts))]
+
+
+def _resolve_import(spec, importer, modules):
+    """The file an import refers to, or None for external or ambiguous modules."""
+    if spec.startswith("."):
+        base = os.path.dirname(os.path.normpath(importer)).replace(os.sep, "/")
+        if spec.startswith("./") or spec.startswith("../"):  # JavaScript-style relative path
+            candidates = [os.path.normpath(os.path.join(base, os.path.splitext(spec)[0])).replace(os.sep, "/")]
+        else:  # Python relative import: one leading dot per package level
+            level = len(spec) - len(spec.lstrip("."))
+            for _ in range(level - 1):
+                base = os.path.dirname(base)
+            rest = spec.lstrip(".").replace(".", "/")
+            candidates = [f"{base}/{rest}".strip("/")]
+    else:
+        name = re.sub(r"[.:\\]+", "/", os.path.splitext(spec)[0] if "/" in spec else spec).strip("/")
+        candidates = [name]
+    for candidate in candidates:
+        # "a.b.func" imports a symbol of module a/b; walk up until a file matches
+        parts = candidate.split("/")
+        for end in range(len(parts), 0, -1):
+            matches = modules.get("/".join(parts[:end]))
+            if matches and len(matches) == 1:
+                return matches[0]
+            if matches:
+                return None
+    return None
+
+
+def pagerank(n, edges, damping=PAGERANK_DAMPING, iterations=100, tolerance=1e-10):
+    """PageRank of `n` nodes over weighted `edges` [(src, dst, weight)]: a file scores high when central files
+    depend on it. Dangling nodes spread their rank evenly."""
+    if n == 0:
+        return np.zeros(0)
+    if not edges:
+        return np.full(n, 1.0 / n)
+    src, dst, weight = (np.array(column) for column in zip(*edges))
+    weight = weight.astype(float)
+    out_weight = np.bincount(src, weights=weight, minlength=n)
+    dangling = out_weight == 0
+    rank = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        share = rank[src] * weight / out_weight[src]
+        updated = (1 - damping) / n + damping * (np.bincount(dst, weights=share, minlength=n)
+                                                 + rank[dangling].sum() / n)
+        if np.abs(updated - rank).sum() < tolerance:
+            return updated
+        rank = updated
+    return rank
+
+
+def build_graph(extracted, max_definitions=SYMBOL_MAX_DEFINITIONS):
+    """Weighted file dependency edges [(src, dst, weight)] between indexes of `extracted`: imports that resolve to
+    a file, plus references to top-level classes and functions defined elsewhere. Names defined in more than
+    `max_definitions` files (e.g. `main`, `run`) are too ambiguous to link and are ignored."""
+    defined_in = defaultdict(set)
+    modules = defaultdict(list)
+    for i, item in enumerate(extracted):
+        for name, _, kind, _ in item["definitions"]:
+            if kind != "method":  # method names (get, close, ...) are called on objects of any class
+                defined_in[name].add(i)
+        for key in _module_keys(item["path"]):
+            modules[key].append(i)
+
+    weights = defaultdict(int)
+    for i, item in enumerate(extracted):
+        for spec in item["imports"]:
+            target = _resolve_import(spec, item["path"], modules)
+            if target is not None and target != i:
+                weights[(i, target)] += 1
+        own = {name for name, _, _, _ in item["definitions"]}
+        for name in item["references"] - own:
+            targets = defined_in.get(name, ())
+            if 0 < len(targets) <= max_definitions:
+                for target in targets:
+                    if target != i:
+                        weights[(i, target)] += 1
+    return [(src, dst, weight) for (src, dst), weight in weights.items()]
+
+
+class SymbolIndex:
+    """SQLite store of the symbol index: files with their centrality, definitions and weighted dependency edges."""
+
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE, language TEXT, "
+            "centrality REAL);"
+            "CREATE TABLE IF NOT EXISTS symbols (name TEXT, qualname TEXT, kind TEXT, file_id INTEGER, line INTEGER);"
+            "CREATE INDEX IF NOT EXISTS idx_symbols_name ON symbols(name);"
+            "CREATE INDEX IF NOT EXISTS idx_symbols_qualname ON symbols(qualname);"
+            "CREATE TABLE IF NOT EXISTS edges (src INTEGER, dst INTEGER, weight INTEGER);"
+            "CREATE INDEX IF NOT EXISTS idx_edges_src ON edges(src);"
+            "CREATE INDEX IF NOT EXISTS idx_edges_dst ON edges(dst);"
+        )
+
+    def replace(self, extracted, edges, scores):
+        """Overwrites the index with a new build."""
+        with self._conn:
+            for table in ("files", "symbols", "edges"):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.executemany("INSERT INTO files (id, path, language, centrality) VALUES (?, ?, ?, ?)",
+                                   ((i, item["path"], item["language"], float(score))
+                                    for i, (item, score) in enumerate(zip(extracted, scores))))
+            self._conn.executemany("INSERT INTO symbols (name, qualname, kind, file_id, line) VALUES (?, ?, ?, ?, ?)",
+                                   ((name, qualname, kind, i, line) for i, item in enumerate(extracted)
+                                    for name, qualname, kind, line in item["definitions"]))
+            self._conn.executemany("INSERT INTO edges (src, dst, weight) VALUES (?, ?, ?)", edges)
+
+    def where_defined(self, name):
+        """Definitions of `name` (simple or qualified, e.g. `Store.save`), most central files first."""
+        rows = self._conn.execute(
+            "SELECT s.qualname, s.kind, f.path, s.line FROM symbols s JOIN files f ON f.id = s.file_id "
+            "WHERE s.name = ? OR s.qualname = ? ORDER BY f.centrality DESC, f.path, s.line", (name, name)).fetchall()
+        return [{"symbol": qualname, "kind": kind, "path": path, "line": line} for qualname, kind, path, line in rows]
+
+    def centrality(self):
+        """Path -> PageRank score."""
+        return dict(self._conn.execute("SELECT path, centrality FROM files").fetchall())
+
+    def neighbours(self, path, limit=5):
+        """The files `path` uses and the files using it, strongest links first."""
+        def query(sql):
+            return [row[0] for row in self._conn.execute(sql, (path, limit)).fetchall()]
+        return {
+            "uses": query("SELECT t.path FROM edges e JOIN files s ON s.id = e.src JOIN files t ON t.id = e.dst "
+                          "WHERE s.path = ? ORDER BY e.weight DESC, t.centrality DESC LIMIT ?"),
+            "used_by": query("SELECT s.path FROM edges e JOIN files s ON s.id = e.src JOIN files t ON t.id = e.dst "
+                             "WHERE t.path = ? ORDER BY e.weight DESC, s.centrality DESC LIMIT ?"),
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def build_symbol_index(paths, index_path):
+    """Extracts symbols of `paths` in one parallel pass (on the static-analysis process pool), links files into a
+    dependency graph, scores them with PageRank and stores everything in a SymbolIndex at `index_path`."""
+    pool = get_process_pool()
+    extracted = list(pool.map(file_symbols, paths, chunksize=16) if pool else map(file_symbols, paths))
+    edges = build_graph(extracted)
+    scores = pagerank(len(extracted), edges)
+    index = SymbolIndex(index_path)
+    index.replace(extracted, edges, scores)
+    logger.info(f"Symbol index: {sum(len(item['definitions']) for item in extracted)} symbols in {len(paths)} files, "
+                f"{len(edges)} dependency edges ({index_path})")
+    return index
@@ -0,0 +1,123 @@
+import warnings
+from functools import lru_cache
+
+from utils.logging_utils import setup_logger
+from utils.token_counter import count_tokens, count_tokens_batch
+
+logger = setup_logger()
+
+# config.EXTENSION_LANGUAGE_MAP language -> tree_sitter_languages grammar name
+TREE_SITTER_LANGUAGES = {
+    "Python": "python",
+    "Java": "java",
+    "JavaScript": "javascript",
+    "TypeScript": "typescript",
+    "Go": "go",
+    "Ruby": "ruby",
+    "C++": "cpp",
+    "C#": "c_sharp",
+    "PHP": "php",
+    "Rust": "rust",
+    "Kotlin": "kotlin",
+    "Html": "html",
+}
+
+
+@lru_cache(maxsize=None)
+def get_parser(language):
+    name = TREE_SITTER_LANGUAGES.get(language)
+    if name is None:
+        return None
+    try:
+        from tree_sitter_languages import get_parser as ts_get_parser
+        with warnings.catch_warnings():  # tree_sitter 0.21 deprecates the Language(path, name) it loads with
+            warnings.simplefilter("ignore", FutureWarning)
+            return ts_get_parser(name)
+    except Exception as e:
+        logger.warning(f"No tree-sitter parser for {language}, using the character splitter: {e}")
+        return None
+
+
+def _units(node, start, end):
+    """Contiguous byte spans covering [start, end), one per child node. Whitespace and text between
+    children is attached to the following child, trailing text to the last one."""
+    children = node.children
+    if not children:
+        return [((start, end), node)]
+    units = []
+    cursor = start
+    for child in children:
+        units.append(((cursor, max(cursor, child.end_byte)), child))
+        cursor = max(cursor, child.end_byte)
+    (last_start, _), last_child = units[-1]
+    units[-1] = ((last_start, end), last_child)
+    return units
+
+
+def pack_nodes(source, node, token_budget, split_oversize, start=None, end=None):
+    """Greedily packs whole child definitions of `node` into chunks of at most `token_budget` tokens.
+
+    A child that alone exceeds the budget is packed from its own children (e.g. a class body's methods);
+    only a leaf that is still too large is handed to `split_oversize(text, token_budget)`.
+    """
+    start = node.start_byte if start is None else start
+    end = node.end_byte if end is None else end
+    units = _units(node, start, end)
+    texts = [source[s:e].decode("utf-8", errors="replace") for (s, e), _ in units]
+    counts = count_tokens_batch(texts)
+
+    chunks = []
+    current_start, current_end, current_tokens = None, None, 0
+
+    def flush():
+        if current_start is not None and current_end > current_start:
+            chunks.append(source[current_start:current_end].decode("utf-8", errors="replace"))
+
+    for ((s, e), child), text, tokens in zip(units, texts, counts):
+        if tokens > token_budget:
+            if child.children and child is not node:
+                pieces = pack_nodes(source, child, token_budget, split_oversize, s, e)
+            else:
+                pieces = split_oversize(text, token_budget)
+            # What is pending (e.g. the `class Big:` header of the node being split) opens its first piece
+            # rather than becoming a tiny request of its own
+            if current_start is not None and pieces and current_tokens + count_tokens(pieces[0]) <= token_budget:
+                pieces[0] = source[current_start:current_end].decode("utf-8", errors="replace") + pieces[0]
+            else:
+                flush()
+            chunks.extend(pieces)
+            current_start, current_end, current_tokens = None, None, 0
+            continue
+        if current_start is not None and current_tokens + tokens > token_budget:
+            flush()
+            current_start, current_tokens = None, 0
+        if current_start is None:
+            current_start = s
+        current_end = e
+        current_tokens += tokens
+    flush()
+    return chunks
+
+
+def syntax_aware_chunks(code, language, token_budget, split_oversize):
+    """Chunks that follow top-level definition boundaries, or None if the file cannot be parsed cleanly."""
+    if count_tokens(code) <= token_budget:
+        return [code]
+    parser = get_parser(language)
+    if parser is None:
+        return None
+    source = code.encode("utf-8")
+    try:
+        tree = parser.parse(source)
+    except Exception as e:
+        logger.warning(f"tree-sitter failed to parse {language} source: {e}")
+        return None
+    if tree.root_node.has_error:
+        return None
+
+    chunks = pack_nodes(source, tree.root_node, token_budget, split_oversize, 0, len(source))
+    # Unit counts are summed per node; re-split the rare chunk where the joined text tokenizes larger
+    verified = []
+    for chunk, tokens in zip(chunks, count_tokens_batch(chunks)):
+        verified.extend(split_oversize(chunk, token_budget) if tokens > token_budget else [chunk])
+    return [c for c in verified if c.strip()]
@@ -1,45 +1,79 @@
-from config import CHUNK_OVERLAP, MAX_INPUT_TOKENS, BUFFER_TOKENS, MODEL_LIMITS, MODEL_NAME
+from config import CHUNK_OVERLAP, MAX_INPUT_TOKENS, BUFFER_TOKENS, MODEL_LIMITS, MODEL_NAME, TOKENIZER_MODEL, \
+    CHARS_PER_TOKEN, USE_SYNTAX_CHUNKING
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 from prompts.language_prompts import get_code_analysis_prompt
 from utils.logging_utils import setup_logger
+from utils.syntax_chunking import syntax_aware_chunks
+from utils.token_counter import count_tokens, count_tokens_batch, count_prompt_prefix_tokens
 
 logger = setup_logger()
 
+# Verification passes that re-split chunks which overshoot the token budget
+MAX_RESPLIT_PASSES = 3
+
 
 def get_model_context_limit(model_name: str) -> int:
     # Default to MAX_INPUT_TOKENS if unknown
     return MODEL_LIMITS.get(model_name.lower(), MAX_INPUT_TOKENS)
 
 
-def estimate_tokens(text: str, model_name: str = "gpt-3.5-turbo") -> int:
-    from tiktoken import encoding_for_model
-    enc = encoding_for_model(model_name)
-    return len(enc.encode(text))
+def estimate_tokens(text: str, model_name: str = TOKENIZER_MODEL) -> int:
+    return count_tokens(text, model_name)
 
 
-def get_available_code_tokens(prompt_template, prompt_input):
-    temp_input = prompt_template.format_prompt(
-        **{**prompt_input, "code": ""}
-    ).to_string()
-    system_tokens = estimate_tokens(temp_input)
-    max_input_tokens = get_model_context_limit(MODEL_NAME) - BUFFER_TOKENS
+def get_available_code_tokens(prompt_template, prompt_input, overlap=CHUNK_OVERLAP, context_limit=None):
+    system_tokens = count_prompt_prefix_tokens(prompt_template, prompt_input)
+    max_input_tokens = (context_limit or get_model_context_limit(MODEL_NAME)) - BUFFER_TOKENS
     budget = max_input_tokens - system_tokens
 
     # Adjust for overlap — assume overlap is duplicated in every chunk
-    effective_budget = budget - CHUNK_OVERLAP
+    effective_budget = budget - overlap
     return max(100, effective_budget)  # safeguard
 
 
-def split_code_to_chunks(code, token_budget):
+def calibrate_chars_per_token(text):
+    # Code tokenizes very differently from prose (and per language), so measure this file's own ratio
+    tokens = count_tokens(text)
+    return len(text) / tokens if tokens else CHARS_PER_TOKEN
+
+
+def _split_by_chars(code, chunk_chars, overlap_chars):
     splitter = RecursiveCharacterTextSplitter(
-        chunk_size=token_budget,
-        chunk_overlap=CHUNK_OVERLAP
+        chunk_size=max(1, chunk_chars),
+        chunk_overlap=min(overlap_chars, max(0, chunk_chars - 1))
     )
     return splitter.split_text(code)
 
 
-def get_token_budget(language, path):
+def split_code_to_chunks(code, token_budget, overlap_tokens=CHUNK_OVERLAP):
+    """Splits code into chunks of at most `token_budget` model tokens.
+
+    The character splitter is sized with the file's calibrated chars-per-token ratio, then every chunk is
+    counted; the rare chunk that overshoots (locally denser code) is re-split with a proportionally tighter size.
+    """
+    if count_tokens(code) <= token_budget:
+        return [code]
+
+    chars_per_token = calibrate_chars_per_token(code)
+    chunks = _split_by_chars(code, int(token_budget * chars_per_token), int(overlap_tokens * chars_per_token))
+
+    for _ in range(MAX_RESPLIT_PASSES):
+        counts = count_tokens_batch(chunks)
+        if all(count <= token_budget for count in counts):
+            break
+        fitted = []
+        for chunk, count in zip(chunks, counts):
+            if count <= token_budget:
+                fitted.append(chunk)
+                continue
+            chunk_chars = int(len(chunk) * token_budget / count * 0.95)
+            fitted.extend(_split_by_chars(chunk, chunk_chars, int(overlap_tokens * len(chunk) / count)))
+        chunks = fitted
+    return chunks
+
+
+def get_token_budget(language, path, overlap=CHUNK_OVERLAP, reserved_tokens=0, context_limit=None):
     prompt_template = get_code_analysis_prompt()
     token_budget = get_available_code_tokens(prompt_template, {
         "language": language,
@@ -47,11 +81,24 @@ def get_token_budget(language, path):
         "chunk_num": 1,
         "total_chunks": 100,  # max placeholder
         "code": ""
-    })
-    return token_budget
+    }, overlap, context_limit)
+    return max(100, token_budget - reserved_tokens)
+
 
+def token_aware_chunking(code, language, path, reserved_tokens=0, overlap=CHUNK_OVERLAP, context_limit=None):
+    """Chunks sized for the code-analysis prompt within `context_limit` (default: MODEL_NAME's), minus
+    `reserved_tokens` for extra prompt content. Character-split chunks share `overlap` tokens with their
+    neighbours."""
+    if USE_SYNTAX_CHUNKING:
+        # Whole definitions carry their own context, so no overlap budget is reserved
+        token_budget = get_token_budget(language, path, overlap=0, reserved_tokens=reserved_tokens,
+                                        context_limit=context_limit)
+        chunks = syntax_aware_chunks(code, language, token_budget, split_code_to_chunks)
+        if chunks is not None:
+            logger.info(f"Syntax-aware chunking: {len(chunks)} chunk(s) within {token_budget} tokens")
+            return chunks
 
-def token_aware_chunking(code, language, path):
-    token_budget = get_token_budget(language, path)
+    token_budget = get_token_budget(language, path, overlap=overlap, reserved_tokens=reserved_tokens,
+                                    context_limit=context_limit)
     logger.info(f"Estimated available token budget: {token_budget}")
-    return split_code_to_chunks(code, token_budget)
+    return split_code_to_chunks(code, token_budget, overlap)
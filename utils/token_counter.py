@@ -0,0 +1,71 @@
+import math
+from functools import lru_cache
+
+from config import TOKENIZER_MODEL, CHARS_PER_TOKEN
+from utils.logging_utils import setup_logger
+from utils.metrics import get_run_metrics
+
+logger = setup_logger()
+
+# (template text, static prompt inputs) -> token count of the rendered prompt without variable inputs
+_prefix_token_cache = {}
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model_name=TOKENIZER_MODEL):
+    """Loads the tiktoken encoder once per model. Returns None if it cannot be loaded
+    (e.g. the BPE file cannot be downloaded offline); counts then fall back to the character-ratio estimate."""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            # Non-OpenAI models (e.g. codellama) have no tiktoken mapping
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"Tokenizer unavailable, estimating tokens from characters: {e}")
+        return None
+
+
+def estimate_tokens_fast(text, chars_per_token=CHARS_PER_TOKEN):
+    """Cheap character-ratio estimate for pre-budgeting, where exact counts are not needed."""
+    return math.ceil(len(text) / chars_per_token) if text else 0
+
+
+def count_tokens(text, model_name=TOKENIZER_MODEL):
+    enc = get_encoder(model_name)
+    with get_run_metrics().stage("token_count"):
+        if enc is None:
+            return estimate_tokens_fast(text)
+        return len(enc.encode(text, disallowed_special=()))
+
+
+def count_tokens_batch(texts, model_name=TOKENIZER_MODEL, num_threads=8):
+    """Counts many strings in one call; tiktoken encodes the batch on native threads."""
+    texts = list(texts)
+    enc = get_encoder(model_name)
+    with get_run_metrics().stage("token_count"):
+        if enc is None:
+            return [estimate_tokens_fast(t) for t in texts]
+        return [len(tokens) for tokens in enc.encode_batch(texts, num_threads=num_threads, disallowed_special=())]
+
+
+@lru_cache(maxsize=1024)
+def count_static_tokens(text, model_name=TOKENIZER_MODEL):
+    """Memoized count for text that repeats across calls (prompt templates, headers)."""
+    return count_tokens(text, model_name)
+
+
+def count_prompt_prefix_tokens(prompt_template, prompt_input, variable_keys=("file_path",), code_key="code"):
+    """Tokens of a rendered prompt excluding the code.
+
+    The prompt is rendered once per template and shape of static inputs (language, chunk numbers) with the
+    variable inputs blanked and memoized; only the variable inputs (e.g. the file path) are counted per call.
+    """
+    static_input = {k: ("" if k in variable_keys or k == code_key else v) for k, v in prompt_input.items()}
+    key = (prompt_template.template, tuple(sorted((k, str(v)) for k, v in static_input.items())))
+    if key not in _prefix_token_cache:
+        rendered = prompt_template.format_prompt(**static_input).to_string()
+        _prefix_token_cache[key] = count_tokens(rendered)
+    variable_tokens = sum(count_tokens(str(prompt_input[k])) for k in variable_keys if prompt_input.get(k))
+    return _prefix_token_cache[key] + variable_tokens
@@ -0,0 +1,57 @@
+# Validation for the subset of JSON schema used in prompts/schemas.py (type, properties, required, items)
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+def _matches_type(value, expected):
+    for name in (expected if isinstance(expected, list) else [expected]):
+        if name in ("number", "integer") and isinstance(value, bool):
+            continue
+        if isinstance(value, _TYPES[name]):
+            return True
+    return False
+
+
+def validate(value, schema, path="$"):
+    """Returns a list of human-readable errors; an empty list means `value` matches `schema`."""
+    errors = []
+    expected = schema.get("type")
+    if expected is not None and not _matches_type(value, expected):
+        return [f"{path}: expected {expected}, got {type(value).__name__}"]
+
+    if isinstance(value, dict):
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}: missing required field '{key}'")
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in value:
+                errors.extend(validate(value[key], sub_schema, f"{path}.{key}"))
+    elif isinstance(value, list) and "items" in schema:
+        for i, item in enumerate(value):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+def sanitize(value, schema):
+    """Drops the properties and array items that do not match the schema, keeping everything that does."""
+    if isinstance(value, dict):
+        cleaned = {}
+        properties = schema.get("properties", {})
+        for key, item in value.items():
+            sub_schema = properties.get(key)
+            if sub_schema is None:
+                cleaned[key] = item
+            elif "type" not in sub_schema or _matches_type(item, sub_schema["type"]):
+                cleaned[key] = sanitize(item, sub_schema)
+        return cleaned
+    if isinstance(value, list) and "items" in schema:
+        return [item for item in value if not validate(item, schema["items"])]
+    return value
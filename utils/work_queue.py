@@ -0,0 +1,152 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from config import WORK_QUEUE_LEASE_SECONDS, WORK_QUEUE_MAX_ATTEMPTS
+from utils.logging_utils import setup_logger
+
+logger = setup_logger()
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+
+class Task:
+    """One leased file; `attempts` counts this lease."""
+
+    def __init__(self, task_id, path, attempts):
+        self.id = task_id
+        self.path = path
+        self.attempts = attempts
+
+
+class WorkQueue:
+    """Durable task queue in one SQLite file, shared by a coordinator and any number of worker processes.
+
+    A worker leases a task for `lease_seconds` and must complete (or extend) it before the lease expires;
+    expired leases go back to pending, and after `max_attempts` leases a task is marked failed. Completion is
+    only accepted from the current lease holder, so a worker that lost its lease cannot overwrite a newer result.
+    """
+
+    def __init__(self, path, lease_seconds=WORK_QUEUE_LEASE_SECONDS, max_attempts=WORK_QUEUE_MAX_ATTEMPTS,
+                 clock=time.time):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._lock = threading.Lock()
+        # isolation_level=None: transactions are explicit, so a lease is one BEGIN IMMEDIATE ... COMMIT
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, status TEXT NOT NULL, worker TEXT, "
+            "lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, completed_seq INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks(completed_seq)")
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn()
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def enqueue(self, paths):
+        """Adds a pending task per path; paths already in the queue (in any state) are left alone."""
+        def insert():
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO tasks (path, status) VALUES (?, ?)",
+                                   ((path, PENDING) for path in paths))
+            return self._conn.total_changes - before
+        added = self._transaction(insert)
+        logger.info(f"Work queue {self.path}: {added} tasks added")
+        return added
+
+    def _requeue_expired(self, now):
+        self._conn.execute("UPDATE tasks SET status = ?, worker = NULL, error = 'lease expired' "
+                           "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                           (FAILED, LEASED, now, self.max_attempts))
+        return self._conn.execute("UPDATE tasks SET status = ?, worker = NULL WHERE status = ? AND lease_expires < ?",
+                                  (PENDING, LEASED, now)).rowcount
+
+    def requeue_expired(self):
+        """Returns tasks whose lease ran out to pending (or failed, once out of attempts)."""
+        requeued = self._transaction(lambda: self._requeue_expired(self.clock()))
+        if requeued:
+            logger.warning(f"Work queue: {requeued} expired leases requeued")
+        return requeued
+
+    def lease(self, worker):
+        """The oldest pending task, now leased to `worker`, or None when nothing is pending."""
+        def take():
+            now = self.clock()
+            self._requeue_expired(now)
+            row = self._conn.execute("SELECT id, path, attempts FROM tasks WHERE status = ? ORDER BY id LIMIT 1",
+                                     (PENDING,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE tasks SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                               "WHERE id = ?", (LEASED, worker, now + self.lease_seconds, row[0]))
+            return Task(row[0], row[1], row[2] + 1)
+        return self._transaction(take)
+
+    def extend(self, task, worker):
+        """Renews the lease; False when `worker` no longer holds it."""
+        return self._transaction(lambda: self._conn.execute(
+            "UPDATE tasks SET lease_expires = ? WHERE id = ? AND status = ? AND worker = ?",
+            (self.clock() + self.lease_seconds, task.id, LEASED, worker)).rowcount == 1)
+
+    def complete(self, task, worker, result):
+        """Stores the task's result (any JSON value, None for nothing to report); False if the lease was lost."""
+        def finish():
+            seq = self._conn.execute("SELECT COALESCE(MAX(completed_seq), 0) + 1 FROM tasks").fetchone()[0]
+            return self._conn.execute(
+                "UPDATE tasks SET status = ?, result = ?, completed_seq = ?, lease_expires = NULL "
+                "WHERE id = ? AND status = ? AND worker = ?",
+                (DONE, json.dumps(result), seq, task.id, LEASED, worker)).rowcount == 1
+        completed = self._transaction(finish)
+        if not completed:
+            logger.warning(f"Work queue: lease on {task.path} was lost, result of {worker} discarded")
+        return completed
+
+    def fail(self, task, worker, error):
+        """Gives the task back for another attempt, or marks it failed once out of attempts."""
+        status = FAILED if task.attempts >= self.max_attempts else PENDING
+        self._transaction(lambda: self._conn.execute(
+            "UPDATE tasks SET status = ?, worker = NULL, error = ?, lease_expires = NULL "
+            "WHERE id = ? AND status = ? AND worker = ?", (status, str(error), task.id, LEASED, worker)))
+
+    def counts(self):
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in (PENDING, LEASED, DONE, FAILED)}
+
+    def is_finished(self):
+        counts = self.counts()
+        return counts[PENDING] == 0 and counts[LEASED] == 0
+
+    def iter_completed(self, after_seq=0):
+        """(completed_seq, path, result) of tasks completed after `after_seq`, in completion order."""
+        with self._lock:
+            rows = self._conn.execute("SELECT completed_seq, path, result FROM tasks WHERE completed_seq > ? "
+                                      "ORDER BY completed_seq", (after_seq,)).fetchall()
+        for seq, path, result in rows:
+            yield seq, path, json.loads(result)
+
+    def failed_tasks(self):
+        with self._lock:
+            return self._conn.execute("SELECT path, error FROM tasks WHERE status = ?", (FAILED,)).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()